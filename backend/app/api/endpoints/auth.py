@@ -1,5 +1,5 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from app.api.dependencies import get_db
 from app.crud import user as crud_user
@@ -17,25 +17,32 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, response: Response, db: Session = Depends(get_db)):
     """Authenticate user and return access token"""
-    user = crud_user.authenticate_user(db, user_credentials.username, user_credentials.password)
+    user, hash_wait, hash_time = await crud_user.authenticate_user_async(
+        db, user_credentials.username, user_credentials.password
+    )
+    # Report password hashing latency to the client
+    server_timing = f"hash-wait;dur={hash_wait * 1000:.1f}, hash;dur={hash_time * 1000:.1f}"
     
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers={"WWW-Authenticate": "Bearer", "Server-Timing": server_timing},
         )
     
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is deactivated"
+            detail="User account is deactivated",
+            headers={"Server-Timing": server_timing},
         )
     
-    # Update last login
-    crud_user.update_last_login(db, user.id)
+    response.headers["Server-Timing"] = server_timing
+    
+    # Update last login (buffered, no database write on the request path)
+    user.last_login = crud_user.update_last_login(db, user.id)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -43,7 +50,8 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         data={
             "sub": user.username,
             "user_id": user.id,
-            "role": user.role.value
+            "role": user.role.value,
+            "ver": user.token_version
         },
         expires_delta=access_token_expires
     )
@@ -2,50 +2,52 @@ import os
 import shutil
 from pathlib import Path
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, UploadFile, File, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.api.dependencies import get_db
+from app.database import get_db, get_async_primary_db, get_primary_db
 from app.crud import contract as crud_contract
 from app.schemas.contract import ContractCreate, ContractUpdate, ContractResponse, ContractDetail, ContractSummary
 from app.models.contract import ContractStatus
 from app.models import Staff
+from app.utils.compression import discard_precompressed, precompress_in_background, precompressed_file_response
+from app.utils.serialization import json_response
+from app.utils.tracing import span
 
 router = APIRouter(prefix="/api/contracts", tags=["contracts"])
 
-# Create uploads directory if it doesn't exist
+# Created at startup (main.lifespan)
 UPLOAD_DIR = Path("uploads/contracts")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.get("", response_model=list[ContractResponse])
-def list_contracts(
+async def list_contracts(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     site_id: int = Query(None),
     status: str = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_primary_db)
 ):
     """Get all contracts with optional filtering"""
     # Update any expired contracts before returning
-    crud_contract.update_expired_contracts(db)
+    await crud_contract.update_expired_contracts_async(db)
     
     if site_id:
-        contracts = crud_contract.get_contracts_by_site(db, site_id)
+        contracts = await crud_contract.get_contracts_by_site_async(db, site_id)
     elif status:
         try:
             status_enum = ContractStatus(status)
-            contracts = crud_contract.get_contracts_by_status(db, status_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid status")
+        contracts = await crud_contract.get_contracts_by_status_async(db, status_enum)
     else:
-        contracts = crud_contract.get_contracts(db, skip, limit)
+        contracts = await crud_contract.get_contracts_async(db, skip, limit)
     
-    return contracts
+    return json_response(list[ContractResponse], contracts)
 
 
 @router.get("/summary", response_model=ContractSummary)
-def get_contracts_summary(db: Session = Depends(get_db)):
+def get_contracts_summary(db: Session = Depends(get_primary_db)):
     """Get contract statistics summary"""
     # Update any expired contracts before getting summary
     crud_contract.update_expired_contracts(db)
@@ -54,7 +56,7 @@ def get_contracts_summary(db: Session = Depends(get_db)):
 
 
 @router.get("/summary/by-type/{contract_type}", response_model=dict)
-def get_contracts_summary_by_type(contract_type: str, db: Session = Depends(get_db)):
+def get_contracts_summary_by_type(contract_type: str, db: Session = Depends(get_primary_db)):
     """Get contract statistics summary filtered by type (Supply or Service)"""
     # Update any expired contracts before getting summary
     crud_contract.update_expired_contracts(db)
@@ -65,23 +67,23 @@ def get_contracts_summary_by_type(contract_type: str, db: Session = Depends(get_
 
 
 @router.get("/overdue", response_model=list[ContractResponse])
-def get_overdue_contracts(db: Session = Depends(get_db)):
+def get_overdue_contracts(db: Session = Depends(get_primary_db)):
     """Get all overdue contracts (Active status past end_date)"""
     # Update any expired contracts first
     crud_contract.update_expired_contracts(db)
     contracts = crud_contract.get_overdue_contracts(db)
-    return contracts
+    return json_response(list[ContractResponse], contracts)
 
 
 @router.get("/{contract_id}", response_model=ContractResponse)
-def get_contract(contract_id: int, db: Session = Depends(get_db)):
+async def get_contract(contract_id: int, db: AsyncSession = Depends(get_async_primary_db)):
     """Get a specific contract by ID"""
     # Update any expired contracts before returning
-    crud_contract.update_expired_contracts(db)
-    contract = crud_contract.get_contract(db, contract_id)
+    await crud_contract.update_expired_contracts_async(db)
+    contract = await crud_contract.get_contract_async(db, contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-    return contract
+    return json_response(ContractResponse, contract)
 
 
 @router.post("", response_model=ContractResponse)
@@ -151,6 +153,7 @@ def delete_contract(contract_id: int, db: Session = Depends(get_db)):
         try:
             if os.path.exists(contract.document_path):
                 os.remove(contract.document_path)
+            discard_precompressed(contract.document_path)
         except OSError:
             pass  # Log but don't fail if file deletion fails
     
@@ -161,6 +164,7 @@ def delete_contract(contract_id: int, db: Session = Depends(get_db)):
 @router.post("/{contract_id}/upload")
 def upload_contract_file(
     contract_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -188,10 +192,14 @@ def upload_contract_file(
     
     # Save file
     try:
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        discard_precompressed(file_path)
+        with span("file.write", {"file.path": str(file_path), "file.bytes": len(contents)}):
+            with open(file_path, "wb") as f:
+                f.write(contents)
     except IOError as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    # Compressed copies for downloads are written after the response is sent
+    background_tasks.add_task(precompress_in_background, file_path)
     
     # Update contract record
     updated_contract = crud_contract.update_contract_file(
@@ -206,7 +214,7 @@ def upload_contract_file(
 
 
 @router.get("/{contract_id}/download")
-def download_contract_file(contract_id: int, db: Session = Depends(get_db)):
+def download_contract_file(contract_id: int, request: Request, db: Session = Depends(get_db)):
     """Download a contract document file"""
     contract = crud_contract.get_contract(db, contract_id)
     if not contract:
@@ -223,9 +231,10 @@ def download_contract_file(contract_id: int, db: Session = Depends(get_db)):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Contract document file not found on disk")
     
-    # Return file for download
-    return FileResponse(
+    # Return file for download (precompressed when the client accepts it)
+    return precompressed_file_response(
         file_path,
+        request.headers.get("accept-encoding"),
         filename=contract.document_filename,
         media_type="application/octet-stream"
     )
@@ -249,6 +258,7 @@ def delete_contract_file(contract_id: int, db: Session = Depends(get_db)):
     try:
         if file_path.exists():
             file_path.unlink()
+        discard_precompressed(file_path)
     except OSError:
         pass  # Log but don't fail if file deletion fails
     
@@ -276,7 +286,7 @@ def list_contract_sections(contract_id: int, db: Session = Depends(get_db)):
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
-    return crud_contract.get_sections_by_contract(db, contract_id)
+    return json_response(list[ContractSectionResponse], crud_contract.get_sections_by_contract(db, contract_id))
 
 
 @router.post("/{contract_id}/sections", response_model=ContractSectionResponse)
@@ -322,7 +332,7 @@ def list_section_items(section_id: int, db: Session = Depends(get_db)):
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
     
-    return crud_contract.get_line_items_by_section(db, section_id)
+    return json_response(list[ContractLineItemResponse], crud_contract.get_line_items_by_section(db, section_id))
 
 
 @router.post("/sections/{section_id}/items", response_model=ContractLineItemResponse)
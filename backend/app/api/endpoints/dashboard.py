@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_primary_db
+from app.crud import contract as crud_contract
+from app.crud import dashboard as crud_dashboard
+from app.schemas.dashboard import DashboardResponse
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+
+@router.get("", response_model=DashboardResponse)
+async def get_dashboard(
+    limit: int = Query(5, ge=1, le=20, description="Entries in each list"),
+    db: AsyncSession = Depends(get_async_primary_db),
+):
+    """Dashboard figures and the upcoming/recent lists, computed with aggregate queries.
+
+    Served from the response cache until a counted table changes or DASHBOARD_CACHE_SECONDS pass.
+    """
+    # Contract counts are by status, so sweep contracts past their end date first (as the summaries do)
+    await crud_contract.update_expired_contracts_async(db)
+    return await crud_dashboard.get_dashboard_async(db, limit)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.schemas.meeting import MeetingCreate, MeetingUpdate, MeetingResponse
 from app.crud import meeting as crud_meeting
+from app.utils.serialization import json_response
 from typing import List, Optional
 
 router = APIRouter(prefix="/api/meetings", tags=["meetings"])
@@ -16,17 +18,17 @@ def create_meeting(meeting: MeetingCreate, db: Session = Depends(get_db)):
     return db_meeting
 
 @router.get("", response_model=List[MeetingResponse])
-def list_meetings(skip: int = 0, limit: int = 100, site_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def list_meetings(skip: int = 0, limit: int = 100, site_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """List meetings (optionally filtered by site)"""
-    return crud_meeting.list_meetings(db, skip, limit, site_id)
+    return json_response(List[MeetingResponse], await crud_meeting.list_meetings_async(db, skip, limit, site_id))
 
 @router.get("/{meeting_id}", response_model=MeetingResponse)
-def get_meeting(meeting_id: int, db: Session = Depends(get_db)):
+async def get_meeting(meeting_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific meeting"""
-    db_meeting = crud_meeting.get_meeting(db, meeting_id)
+    db_meeting = await crud_meeting.get_meeting_async(db, meeting_id)
     if not db_meeting:
         raise HTTPException(status_code=404, detail="Meeting not found")
-    return db_meeting
+    return json_response(MeetingResponse, db_meeting)
 
 @router.put("/{meeting_id}", response_model=MeetingResponse)
 def update_meeting(meeting_id: int, meeting: MeetingUpdate, db: Session = Depends(get_db)):
@@ -49,4 +51,4 @@ def delete_meeting(meeting_id: int, db: Session = Depends(get_db)):
 @router.get("/site/{site_id}", response_model=List[MeetingResponse])
 def get_site_meetings(site_id: int, db: Session = Depends(get_db)):
     """Get all meetings for a specific site"""
-    return crud_meeting.get_site_meetings(db, site_id)
+    return json_response(List[MeetingResponse], crud_meeting.get_site_meetings(db, site_id))
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.schemas.site import SiteCreate, SiteUpdate, SiteResponse, SiteDetailResponse, StaffRole
 from app.crud import site as crud_site
 from app.crud import site_staff
 from app.schemas.staff import StaffResponse
+from app.utils.serialization import json_response, with_fields
 from typing import List
 from pydantic import BaseModel
 
@@ -26,18 +28,17 @@ def create_site(site: SiteCreate, db: Session = Depends(get_db)):
     return crud_site.create_site(db, site)
 
 @router.get("", response_model=List[SiteResponse])
-def list_sites(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_sites(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """List all sites"""
-    return crud_site.list_sites(db, skip, limit)
+    return json_response(List[SiteResponse], await crud_site.list_sites_async(db, skip, limit))
 
 @router.get("/{site_id}", response_model=SiteDetailResponse)
-def get_site(site_id: int, db: Session = Depends(get_db)):
+async def get_site(site_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific site with details"""
-    from app.schemas.site import SiteStaffResponse
-    
-    db_site = crud_site.get_site(db, site_id)
+    db_site = await crud_site.get_site_with_staff_async(db, site_id)
     if not db_site:
         raise HTTPException(status_code=404, detail="Site not found")
+    meeting_count = await crud_site.get_site_meetings_count_async(db, site_id)
     
     # Organize staff by role
     site_managers = []
@@ -46,13 +47,13 @@ def get_site(site_id: int, db: Session = Depends(get_db)):
     casual_staff = []
     
     for link in db_site.staff_links:
-        staff_response = SiteStaffResponse(
-            staff_id=link.staff.id,
-            staff_name=link.staff.name,
-            staff_surname=link.staff.surname,
-            staff_role=link.staff.role if hasattr(link.staff, 'role') else None,
-            site_role=link.role
-        )
+        staff_response = {
+            "staff_id": link.staff.id,
+            "staff_name": link.staff.name,
+            "staff_surname": link.staff.surname,
+            "staff_role": link.staff.role,
+            "site_role": link.role,
+        }
         
         if link.role == "Site Manager":
             site_managers.append(staff_response)
@@ -63,19 +64,15 @@ def get_site(site_id: int, db: Session = Depends(get_db)):
         elif link.role == "Casual Staff":
             casual_staff.append(staff_response)
     
-    # Manually construct response with organized staff
-    result = SiteDetailResponse(
-        **{
-            **{k: v for k, v in db_site.__dict__.items() if not k.startswith('_')},
-            "staff_count": len(db_site.staff_links),
-            "meeting_count": len(db_site.meetings),
-            "site_managers": site_managers,
-            "supervisors": supervisors,
-            "valve_technicians": valve_technicians,
-            "casual_staff": casual_staff
-        }
-    )
-    return result
+    return json_response(SiteDetailResponse, with_fields(
+        db_site,
+        staff_count=len(db_site.staff_links),
+        meeting_count=meeting_count,
+        site_managers=site_managers,
+        supervisors=supervisors,
+        valve_technicians=valve_technicians,
+        casual_staff=casual_staff,
+    ))
 
 @router.put("/{site_id}", response_model=SiteResponse)
 def update_site(site_id: int, site: SiteUpdate, db: Session = Depends(get_db)):
@@ -103,7 +100,7 @@ def get_site_staff(site_id: int, db: Session = Depends(get_db)):
     if not db_site:
         raise HTTPException(status_code=404, detail="Site not found")
     
-    return site_staff.get_site_staff(db, site_id)
+    return json_response(List[StaffResponse], site_staff.get_site_staff(db, site_id))
 
 @router.post("/{site_id}/staff/{staff_id}")
 def add_staff_to_site(site_id: int, staff_id: int, request: AddStaffRequest, db: Session = Depends(get_db)):
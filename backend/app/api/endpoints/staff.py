@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.schemas.staff import StaffCreate, StaffUpdate, StaffResponse, StaffDetailResponse
 from app.crud import staff as crud_staff
+from app.utils.serialization import json_response, with_fields
 from typing import List
 
 router = APIRouter(prefix="/api/staff", tags=["staff"])
@@ -13,29 +15,27 @@ def create_staff(staff: StaffCreate, db: Session = Depends(get_db)):
     return crud_staff.create_staff(db, staff)
 
 @router.get("", response_model=List[StaffDetailResponse])
-def list_staff(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_staff(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """List all staff members"""
-    staff_list = crud_staff.list_staff(db, skip, limit)
-    result = []
-    for member in staff_list:
-        site_names = [link.site.name for link in member.site_links]
-        result.append(StaffDetailResponse(
-            **{**member.__dict__, "site_count": len(member.site_links), "assigned_sites": site_names}
-        ))
-    return result
+    staff_list = await crud_staff.list_staff_async(db, skip, limit)
+    return json_response(List[StaffDetailResponse], [
+        with_fields(
+            member,
+            site_count=len(member.site_links),
+            assigned_sites=[link.site.name for link in member.site_links],
+        )
+        for member in staff_list
+    ])
 
 @router.get("/{staff_id}", response_model=StaffDetailResponse)
-def get_staff(staff_id: int, db: Session = Depends(get_db)):
+async def get_staff(staff_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific staff member with details"""
-    db_staff = crud_staff.get_staff(db, staff_id)
+    db_staff = await crud_staff.get_staff_async(db, staff_id)
     if not db_staff:
         raise HTTPException(status_code=404, detail="Staff not found")
     
     # Manually compute site count
-    result = StaffDetailResponse(
-        **{**db_staff.__dict__, "site_count": len(db_staff.site_links)}
-    )
-    return result
+    return json_response(StaffDetailResponse, with_fields(db_staff, site_count=len(db_staff.site_links)))
 
 @router.put("/{staff_id}", response_model=StaffResponse)
 def update_staff(staff_id: int, staff: StaffUpdate, db: Session = Depends(get_db)):
@@ -0,0 +1,113 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import List, Optional
+from app.config import settings
+from app.database import async_engine, engine, replica_router
+from app.models.user import User
+from app.schemas.system import (
+    AdmissionStats, AllocationReport, IdentityMapRoute, MemorySnapshot, MemoryStatus, PoolStats, ProfileSummary,
+    ReplicaStats,
+)
+from app.utils.admission import admission_controller
+from app.utils.auth import get_admin_user
+from app.utils.memory import GROUP_BY, identity_map_stats, memory_tracer
+from app.utils.pool_metrics import pool_stats
+from app.utils.profiling import collapsed_stacks, profile_store
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/pool", response_model=List[PoolStats])
+def get_pool_stats(current_user: User = Depends(get_admin_user)):
+    """Connection pool occupancy, checkout wait time and overflow events for this worker's
+    blocking and asyncio engines (admin only)"""
+    return [pool_stats(engine, "sync"), pool_stats(async_engine, "async")]
+
+
+@router.get("/replicas", response_model=ReplicaStats)
+def get_replica_stats(current_user: User = Depends(get_admin_user)):
+    """Read replica health, replication lag and read routing counters for this worker (admin only)"""
+    return replica_router.stats()
+
+
+@router.get("/admission", response_model=List[AdmissionStats])
+def get_admission_stats(current_user: User = Depends(get_admin_user)):
+    """Per route class concurrency, queue depth and rejected requests for this worker (admin only)"""
+    return admission_controller.stats()
+
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_profiles(current_user: User = Depends(get_admin_user)):
+    """Stored request profiles, newest first (admin only). Request one with ``X-Profile: 1``"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    current_user: User = Depends(get_admin_user),
+):
+    """One profile: the JSON call tree, or folded stacks for flame graph tools with ``format=collapsed`` (admin only)"""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(json.loads(path.read_text())))
+    return FileResponse(path, media_type="application/json", filename=path.name)
+
+
+@router.get("/memory", response_model=MemoryStatus)
+def get_memory_status(current_user: User = Depends(get_admin_user)):
+    """tracemalloc state, traced and resident memory, and the snapshots held by this worker (admin only)"""
+    return memory_tracer.status()
+
+
+@router.post("/memory/tracing", response_model=MemoryStatus)
+def start_memory_tracing(
+    frames: int = Query(settings.MEMORY_TRACE_FRAMES, ge=1, le=100),
+    current_user: User = Depends(get_admin_user),
+):
+    """Start tracemalloc in this worker, keeping ``frames`` frames per allocation (admin only)"""
+    memory_tracer.start(frames)
+    return memory_tracer.status()
+
+
+@router.delete("/memory/tracing", response_model=MemoryStatus)
+def stop_memory_tracing(current_user: User = Depends(get_admin_user)):
+    """Stop tracemalloc in this worker and free its traces; snapshots are kept (admin only)"""
+    memory_tracer.stop()
+    return memory_tracer.status()
+
+
+@router.post("/memory/snapshots", response_model=MemorySnapshot, status_code=status.HTTP_201_CREATED)
+def take_memory_snapshot(current_user: User = Depends(get_admin_user)):
+    """Snapshot this worker's traced allocations (admin only; tracing must be on)"""
+    if not memory_tracer.tracing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Memory tracing is off; start it with POST /api/system/memory/tracing",
+        )
+    return memory_tracer.take_snapshot()
+
+
+@router.get("/memory/snapshots/{snapshot_id}", response_model=AllocationReport)
+def get_memory_allocations(
+    snapshot_id: int,
+    compare_to: Optional[int] = Query(None, description="Earlier snapshot to diff against"),
+    group_by: str = Query("lineno", pattern=f"^({'|'.join(GROUP_BY)})$"),
+    limit: int = Query(25, ge=1, le=500),
+    current_user: User = Depends(get_admin_user),
+):
+    """Top allocation sites of a snapshot, or what changed since ``compare_to`` (admin only)"""
+    report = memory_tracer.allocations(snapshot_id, group_by, limit, compare_to)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return report
+
+
+@router.get("/memory/identity-maps", response_model=List[IdentityMapRoute])
+def get_identity_map_stats(current_user: User = Depends(get_admin_user)):
+    """Largest and average session identity map per route, and objects loaded, in this worker (admin only)"""
+    return identity_map_stats.routes()
@@ -0,0 +1,177 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app.api.dependencies import get_db
+from app.crud import tracking as crud_tracking
+from app.models.user import User
+from app.schemas.tracking import (
+    PositionBatch, PositionIngestResponse, LatestPositionResponse,
+    VehiclePositionResponse, TrackingBufferStats, SiteVisitResponse,
+    VehicleTripResponse, VehicleDailyRollupResponse, FleetReportRow, CompactionResult
+)
+from app.utils.auth import get_admin_user
+from app.utils.tracking import position_buffer, BufferFullError, to_utc_naive
+from app.utils.trips import track_compactor
+
+router = APIRouter(prefix="/api/tracking", tags=["tracking"])
+
+
+def _latest_response(row: dict) -> LatestPositionResponse:
+    return LatestPositionResponse(
+        plate=row["vehicle_registration_plate"],
+        timestamp=row["recorded_at"],
+        lat=row["latitude"],
+        lon=row["longitude"],
+        speed=row["speed"],
+    )
+
+
+@router.post("/positions", response_model=PositionIngestResponse, status_code=status.HTTP_202_ACCEPTED)
+def ingest_positions(batch: PositionBatch):
+    """Accept a batch of GPS fixes; they are written to the database asynchronously"""
+    try:
+        accepted, rejected_plates = position_buffer.ingest(batch.fixes)
+    except BufferFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Position buffer is full, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    return PositionIngestResponse(
+        accepted=accepted,
+        rejected=len(batch.fixes) - accepted,
+        rejected_plates=rejected_plates,
+    )
+
+
+@router.get("/positions/latest", response_model=List[LatestPositionResponse])
+def get_latest_positions():
+    """Get the latest known position of every tracked vehicle, including fixes other workers received"""
+    return [_latest_response(row) for row in position_buffer.latest_all()]
+
+
+@router.get("/positions/latest/{registration_plate}", response_model=LatestPositionResponse)
+def get_latest_position(registration_plate: str):
+    """Get the latest known position of a vehicle, including fixes other workers received"""
+    row = position_buffer.latest(registration_plate)
+    if row is None:
+        raise HTTPException(status_code=404, detail="No position recorded for this vehicle")
+    return _latest_response(row)
+
+
+@router.get("/vehicles/{registration_plate}/positions", response_model=List[VehiclePositionResponse])
+def get_position_history(
+    registration_plate: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(10000, ge=1, le=100000),
+    db: Session = Depends(get_db)
+):
+    """Get stored fixes for a vehicle (defaults to the last 24 hours)"""
+    end = to_utc_naive(end) if end else datetime.utcnow()
+    start = to_utc_naive(start) if start else end - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return crud_tracking.get_vehicle_positions(db, registration_plate, start, end, limit)
+
+
+@router.get("/stats", response_model=TrackingBufferStats)
+def get_tracking_stats():
+    """Get ingest buffer statistics"""
+    return position_buffer.stats()
+
+
+@router.post("/flush")
+def flush_positions(current_user: User = Depends(get_admin_user)):
+    """Write buffered fixes to the database immediately"""
+    return {"flushed": position_buffer.flush()}
+
+
+@router.get("/visits/site/{site_id}", response_model=List[SiteVisitResponse])
+def get_site_visits(
+    site_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    open_only: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get vehicle visits to a site detected by the geofence engine"""
+    return crud_tracking.get_site_visits(
+        db, site_id,
+        to_utc_naive(start) if start else None,
+        to_utc_naive(end) if end else None,
+        open_only, skip, limit
+    )
+
+
+@router.get("/visits/staff/{staff_id}", response_model=List[SiteVisitResponse])
+def get_staff_visits(
+    staff_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    open_only: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get site visits made in vehicles assigned to a staff member"""
+    return crud_tracking.get_staff_visits(
+        db, staff_id,
+        to_utc_naive(start) if start else None,
+        to_utc_naive(end) if end else None,
+        open_only, skip, limit
+    )
+
+
+@router.get("/vehicles/{registration_plate}/trips", response_model=List[VehicleTripResponse])
+def get_vehicle_trips(
+    registration_plate: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Get reconstructed trips with simplified paths (defaults to the last 7 days)"""
+    end = to_utc_naive(end) if end else datetime.utcnow()
+    start = to_utc_naive(start) if start else end - timedelta(days=7)
+    return crud_tracking.get_vehicle_trips(db, registration_plate, start, end, limit)
+
+
+@router.get("/vehicles/{registration_plate}/rollups", response_model=List[VehicleDailyRollupResponse])
+def get_vehicle_rollups(
+    registration_plate: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Get daily totals for a vehicle (defaults to the last 30 days)"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=30)
+    return crud_tracking.get_vehicle_rollups(db, registration_plate, start, end)
+
+
+@router.get("/reports/fleet", response_model=List[FleetReportRow])
+def get_fleet_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Get per-vehicle totals for a period from daily rollups (defaults to the last year)"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return crud_tracking.get_fleet_report(db, start, end)
+
+
+@router.post("/compact", response_model=CompactionResult)
+def compact_tracks(current_user: User = Depends(get_admin_user)):
+    """Run track compaction and raw position retention now"""
+    position_buffer.flush()
+    result = track_compactor.run_once(wait=False)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Track compaction is already running")
+    return result
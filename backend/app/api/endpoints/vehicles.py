@@ -1,32 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from pathlib import Path
 from datetime import datetime
-from app.api.dependencies import get_db
+from app.database import get_db, get_async_db
 from app.crud import vehicle as crud_vehicle
 from app.schemas.vehicle import VehicleCreate, VehicleUpdate, VehicleResponse, VehicleDetailResponse
 from app.models.staff import Staff
+from app.utils.compression import discard_precompressed, precompress_in_background, precompressed_file_response
+from app.utils.serialization import json_response, with_fields
+from app.utils.tracing import span
 
-# Create uploads directory if it doesn't exist
+# Created at startup (main.lifespan)
 UPLOAD_DIR = Path("uploads/vehicles")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 
 
 @router.get("", response_model=List[VehicleResponse])
-def get_vehicles(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db)):
+async def get_vehicles(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(get_async_db)):
     """Get all vehicles with pagination"""
-    vehicles = crud_vehicle.get_vehicles(db, skip=skip, limit=limit)
-    return vehicles
+    vehicles = await crud_vehicle.get_vehicles_async(db, skip=skip, limit=limit)
+    return json_response(List[VehicleResponse], vehicles)
 
 
 @router.get("/{registration_plate}", response_model=VehicleDetailResponse)
-def get_vehicle(registration_plate: str, db: Session = Depends(get_db)):
+async def get_vehicle(registration_plate: str, db: AsyncSession = Depends(get_async_db)):
     """Get a vehicle by registration plate"""
-    vehicle = crud_vehicle.get_vehicle(db, registration_plate)
+    vehicle = await crud_vehicle.get_vehicle_async(db, registration_plate)
     if not vehicle:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
     
@@ -36,15 +38,12 @@ def get_vehicle(registration_plate: str, db: Session = Depends(get_db)):
         "assigned_staff_surname": None
     }
     if vehicle.assigned_staff_id:
-        staff = db.query(Staff).filter(Staff.id == vehicle.assigned_staff_id).first()
+        staff = await db.get(Staff, vehicle.assigned_staff_id)
         if staff:
             staff_info["assigned_staff_name"] = staff.name
             staff_info["assigned_staff_surname"] = staff.surname
     
-    response = VehicleDetailResponse(
-        **{**vehicle.__dict__, **staff_info}
-    )
-    return response
+    return json_response(VehicleDetailResponse, with_fields(vehicle, **staff_info))
 
 
 @router.post("", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
@@ -86,12 +85,13 @@ def delete_vehicle(registration_plate: str, db: Session = Depends(get_db)):
 def get_vehicles_by_staff(staff_id: int, db: Session = Depends(get_db)):
     """Get all vehicles assigned to a specific staff member"""
     vehicles = crud_vehicle.get_vehicles_by_staff(db, staff_id)
-    return vehicles
+    return json_response(List[VehicleResponse], vehicles)
 
 
 @router.post("/{registration_plate}/upload")
 def upload_vehicle_file(
     registration_plate: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -127,8 +127,11 @@ def upload_vehicle_file(
         
         # Save file
         try:
-            with open(file_path, "wb") as f:
-                f.write(contents)
+            # A re-upload under the same name must not be served from stale compressed copies
+            discard_precompressed(file_path)
+            with span("file.write", {"file.path": str(file_path), "file.bytes": len(contents)}):
+                with open(file_path, "wb") as f:
+                    f.write(contents)
             print(f"DEBUG: File saved successfully")
         except IOError as e:
             print(f"DEBUG: IOError saving file: {str(e)}")
@@ -144,6 +147,9 @@ def upload_vehicle_file(
         except Exception as e:
             print(f"DEBUG: Exception updating vehicle: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to update vehicle record: {str(e)}")
+
+        # Compressed copies for downloads are written after the response is sent
+        background_tasks.add_task(precompress_in_background, file_path)
         
         return {
             "message": "File uploaded successfully",
@@ -173,6 +179,7 @@ def delete_vehicle_file(registration_plate: str, db: Session = Depends(get_db)):
         file_path = Path(vehicle.natis_document)
         if file_path.exists():
             file_path.unlink()
+        discard_precompressed(file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
     
@@ -190,7 +197,7 @@ def delete_vehicle_file(registration_plate: str, db: Session = Depends(get_db)):
     }
 
 @router.get("/{registration_plate}/download")
-def download_vehicle_file(registration_plate: str, db: Session = Depends(get_db)):
+def download_vehicle_file(registration_plate: str, request: Request, db: Session = Depends(get_db)):
     """Download a NATIS document file for a vehicle"""
     try:
         vehicle = crud_vehicle.get_vehicle(db, registration_plate)
@@ -207,8 +214,9 @@ def download_vehicle_file(registration_plate: str, db: Session = Depends(get_db)
         # Get original filename from the stored path
         filename = file_path.name
         
-        return FileResponse(
-            path=file_path,
+        return precompressed_file_response(
+            file_path,
+            request.headers.get("accept-encoding"),
             filename=filename,
             media_type='application/octet-stream'
         )
@@ -221,4 +229,4 @@ def download_vehicle_file(registration_plate: str, db: Session = Depends(get_db)
 def get_vehicles_by_type(vehicle_type: str, db: Session = Depends(get_db)):
     """Get all vehicles of a specific type"""
     vehicles = crud_vehicle.get_vehicles_by_type(db, vehicle_type)
-    return vehicles
+    return json_response(List[VehicleResponse], vehicles)
@@ -9,6 +9,139 @@ class Settings(BaseSettings):
     API_TITLE: str = "Kulkoni SA Power Station Management API"
     API_VERSION: str = "1.0.0"
 
+    # Production server (gunicorn.conf.py): worker processes forked from one preloaded app
+    SERVER_BIND: str = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+    WORKERS: int = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+    # Workers are replaced after this many requests, plus a random share of the jitter so they restart apart; 0 never
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    # On SIGTERM workers stop accepting connections and get this long to finish in-flight requests
+    WORKER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("WORKER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    # A worker that stops reporting in for this long is killed and replaced
+    WORKER_TIMEOUT_SECONDS: int = int(os.getenv("WORKER_TIMEOUT_SECONDS", "60"))
+
+    # Connection pool (sized for the 40-thread request threadpool plus background flushers)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+    # Server databases (PostgreSQL): connection health checks and per-statement limits
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    DB_CONNECT_TIMEOUT_SECONDS: int = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "10"))
+
+    # Read replicas (comma-separated URLs); GET requests read from them unless the client wrote recently
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+    REPLICA_LAG_CHECK_SECONDS: float = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+
+    # SQLite connection profile, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE_BYTES: int = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+
+    # SQL instrumentation: slow statements and query-heavy requests go to a rotating log
+    SQL_ECHO: bool = os.getenv("SQL_ECHO", "False").lower() == "true"
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    SQL_REQUEST_QUERY_WARN: int = int(os.getenv("SQL_REQUEST_QUERY_WARN", "50"))
+    SQL_REQUEST_DURATION_WARN_MS: float = float(os.getenv("SQL_REQUEST_DURATION_WARN_MS", "500"))
+    SQL_SLOWEST_PER_REQUEST: int = int(os.getenv("SQL_SLOWEST_PER_REQUEST", "5"))
+    SLOW_QUERY_LOG_FILE: str = os.getenv("SLOW_QUERY_LOG_FILE", "logs/slow_queries.log")
+    SLOW_QUERY_LOG_MAX_BYTES: int = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS: int = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+    # Schema migrations; set AUTO_MIGRATE=false when running `python -m app.migrations upgrade` at deploy time
+    AUTO_MIGRATE: bool = os.getenv("AUTO_MIGRATE", "True").lower() == "true"
+    # Workers starting together take turns at the startup tasks (default: a lock file per database in the temp directory)
+    STARTUP_LOCK_FILE: str = os.getenv("STARTUP_LOCK_FILE", "")
+
+    # Authenticated user cache; entries are reloaded when the users table version moves, the TTL bounds other hosts
+    AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+    AUTH_USER_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+
+    # Conditional GETs and response cache, keyed on per-table change counters shared through TABLE_VERSIONS_FILE
+    # (default: a file per database in the temp directory); disable when several hosts serve one database
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+    TABLE_VERSIONS_FILE: str = os.getenv("TABLE_VERSIONS_FILE", "")
+    # The dashboard aggregate is also recomputed at least this often, since its lists depend on the date
+    DASHBOARD_CACHE_SECONDS: float = float(os.getenv("DASHBOARD_CACHE_SECONDS", "30"))
+
+    # Response compression (br and zstd when their packages are installed, else gzip)
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    COMPRESSION_CONTENT_TYPES: str = os.getenv(
+        "COMPRESSION_CONTENT_TYPES", "application/json,text/,application/javascript,application/xml,image/svg+xml"
+    )
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_ZSTD_LEVEL: int = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+    # Uploaded documents are compressed once, off the request path, so a slower setting pays off
+    PRECOMPRESS_BROTLI_QUALITY: int = int(os.getenv("PRECOMPRESS_BROTLI_QUALITY", "9"))
+
+    # Serialize opted-in read responses from trusted ORM rows with orjson instead of revalidating them
+    FAST_JSON_ENABLED: bool = os.getenv("FAST_JSON_ENABLED", "True").lower() == "true"
+
+    # Admission control: concurrent /api requests per route class (together about the 40-thread request
+    # threadpool), how many more may queue, and how long they wait before a 503
+    ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "True").lower() == "true"
+    ADMISSION_READ_LIMIT: int = int(os.getenv("ADMISSION_READ_LIMIT", "24"))
+    ADMISSION_READ_QUEUE: int = int(os.getenv("ADMISSION_READ_QUEUE", "64"))
+    ADMISSION_WRITE_LIMIT: int = int(os.getenv("ADMISSION_WRITE_LIMIT", "8"))
+    ADMISSION_WRITE_QUEUE: int = int(os.getenv("ADMISSION_WRITE_QUEUE", "32"))
+    ADMISSION_UPLOAD_LIMIT: int = int(os.getenv("ADMISSION_UPLOAD_LIMIT", "4"))
+    ADMISSION_UPLOAD_QUEUE: int = int(os.getenv("ADMISSION_UPLOAD_QUEUE", "8"))
+    ADMISSION_AUTH_LIMIT: int = int(os.getenv("ADMISSION_AUTH_LIMIT", "4"))
+    ADMISSION_AUTH_QUEUE: int = int(os.getenv("ADMISSION_AUTH_QUEUE", "16"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+
+    # Request profiling: admins send X-Profile: 1, or a random share of requests is profiled; the newest
+    # PROFILE_MAX_FILES profiles are kept in PROFILE_DIR
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "logs/profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+    # Tracing: spans for sampled requests (and trusted requests whose traceparent is sampled), written by a background
+    # thread as JSON lines to TRACE_FILE or posted to an OTLP/HTTP collector; TRACE_EXPORTER=none turns it off
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "jsonl")
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    # Comma-separated CIDRs whose sampled traceparent is honoured (admin tokens are honoured from anywhere)
+    TRACE_TRUSTED_NETWORKS: str = os.getenv("TRACE_TRUSTED_NETWORKS", "")
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+    TRACE_FILE_MAX_BYTES: int = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+    TRACE_FILE_BACKUPS: int = int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_EXPORT_INTERVAL_SECONDS: float = float(os.getenv("TRACE_EXPORT_INTERVAL_SECONDS", "1"))
+    TRACE_QUEUE_MAX_SPANS: int = int(os.getenv("TRACE_QUEUE_MAX_SPANS", "10000"))
+
+    # Memory diagnostics: tracemalloc traceback depth and snapshots kept in memory (admin endpoints under
+    # /api/system/memory); requests whose session identity map grows beyond IDENTITY_MAP_WARN objects are logged
+    MEMORY_TRACE_FRAMES: int = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+    MEMORY_MAX_SNAPSHOTS: int = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "4"))
+    IDENTITY_MAP_WARN: int = int(os.getenv("IDENTITY_MAP_WARN", "5000"))
+
+    # Password hashing pool (bcrypt); calls beyond workers + queue get HTTP 429
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+
+    # Write-behind buffer for last_login and similar timestamps
+    WRITE_BEHIND_FLUSH_SECONDS: float = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "5"))
+
+    # Vehicle tracking ingestion
+    TRACKING_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("TRACKING_FLUSH_INTERVAL_SECONDS", "1.0"))
+    TRACKING_FLUSH_BATCH_SIZE: int = int(os.getenv("TRACKING_FLUSH_BATCH_SIZE", "5000"))
+    TRACKING_BUFFER_MAX_FIXES: int = int(os.getenv("TRACKING_BUFFER_MAX_FIXES", "100000"))
+    GEOFENCE_RADIUS_METERS: float = float(os.getenv("GEOFENCE_RADIUS_METERS", "500"))
+    TRACKING_COMPACTION_INTERVAL_SECONDS: float = float(os.getenv("TRACKING_COMPACTION_INTERVAL_SECONDS", "300"))
+    TRACKING_RAW_RETENTION_DAYS: int = int(os.getenv("TRACKING_RAW_RETENTION_DAYS", "30"))
+    TRACKING_SIMPLIFY_TOLERANCE_METERS: float = float(os.getenv("TRACKING_SIMPLIFY_TOLERANCE_METERS", "15"))
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, select, update
 from datetime import datetime
 from app.models.contract import Contract, ContractStatus, ContractSection, ContractLineItem
 from app.schemas.contract import (
@@ -344,3 +345,57 @@ def delete_line_item(db: Session, item_id: int) -> bool:
     db.delete(db_item)
     db.commit()
     return True
+
+
+# Async readers (for async def endpoints; relationships the responses use are loaded eagerly)
+
+def _sections_loader():
+    return selectinload(Contract.sections).selectinload(ContractSection.line_items)
+
+
+async def update_expired_contracts_async(db: AsyncSession) -> int:
+    """Mark active contracts past their end date as expired.
+
+    Only takes a write transaction when something actually expired, so the
+    common case stays a single read.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        select(Contract.id).where(and_(Contract.status == ContractStatus.ACTIVE, Contract.end_date < now))
+    )
+    expired_ids = list(result.scalars().all())
+    if not expired_ids:
+        return 0
+
+    await db.execute(
+        update(Contract)
+        .where(Contract.id.in_(expired_ids))
+        .values(status=ContractStatus.EXPIRED, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(expired_ids)
+
+
+async def get_contract_async(db: AsyncSession, contract_id: int) -> Contract | None:
+    """Get a contract by ID with its sections and line items"""
+    result = await db.execute(select(Contract).where(Contract.id == contract_id).options(_sections_loader()))
+    return result.scalar_one_or_none()
+
+
+async def get_contracts_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Contract]:
+    """Get all contracts with pagination"""
+    result = await db.execute(select(Contract).offset(skip).limit(limit).options(_sections_loader()))
+    return list(result.scalars().all())
+
+
+async def get_contracts_by_site_async(db: AsyncSession, site_id: int) -> list[Contract]:
+    """Get all contracts for a specific site"""
+    result = await db.execute(select(Contract).where(Contract.site_id == site_id).options(_sections_loader()))
+    return list(result.scalars().all())
+
+
+async def get_contracts_by_status_async(db: AsyncSession, status: ContractStatus) -> list[Contract]:
+    """Get all contracts with a specific status"""
+    result = await db.execute(select(Contract).where(Contract.status == status).options(_sections_loader()))
+    return list(result.scalars().all())
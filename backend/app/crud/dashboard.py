@@ -0,0 +1,169 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, case, func, select
+from datetime import date, datetime, timedelta
+from app.models.contract import Contract, ContractStatus, ContractType
+from app.models.meeting import Meeting
+from app.models.site import Site
+from app.models.staff import Staff
+from app.models.vehicle import Vehicle
+
+# Vehicles whose licence renewal falls within this many days count as expiring
+RENEWAL_WARNING_DAYS = 30
+
+_STATUS_FIELDS = {
+    ContractStatus.ACTIVE: "active_count",
+    ContractStatus.EXPIRED: "expired_count",
+    ContractStatus.COMPLETED: "completed_count",
+    ContractStatus.CANCELLED: "cancelled_count",
+}
+
+
+def _empty_contract_summary() -> dict:
+    return {
+        "total_contracts": 0,
+        "active_count": 0,
+        "expired_count": 0,
+        "completed_count": 0,
+        "cancelled_count": 0,
+        "overdue_count": 0,
+    }
+
+
+async def get_record_counts_async(db: AsyncSession) -> dict:
+    """Row counts of sites, staff, meetings and vehicles, in one statement"""
+    result = await db.execute(select(
+        select(func.count()).select_from(Site).scalar_subquery(),
+        select(func.count()).select_from(Staff).scalar_subquery(),
+        select(func.count()).select_from(Meeting).scalar_subquery(),
+        select(func.count()).select_from(Vehicle).scalar_subquery(),
+    ))
+    sites, staff, meetings, vehicles = result.one()
+    return {"sites": sites, "staff": staff, "meetings": meetings, "vehicles": vehicles}
+
+
+async def get_contract_summaries_async(db: AsyncSession) -> dict:
+    """Contract status counts overall and per contract type, from one grouped query"""
+    now = datetime.utcnow()
+    overdue = func.sum(case((and_(Contract.status == ContractStatus.ACTIVE, Contract.end_date < now), 1), else_=0))
+    result = await db.execute(
+        select(Contract.contract_type, Contract.status, func.count(), overdue)
+        .group_by(Contract.contract_type, Contract.status)
+    )
+    overall = _empty_contract_summary()
+    by_type = {contract_type.value: _empty_contract_summary() for contract_type in ContractType}
+    for contract_type, status, count, overdue_count in result.all():
+        for summary in (overall, by_type[ContractType(contract_type).value]):
+            summary["total_contracts"] += count
+            summary[_STATUS_FIELDS[ContractStatus(status)]] += count
+            summary["overdue_count"] += overdue_count or 0
+    return {"overall": overall, "by_type": by_type}
+
+
+async def get_fleet_registration_async(db: AsyncSession, today: date) -> dict:
+    """Vehicles whose licence is current, due for renewal within ``RENEWAL_WARNING_DAYS`` or expired"""
+    warning_date = today + timedelta(days=RENEWAL_WARNING_DAYS)
+    renewal = Vehicle.license_renewal_date
+    result = await db.execute(
+        select(
+            func.sum(case((renewal < today, 1), else_=0)),
+            func.sum(case((and_(renewal >= today, renewal <= warning_date), 1), else_=0)),
+            func.sum(case((renewal > warning_date, 1), else_=0)),
+        ).where(renewal.is_not(None))
+    )
+    expired, expiring, active = result.one()
+    return {
+        "active": active or 0,
+        "expiring": expiring or 0,
+        "expired": expired or 0,
+        "warning_days": RENEWAL_WARNING_DAYS,
+    }
+
+
+async def get_upcoming_meetings_async(db: AsyncSession, limit: int) -> list[dict]:
+    """The next scheduled meetings, soonest first"""
+    result = await db.execute(
+        select(Meeting.id, Meeting.site_id, Site.name, Meeting.scheduled_at)
+        .join(Site, Site.id == Meeting.site_id)
+        .where(Meeting.scheduled_at >= datetime.utcnow())
+        .order_by(Meeting.scheduled_at)
+        .limit(limit)
+    )
+    return [
+        {"id": meeting_id, "site_id": site_id, "site_name": site_name, "scheduled_at": scheduled_at}
+        for meeting_id, site_id, site_name, scheduled_at in result.all()
+    ]
+
+
+async def get_recent_meetings_async(db: AsyncSession, limit: int) -> list[dict]:
+    """The latest meetings that have already taken place, most recent first"""
+    result = await db.execute(
+        select(Meeting.id, Meeting.site_id, Site.name, Meeting.scheduled_at)
+        .join(Site, Site.id == Meeting.site_id)
+        .where(Meeting.scheduled_at < datetime.utcnow())
+        .order_by(Meeting.scheduled_at.desc())
+        .limit(limit)
+    )
+    return [
+        {"id": meeting_id, "site_id": site_id, "site_name": site_name, "scheduled_at": scheduled_at}
+        for meeting_id, site_id, site_name, scheduled_at in result.all()
+    ]
+
+
+async def get_ending_contracts_async(db: AsyncSession, limit: int) -> list[dict]:
+    """Active contracts closest to their end date"""
+    result = await db.execute(
+        select(Contract.id, Contract.contract_type, Contract.eskom_reference, Contract.site_id, Site.name,
+               Contract.end_date)
+        .join(Site, Site.id == Contract.site_id)
+        .where(and_(Contract.status == ContractStatus.ACTIVE, Contract.end_date >= datetime.utcnow()))
+        .order_by(Contract.end_date)
+        .limit(limit)
+    )
+    return [
+        {
+            "id": contract_id,
+            "contract_type": ContractType(contract_type).value,
+            "eskom_reference": eskom_reference,
+            "site_id": site_id,
+            "site_name": site_name,
+            "end_date": end_date,
+        }
+        for contract_id, contract_type, eskom_reference, site_id, site_name, end_date in result.all()
+    ]
+
+
+async def get_upcoming_renewals_async(db: AsyncSession, today: date, limit: int) -> list[dict]:
+    """Vehicles with the nearest licence renewal dates, overdue renewals first"""
+    result = await db.execute(
+        select(Vehicle.vehicle_registration_plate, Vehicle.make, Vehicle.model, Vehicle.license_renewal_date)
+        .where(Vehicle.license_renewal_date.is_not(None))
+        .order_by(Vehicle.license_renewal_date)
+        .limit(limit)
+    )
+    return [
+        {
+            "vehicle_registration_plate": plate,
+            "make": make,
+            "model": model,
+            "license_renewal_date": renewal_date,
+            "expired": renewal_date < today,
+        }
+        for plate, make, model, renewal_date in result.all()
+    ]
+
+
+async def get_dashboard_async(db: AsyncSession, limit: int = 5) -> dict:
+    """Every dashboard figure plus the top ``limit`` entries of each list, from aggregate queries only"""
+    today = datetime.utcnow().date()
+    contracts = await get_contract_summaries_async(db)
+    return {
+        "counts": await get_record_counts_async(db),
+        "contracts": contracts["overall"],
+        "contracts_by_type": contracts["by_type"],
+        "fleet_registration": await get_fleet_registration_async(db, today),
+        "upcoming_meetings": await get_upcoming_meetings_async(db, limit),
+        "recent_meetings": await get_recent_meetings_async(db, limit),
+        "ending_contracts": await get_ending_contracts_async(db, limit),
+        "upcoming_renewals": await get_upcoming_renewals_async(db, today, limit),
+        "generated_at": datetime.utcnow(),
+    }
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select
 from app.models.meeting import Meeting, MeetingItem
 from app.models.site import Site
 from app.models.staff import Staff
@@ -129,3 +130,24 @@ def delete_meeting(db: Session, meeting_id: int) -> bool:
 def get_site_meetings(db: Session, site_id: int) -> List[Meeting]:
     """Get all meetings for a site"""
     return db.query(Meeting).filter(Meeting.site_id == site_id).all()
+
+
+# Async readers (for async def endpoints; relationships the responses use are loaded eagerly)
+
+def _meeting_items_loader():
+    return selectinload(Meeting.items).selectinload(MeetingItem.responsible_staff)
+
+async def get_meeting_async(db: AsyncSession, meeting_id: int) -> Optional[Meeting]:
+    """Get a meeting by ID with its items and their responsible staff"""
+    result = await db.execute(
+        select(Meeting).where(Meeting.id == meeting_id).options(_meeting_items_loader())
+    )
+    return result.scalar_one_or_none()
+
+async def list_meetings_async(db: AsyncSession, skip: int = 0, limit: int = 100, site_id: Optional[int] = None) -> List[Meeting]:
+    """List meetings with optional site filter"""
+    query = select(Meeting).options(_meeting_items_loader())
+    if site_id:
+        query = query.where(Meeting.site_id == site_id)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return list(result.scalars().all())
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select
 from app.models.site import Site, SiteStaffLink
 from app.schemas.site import SiteCreate, SiteUpdate
 from typing import List, Optional
@@ -61,3 +62,26 @@ def get_site_meetings_count(db: Session, site_id: int) -> int:
     return db.query(func.count(Meeting.id)).filter(
         Meeting.site_id == site_id
     ).scalar() or 0
+
+
+# Async readers (for async def endpoints; relationships the responses use are loaded eagerly)
+
+async def get_site_with_staff_async(db: AsyncSession, site_id: int) -> Optional[Site]:
+    """Get a site by ID with its staff links and their staff loaded"""
+    result = await db.execute(
+        select(Site)
+        .where(Site.id == site_id)
+        .options(selectinload(Site.staff_links).selectinload(SiteStaffLink.staff))
+    )
+    return result.scalar_one_or_none()
+
+async def list_sites_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Site]:
+    """List all sites with pagination"""
+    result = await db.execute(select(Site).offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+async def get_site_meetings_count_async(db: AsyncSession, site_id: int) -> int:
+    """Get number of meetings for a site"""
+    from app.models.meeting import Meeting
+    result = await db.execute(select(func.count(Meeting.id)).where(Meeting.site_id == site_id))
+    return result.scalar() or 0
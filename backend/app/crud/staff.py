@@ -1,7 +1,9 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select
 from app.models.staff import Staff
 from app.models.site import SiteStaffLink
+from app.models.vehicle import Vehicle
 from app.schemas.staff import StaffCreate, StaffUpdate
 from typing import List, Optional
 
@@ -42,6 +44,10 @@ def delete_staff(db: Session, staff_id: int) -> bool:
     if not db_staff:
         return False
     
+    # vehicles.assigned_staff_id has no ON DELETE action; unassign so foreign keys hold
+    db.query(Vehicle).filter(Vehicle.assigned_staff_id == staff_id).update(
+        {Vehicle.assigned_staff_id: None}, synchronize_session=False
+    )
     db.delete(db_staff)
     db.commit()
     return True
@@ -51,3 +57,23 @@ def get_staff_site_count(db: Session, staff_id: int) -> int:
     return db.query(func.count(SiteStaffLink.id)).filter(
         SiteStaffLink.staff_id == staff_id
     ).scalar() or 0
+
+
+# Async readers (for async def endpoints; relationships the responses use are loaded eagerly)
+
+async def get_staff_async(db: AsyncSession, staff_id: int) -> Optional[Staff]:
+    """Get a staff member by ID with their site links loaded"""
+    result = await db.execute(
+        select(Staff).where(Staff.id == staff_id).options(selectinload(Staff.site_links))
+    )
+    return result.scalar_one_or_none()
+
+async def list_staff_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Staff]:
+    """List all staff members with pagination, with their sites loaded"""
+    result = await db.execute(
+        select(Staff)
+        .offset(skip)
+        .limit(limit)
+        .options(selectinload(Staff.site_links).selectinload(SiteStaffLink.site))
+    )
+    return list(result.scalars().all())
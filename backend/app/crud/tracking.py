@@ -0,0 +1,140 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select
+from datetime import date, datetime
+from typing import List, Optional
+from app.models.tracking import VehiclePosition, SiteVisit, VehicleTrip, VehicleDailyRollup
+from app.models.vehicle import Vehicle
+
+
+def get_vehicle_positions(
+    db: Session,
+    registration_plate: str,
+    start: datetime,
+    end: datetime,
+    limit: int = 10000,
+) -> List[VehiclePosition]:
+    """Get stored fixes for a vehicle within a time window, oldest first"""
+    return db.query(VehiclePosition).filter(
+        VehiclePosition.recorded_date >= start.date(),
+        VehiclePosition.recorded_date <= end.date(),
+        VehiclePosition.vehicle_registration_plate == registration_plate,
+        VehiclePosition.recorded_at >= start,
+        VehiclePosition.recorded_at <= end,
+    ).order_by(VehiclePosition.recorded_at).limit(limit).all()
+
+
+def get_latest_vehicle_position(db: Session, registration_plate: str) -> Optional[VehiclePosition]:
+    """Get the newest stored fix for a vehicle"""
+    return db.query(VehiclePosition).filter(
+        VehiclePosition.vehicle_registration_plate == registration_plate
+    ).order_by(VehiclePosition.recorded_at.desc()).first()
+
+
+def get_latest_positions(db: Session) -> List[VehiclePosition]:
+    """Get the newest stored fix of every vehicle"""
+    # One index seek per vehicle rather than grouping the whole position table
+    stored = aliased(VehiclePosition)
+    newest_id = (
+        select(stored.id)
+        .where(stored.vehicle_registration_plate == Vehicle.vehicle_registration_plate)
+        .order_by(stored.recorded_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return db.execute(
+        select(VehiclePosition).select_from(Vehicle).join(VehiclePosition, VehiclePosition.id == newest_id)
+    ).scalars().all()
+
+
+def _visits_query(db: Session, start: Optional[datetime], end: Optional[datetime], open_only: bool):
+    query = db.query(SiteVisit)
+    if start:
+        # A visit overlaps the window if it had not ended before the window started
+        query = query.filter((SiteVisit.departed_at.is_(None)) | (SiteVisit.departed_at >= start))
+    if end:
+        query = query.filter(SiteVisit.arrived_at <= end)
+    if open_only:
+        query = query.filter(SiteVisit.departed_at.is_(None))
+    return query
+
+
+def get_site_visits(
+    db: Session,
+    site_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    open_only: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[SiteVisit]:
+    """Get vehicle visits to a site, newest arrival first"""
+    return _visits_query(db, start, end, open_only).filter(
+        SiteVisit.site_id == site_id
+    ).order_by(SiteVisit.arrived_at.desc()).offset(skip).limit(limit).all()
+
+
+def get_staff_visits(
+    db: Session,
+    staff_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    open_only: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[SiteVisit]:
+    """Get site visits made in vehicles assigned to a staff member, newest arrival first"""
+    return _visits_query(db, start, end, open_only).filter(
+        SiteVisit.staff_id == staff_id
+    ).order_by(SiteVisit.arrived_at.desc()).offset(skip).limit(limit).all()
+
+
+def get_vehicle_trips(
+    db: Session,
+    registration_plate: str,
+    start: datetime,
+    end: datetime,
+    limit: int = 500,
+) -> List[VehicleTrip]:
+    """Get trips for a vehicle that started within a time window, oldest first"""
+    return db.query(VehicleTrip).filter(
+        VehicleTrip.vehicle_registration_plate == registration_plate,
+        VehicleTrip.started_at >= start,
+        VehicleTrip.started_at <= end,
+    ).order_by(VehicleTrip.started_at).limit(limit).all()
+
+
+def get_vehicle_rollups(db: Session, registration_plate: str, start: date, end: date) -> List[VehicleDailyRollup]:
+    """Get daily rollups for a vehicle, oldest first"""
+    return db.query(VehicleDailyRollup).filter(
+        VehicleDailyRollup.vehicle_registration_plate == registration_plate,
+        VehicleDailyRollup.day >= start,
+        VehicleDailyRollup.day <= end,
+    ).order_by(VehicleDailyRollup.day).all()
+
+
+def get_fleet_report(db: Session, start: date, end: date) -> List[dict]:
+    """Aggregate daily rollups into per-vehicle totals for a period"""
+    rows = db.query(
+        VehicleDailyRollup.vehicle_registration_plate,
+        func.sum(VehicleDailyRollup.km_driven),
+        func.sum(VehicleDailyRollup.moving_seconds),
+        func.sum(VehicleDailyRollup.trip_count),
+        func.sum(VehicleDailyRollup.sites_visited),
+        func.count(VehicleDailyRollup.id),
+    ).filter(
+        VehicleDailyRollup.day >= start,
+        VehicleDailyRollup.day <= end,
+    ).group_by(VehicleDailyRollup.vehicle_registration_plate).order_by(
+        VehicleDailyRollup.vehicle_registration_plate
+    ).all()
+    return [
+        {
+            "vehicle_registration_plate": plate,
+            "km_driven": round(km or 0, 3),
+            "hours_moving": round((seconds or 0) / 3600, 2),
+            "trip_count": trips or 0,
+            "site_visit_days": sites or 0,
+            "active_days": days,
+        }
+        for plate, km, seconds, trips, sites, days in rows
+    ]
@@ -1,10 +1,13 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from starlette.concurrency import run_in_threadpool
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate
-from app.utils.auth import get_password_hash, verify_password
+from app.utils.auth import get_password_hash, verify_password, verify_password_async, invalidate_cached_user
+from app.utils.write_behind import write_behind
 
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -59,6 +62,7 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
         setattr(db_user, field, value)
     
     db.commit()
+    invalidate_cached_user(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -70,7 +74,10 @@ def update_user_password(db: Session, user_id: int, new_password: str) -> Option
         return None
     
     db_user.hashed_password = get_password_hash(new_password)
+    # A password change revokes every token already issued to the user
+    db_user.token_version = (db_user.token_version or 0) + 1
     db.commit()
+    invalidate_cached_user(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -83,6 +90,7 @@ def delete_user(db: Session, user_id: int) -> bool:
     
     db.delete(db_user)
     db.commit()
+    invalidate_cached_user(user_id)
     return True
 
 
@@ -96,12 +104,45 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
-def update_last_login(db: Session, user_id: int) -> None:
-    """Update user's last login timestamp"""
-    db_user = get_user(db, user_id)
-    if db_user:
-        db_user.last_login = datetime.utcnow()
-        db.commit()
+def _get_user_for_login(db: Session, username: str) -> Optional[User]:
+    """Look up a user and give the connection back to the pool in the same worker call.
+
+    Releasing it in a separate threadpool hop could deadlock under load: every
+    worker thread waiting for a connection, every connection waiting for a thread.
+    The returned user stays loaded (detached) while bcrypt runs.
+    """
+    user = get_user_by_username(db, username)
+    db.close()
+    return user
+
+
+async def authenticate_user_async(db: Session, username: str, password: str) -> Tuple[Optional[User], float, float]:
+    """Authenticate without holding a worker thread while bcrypt runs.
+
+    Returns the user (or None) with the hashing queue wait and hash time in seconds.
+    """
+    user = await run_in_threadpool(_get_user_for_login, db, username)
+    if not user:
+        return None, 0.0, 0.0
+    valid, wait_seconds, hash_seconds = await verify_password_async(password, user.hashed_password)
+    return (user if valid else None), wait_seconds, hash_seconds
+
+
+def update_last_login(db: Session, user_id: int) -> datetime:
+    """Record user's last login timestamp (written in the background by the write-behind buffer)"""
+    now = datetime.utcnow()
+    write_behind.record(User, "last_login", user_id, now)
+    return now
+
+
+def _invalidate_flushed_users(model: type, column: str, keys: list) -> None:
+    """Drop cached principals once buffered user columns reach the database"""
+    if model is User:
+        for user_id in keys:
+            invalidate_cached_user(user_id)
+
+
+write_behind.add_flush_listener(_invalidate_flushed_users)
 
 
 def create_default_admin(db: Session) -> Optional[User]:
@@ -113,5 +154,9 @@ def create_default_admin(db: Session) -> Optional[User]:
             full_name="System Administrator",
             role=UserRole.ADMIN,
         )
-        return create_user(db, admin)
+        try:
+            return create_user(db, admin)
+        except IntegrityError:
+            # A worker on another host created it first
+            db.rollback()
     return None
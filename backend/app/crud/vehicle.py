@@ -1,8 +1,11 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.vehicle import Vehicle
 from app.models.staff import Staff
 from app.schemas.vehicle import VehicleCreate, VehicleUpdate
+from app.utils.tracking import position_buffer
 
 
 def get_vehicle(db: Session, registration_plate: str) -> Vehicle | None:
@@ -58,6 +61,7 @@ def create_vehicle(db: Session, vehicle: VehicleCreate) -> Vehicle:
     db.add(db_vehicle)
     db.commit()
     db.refresh(db_vehicle)
+    position_buffer.invalidate_tracked_vehicles()
     return db_vehicle
 
 
@@ -76,6 +80,7 @@ def update_vehicle(db: Session, registration_plate: str, vehicle_update: Vehicle
     db.add(db_vehicle)
     db.commit()
     db.refresh(db_vehicle)
+    position_buffer.invalidate_tracked_vehicles()
     return db_vehicle
 
 
@@ -87,4 +92,19 @@ def delete_vehicle(db: Session, registration_plate: str) -> bool:
     
     db.delete(db_vehicle)
     db.commit()
+    position_buffer.invalidate_tracked_vehicles()
+    position_buffer.forget(registration_plate)
     return True
+
+
+# Async readers (for async def endpoints)
+
+async def get_vehicle_async(db: AsyncSession, registration_plate: str) -> Vehicle | None:
+    """Get a vehicle by registration plate"""
+    return await db.get(Vehicle, registration_plate)
+
+
+async def get_vehicles_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Vehicle]:
+    """Get all vehicles with pagination"""
+    result = await db.execute(select(Vehicle).offset(skip).limit(limit))
+    return list(result.scalars().all())
@@ -1,117 +1,237 @@
-from sqlalchemy import create_engine
+import os
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app.utils.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+from app.utils.query_stats import instrument_engine
+from app.utils.replicas import Replica, ReplicaRouter
+from app.utils.table_versions import track_table_changes
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG,
-)
+# asyncio driver used for each backend by the async engine
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def apply_sqlite_pragmas(dbapi_connection, read_only: bool = False) -> None:
+    """Per-connection SQLite profile: WAL readers never block on the writer, and
+    synchronous=NORMAL is durable across application crashes in WAL mode"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _is_file_sqlite(database_url) -> bool:
+    return database_url.database not in (None, "", ":memory:")
+
+
+def _pool_options(poolclass=InstrumentedQueuePool) -> dict:
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+def build_engine(url: str, read_only: bool = False) -> Engine:
+    """Create an engine with the connection profile for the URL's backend.
 
-# Create session factory
+    ``read_only`` engines (replicas) reject writes at the connection level.
+    """
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+
+    if backend == "sqlite":
+        options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+            "echo": settings.SQL_ECHO,
+        }
+        if _is_file_sqlite(database_url):
+            # File databases get a QueuePool sized for threaded workers; in-memory
+            # databases keep SQLAlchemy's default single-connection pool
+            options.update(_pool_options())
+        sqlite_engine = create_engine(url, **options)
+        instrument_engine(sqlite_engine)
+        event.listen(
+            sqlite_engine, "connect", lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection, read_only)
+        )
+        return sqlite_engine
+
+    options = {
+        **_pool_options(),
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "echo": settings.SQL_ECHO,
+    }
+    if backend == "postgresql" and database_url.get_driver_name() == "psycopg2":
+        # Enforced server-side, so a runaway query cannot hold a pooled connection indefinitely
+        options["connect_args"] = {
+            "connect_timeout": settings.DB_CONNECT_TIMEOUT_SECONDS,
+            "options": f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"
+            + (" -c default_transaction_read_only=on" if read_only else ""),
+            "application_name": "ksa-psms",
+        }
+    server_engine = create_engine(url, **options)
+    instrument_engine(server_engine)
+    return server_engine
+
+
+def build_async_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    """Create an asyncio engine for the same database, with the same connection profile"""
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for '{backend}' databases")
+    async_url = database_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    if backend == "sqlite":
+        # In-memory databases are per connection, so the async engine cannot see the sync engine's data
+        options = {
+            "connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            "echo": settings.SQL_ECHO,
+        }
+        if _is_file_sqlite(database_url):
+            options.update(_pool_options(InstrumentedAsyncAdaptedQueuePool))
+        sqlite_engine = create_async_engine(async_url, **options)
+        instrument_engine(sqlite_engine.sync_engine)
+        event.listen(
+            sqlite_engine.sync_engine,
+            "connect",
+            lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection, read_only),
+        )
+        return sqlite_engine
+
+    options = {
+        **_pool_options(InstrumentedAsyncAdaptedQueuePool),
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "echo": settings.SQL_ECHO,
+    }
+    if backend == "postgresql":
+        options["connect_args"] = {
+            "timeout": settings.DB_CONNECT_TIMEOUT_SECONDS,
+            "server_settings": {
+                "statement_timeout": str(int(settings.DB_STATEMENT_TIMEOUT_MS)),
+                "application_name": "ksa-psms",
+            },
+        }
+        if read_only:
+            options["connect_args"]["server_settings"]["default_transaction_read_only"] = "on"
+    server_engine = create_async_engine(async_url, **options)
+    instrument_engine(server_engine.sync_engine)
+    return server_engine
+
+
+# Create database engines (blocking engine for threadpool endpoints, asyncio engine for async ones)
+engine = build_engine(settings.DATABASE_URL)
+async_engine = build_async_engine(settings.DATABASE_URL)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Committed writes bump per-table versions, which ETags and the response cache are keyed on
+track_table_changes()
+
+
+def _build_replica(index: int, url: str) -> Replica:
+    replica_engine = build_engine(url, read_only=True)
+    replica_async_engine = build_async_engine(url, read_only=True)
+    return Replica(
+        name=f"replica-{index}",
+        url=url,
+        engine=replica_engine,
+        session_factory=sessionmaker(autocommit=False, autoflush=False, bind=replica_engine),
+        async_engine=replica_async_engine,
+        async_session_factory=async_sessionmaker(replica_async_engine, autoflush=False, expire_on_commit=False),
+    )
+
+
+# Read replicas; with none configured every session comes from the primary
+replica_router = ReplicaRouter(
+    primary_session_factory=SessionLocal,
+    primary_async_session_factory=AsyncSessionLocal,
+    replicas=[
+        _build_replica(index, url.strip())
+        for index, url in enumerate(settings.DATABASE_REPLICA_URLS.split(","), start=1)
+        if url.strip()
+    ],
+    pin_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+)
+
+
+def _forget_inherited_connections() -> None:
+    """Drop pooled connections copied from the parent process without closing them (the parent still owns them).
+
+    Only the sync engines: async connections belong to the event loop that opened them, and the server master
+    never runs one. Recreating an asyncio pool this way also swaps its first-connect lock for a thread lock,
+    which deadlocks the first concurrent checkouts on the worker's event loop.
+    """
+    for pool_engine in (engine, *(replica.engine for replica in replica_router.replicas)):
+        pool_engine.dispose(close=False)
+
+
+# Pre-forking servers import the app once and fork workers from it (gunicorn.conf.py)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited_connections)
 
 # Base class for ORM models
 Base = declarative_base()
 
 # Import all models to ensure they are registered with SQLAlchemy
-from app.models import Site, SiteStaffLink, Staff, Meeting, MeetingItem, Contract, ContractType, ContractStatus, Vehicle, VehicleType, PrimaryUse, User, UserRole
+from app.models import Site, SiteStaffLink, Staff, Meeting, MeetingItem, Contract, ContractType, ContractStatus, Vehicle, VehicleType, PrimaryUse, User, UserRole, VehiclePosition, SiteVisit, VehicleTrip, VehicleDailyRollup, TrackCompactionState, ReplicationHeartbeat
 
-def get_db():
-    """Dependency for getting database session"""
+def get_db(request: Request = None):
+    """Dependency for getting database session.
+
+    GET/HEAD requests get a read-only replica session when a healthy replica is
+    configured and the client has not written recently; everything else gets the primary.
+    """
+    db = replica_router.session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_primary_db():
+    """Dependency for a primary session, for GET endpoints that also write"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db(request: Request = None):
+    """Dependency for getting an async database session (for async def endpoints), routed like get_db"""
+    async with replica_router.async_session(request) as db:
+        yield db
+
+async def get_async_primary_db():
+    """Dependency for an async primary session, for GET endpoints that also write"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
-    """Initialize database tables and apply lightweight migrations"""
-    Base.metadata.create_all(bind=engine)
+    """Check the schema version and apply pending migrations when AUTO_MIGRATE is on"""
+    from app.migrations import ensure_schema
 
-    # Ensure new columns are added for backwards compatibility (SQLite doesn't alter tables via SQLAlchemy)
-    from sqlalchemy import text
-    conn = engine.connect()
-    try:
-        if "sqlite" in str(engine.url):
-            res = conn.execute(text("PRAGMA table_info('staff')")).fetchall()
-            cols = [r[1] for r in res]
-            if 'surname' not in cols:
-                conn.execute(text("ALTER TABLE staff ADD COLUMN surname VARCHAR(255)") )
-            # Ensure meetings.scheduled_at exists
-            res2 = conn.execute(text("PRAGMA table_info('meetings')")).fetchall()
-            cols2 = [r[1] for r in res2]
-            if 'scheduled_at' not in cols2:
-                conn.execute(text("ALTER TABLE meetings ADD COLUMN scheduled_at DATETIME"))
-            # Migrate sites table columns
-            res3 = conn.execute(text("PRAGMA table_info('sites')")).fetchall()
-            cols3 = [r[1] for r in res3]
-            if 'contact_person' not in cols3:
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_person VARCHAR(255)"))
-            if 'contact_number' not in cols3:
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_number VARCHAR(20)"))
-            if 'contact_email' not in cols3:
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_email VARCHAR(255)"))
-            if 'coordinates' not in cols3:
-                conn.execute(text("ALTER TABLE sites ADD COLUMN coordinates VARCHAR(255)"))
-            # Ensure contracts.notes and contract_value exist
-            res4 = conn.execute(text("PRAGMA table_info('contracts')")).fetchall()
-            cols4 = [r[1] for r in res4]
-            if 'notes' not in cols4:
-                conn.execute(text("ALTER TABLE contracts ADD COLUMN notes TEXT"))
-            if 'contract_value' not in cols4:
-                conn.execute(text("ALTER TABLE contracts ADD COLUMN contract_value DECIMAL(15, 2)"))
-            # Remove internal reference columns if they exist (cleanup migration)
-            if 'internal_quotation_number' in cols4:
-                # SQLite doesn't support DROP COLUMN directly, so we skip it for SQLite
-                # but we note that the column exists and won't be used
-                pass
-            if 'internal_invoice_number' in cols4:
-                pass
-            # Add role column to site_staff_links table for role-based staff assignments
-            res5 = conn.execute(text("PRAGMA table_info('site_staff_links')")).fetchall()
-            cols5 = [r[1] for r in res5]
-            if 'role' not in cols5:
-                conn.execute(text("ALTER TABLE site_staff_links ADD COLUMN role VARCHAR(50)"))
-                # Update existing rows to have a role value (use the enum value)
-                conn.execute(text("UPDATE site_staff_links SET role = 'Site Manager' WHERE role IS NULL"))
-
-
-        else:
-            # Generic alter try - may succeed on Postgres/MySQL if column doesn't exist
-            try:
-                conn.execute(text("ALTER TABLE staff ADD COLUMN surname VARCHAR(255)"))
-            except Exception:
-                # If column exists or DB doesn't support, ignore
-                pass
-            try:
-                conn.execute(text("ALTER TABLE meetings ADD COLUMN scheduled_at TIMESTAMP"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_person VARCHAR(255)"))
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_number VARCHAR(20)"))
-                conn.execute(text("ALTER TABLE sites ADD COLUMN contact_email VARCHAR(255)"))
-                conn.execute(text("ALTER TABLE sites ADD COLUMN coordinates VARCHAR(255)"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE contracts ADD COLUMN notes TEXT"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE contracts ADD COLUMN contract_value DECIMAL(15, 2)"))
-            except Exception:
-                pass
-            # Remove internal reference columns from PostgreSQL/MySQL
-            try:
-                conn.execute(text("ALTER TABLE contracts DROP COLUMN IF EXISTS internal_quotation_number"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE contracts DROP COLUMN IF EXISTS internal_invoice_number"))
-            except Exception:
-                pass
-    finally:
-        conn.close()
+    return ensure_schema(engine, auto_migrate=settings.AUTO_MIGRATE)
@@ -0,0 +1,183 @@
+"""
+Versioned schema migrations.
+
+Migrations live in ``app/migrations/versions`` as modules named
+``m<NNNN>_<slug>.py`` that define ``VERSION``, ``DESCRIPTION`` and
+``upgrade(conn)``. Applied versions are recorded in the ``schema_version``
+table.
+
+At startup ``ensure_schema`` costs a single version query when the database is
+current. Otherwise it either applies pending migrations (``AUTO_MIGRATE``) or
+refuses to start, so production deployments can run
+``python -m app.migrations upgrade`` once, out of band, before starting workers.
+
+All DDL runs inside one transaction that holds a database-wide lock
+(``BEGIN IMMEDIATE`` on SQLite, an advisory lock on PostgreSQL), and the
+version is re-read once the lock is held, so concurrent processes never race.
+"""
+import importlib
+import logging
+import pkgutil
+import time
+from datetime import datetime
+from types import ModuleType
+from typing import List, Optional
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, func, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock; any process migrating this schema uses it
+ADVISORY_LOCK_KEY = 7_321_032
+
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class SchemaOutOfDateError(RuntimeError):
+    """Raised at startup when migrations are pending and auto-migration is off"""
+
+
+def load_migrations() -> List[ModuleType]:
+    """Import every migration module, ordered by VERSION"""
+    from app.migrations import versions
+
+    modules = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        if info.name.startswith("m"):
+            modules.append(importlib.import_module(f"{versions.__name__}.{info.name}"))
+    modules.sort(key=lambda m: m.VERSION)
+    seen = [m.VERSION for m in modules]
+    if len(seen) != len(set(seen)):
+        raise RuntimeError(f"Duplicate migration versions: {seen}")
+    return modules
+
+
+def head_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].VERSION if migrations else 0
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """Applied schema version, or None if the database has never been versioned"""
+    if not inspect(conn).has_table("schema_version"):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def _lock(conn: Connection) -> None:
+    """Begin the migration transaction holding a database-wide lock"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        # Takes the write lock now; other processes wait on busy_timeout
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialect == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def _record(conn: Connection, module: ModuleType) -> None:
+    conn.execute(schema_version.insert().values(
+        version=module.VERSION, description=module.DESCRIPTION, applied_at=datetime.utcnow()
+    ))
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: head); returns versions applied.
+
+    An empty database is created at head; any other ``target`` raises ValueError.
+    """
+    from app.database import Base
+
+    migrations = load_migrations()
+    head = migrations[-1].VERSION if migrations else 0
+    target = target if target is not None else head
+    applied: List[int] = []
+
+    with engine.connect() as conn:
+        _lock(conn)
+        existing_tables = set(inspect(conn).get_table_names())
+        version = current_version(conn)
+
+        if version is None and not (existing_tables - {"schema_version"}):
+            # Fresh database: build the current schema directly and stamp it. The models only
+            # describe the head schema, so an older version cannot be built this way.
+            if target != head:
+                raise ValueError(f"An empty database can only be created at the latest version ({head}), not {target}")
+            _version_metadata.create_all(bind=conn)
+            Base.metadata.create_all(bind=conn)
+            for module in migrations:
+                _record(conn, module)
+                applied.append(module.VERSION)
+            conn.commit()
+            logger.info("Created schema at version %s", head)
+            return applied
+
+        _version_metadata.create_all(bind=conn)
+
+        version = version or 0
+        for module in migrations:
+            if version < module.VERSION <= target:
+                logger.info("Applying migration %04d: %s", module.VERSION, module.DESCRIPTION)
+                module.upgrade(conn)
+                _record(conn, module)
+                applied.append(module.VERSION)
+        conn.commit()
+    return applied
+
+
+def stamp(engine: Engine, version: int) -> None:
+    """Mark migrations up to ``version`` as applied without running them"""
+    with engine.connect() as conn:
+        _lock(conn)
+        _version_metadata.create_all(bind=conn)
+        current = current_version(conn) or 0
+        for module in load_migrations():
+            if current < module.VERSION <= version:
+                _record(conn, module)
+        conn.commit()
+
+
+def ensure_schema(engine: Engine, auto_migrate: bool) -> dict:
+    """Startup check: one version query when current, migrate or fail otherwise"""
+    started = time.perf_counter()
+    head = head_version()
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version == head:
+        return {"version": version, "applied": [], "seconds": time.perf_counter() - started}
+    if not auto_migrate:
+        raise SchemaOutOfDateError(
+            f"Database schema is at version {version}, expected {head}. "
+            "Run `python -m app.migrations upgrade` before starting the API."
+        )
+    applied = upgrade(engine)
+    return {"version": head, "applied": applied, "seconds": time.perf_counter() - started}
+
+
+# Helpers for migration scripts
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    inspector = inspect(conn)
+    return inspector.has_table(table) and column in {c["name"] for c in inspector.get_columns(table)}
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> bool:
+    """``ALTER TABLE table ADD COLUMN column ddl`` unless the column already exists"""
+    if has_column(conn, table, column):
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return True
+
+
+def drop_column(conn: Connection, table: str, column: str) -> bool:
+    """Drop a column if present (skipped on SQLite, which cannot drop constrained columns reliably)"""
+    if conn.dialect.name == "sqlite" or not has_column(conn, table, column):
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+    return True
@@ -0,0 +1,56 @@
+"""
+Schema migration CLI.
+
+    python -m app.migrations upgrade [--to VERSION]
+    python -m app.migrations current
+    python -m app.migrations history
+    python -m app.migrations stamp VERSION
+
+Run ``upgrade`` once per deploy, before starting API workers with
+``AUTO_MIGRATE=false``.
+"""
+import argparse
+import logging
+import sys
+from app.database import engine
+from app.migrations import current_version, head_version, load_migrations, stamp, upgrade
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Manage the database schema version")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="Target version (default: latest)")
+    commands.add_parser("current", help="Print the applied and latest versions")
+    commands.add_parser("history", help="List known migrations")
+    stamp_parser = commands.add_parser("stamp", help="Mark migrations as applied without running them")
+    stamp_parser.add_argument("version", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "upgrade":
+        try:
+            applied = upgrade(engine, target=args.to)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"Applied: {', '.join(str(v) for v in applied)}" if applied else "Already up to date")
+    elif args.command == "current":
+        with engine.connect() as conn:
+            version = current_version(conn)
+        print(f"current: {version if version is not None else 'unversioned'}")
+        print(f"head:    {head_version()}")
+    elif args.command == "history":
+        with engine.connect() as conn:
+            version = current_version(conn) or 0
+        for module in load_migrations():
+            marker = "x" if module.VERSION <= version else " "
+            print(f"[{marker}] {module.VERSION:04d} {module.DESCRIPTION}")
+    elif args.command == "stamp":
+        stamp(engine, args.version)
+        print(f"Stamped at {args.version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Ordered migration scripts; see ``app.migrations`` for the module contract"""
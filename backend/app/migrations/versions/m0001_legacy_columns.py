@@ -0,0 +1,36 @@
+"""
+Bring a pre-versioning database up to the first versioned schema.
+
+Databases created before ``schema_version`` existed were built by
+``create_all`` plus the column probing that used to run in ``init_db`` on every
+start. This migration creates any missing tables and adds the columns that
+probing used to add, then never runs again.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.migrations import add_column, drop_column
+
+VERSION = 1
+DESCRIPTION = "Legacy columns added by init_db before versioned migrations"
+
+
+def upgrade(conn: Connection) -> None:
+    from app.database import Base
+
+    Base.metadata.create_all(bind=conn)
+    datetime_type = "DATETIME" if conn.dialect.name == "sqlite" else "TIMESTAMP"
+
+    add_column(conn, "staff", "surname", "VARCHAR(255)")
+    add_column(conn, "meetings", "scheduled_at", datetime_type)
+    add_column(conn, "sites", "contact_person", "VARCHAR(255)")
+    add_column(conn, "sites", "contact_number", "VARCHAR(20)")
+    add_column(conn, "sites", "contact_email", "VARCHAR(255)")
+    add_column(conn, "sites", "coordinates", "VARCHAR(255)")
+    add_column(conn, "contracts", "notes", "TEXT")
+    add_column(conn, "contracts", "contract_value", "DECIMAL(15, 2)")
+    # Internal reference columns are no longer used; SQLite keeps them in place
+    drop_column(conn, "contracts", "internal_quotation_number")
+    drop_column(conn, "contracts", "internal_invoice_number")
+    if add_column(conn, "site_staff_links", "role", "VARCHAR(50)"):
+        conn.execute(text("UPDATE site_staff_links SET role = 'Site Manager' WHERE role IS NULL"))
+    add_column(conn, "users", "token_version", "INTEGER NOT NULL DEFAULT 0")
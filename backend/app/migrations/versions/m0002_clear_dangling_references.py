@@ -0,0 +1,20 @@
+"""
+Clear references that foreign key enforcement would reject.
+
+SQLite connections now run with ``PRAGMA foreign_keys=ON``. Rows written while
+enforcement was off may point at staff that no longer exist; such a vehicle
+would make every geofence visit insert fail, so the dangling ids are nulled.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+VERSION = 2
+DESCRIPTION = "Null vehicle staff assignments that point at deleted staff"
+
+
+def upgrade(conn: Connection) -> None:
+    conn.execute(text(
+        "UPDATE vehicles SET assigned_staff_id = NULL "
+        "WHERE assigned_staff_id IS NOT NULL "
+        "AND assigned_staff_id NOT IN (SELECT id FROM staff)"
+    ))
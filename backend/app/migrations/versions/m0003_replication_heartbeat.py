@@ -0,0 +1,11 @@
+"""Add the heartbeat table used to measure read replica lag."""
+from sqlalchemy.engine import Connection
+
+VERSION = 3
+DESCRIPTION = "Replication heartbeat table"
+
+
+def upgrade(conn: Connection) -> None:
+    from app.models.replication import ReplicationHeartbeat
+
+    ReplicationHeartbeat.__table__.create(bind=conn, checkfirst=True)
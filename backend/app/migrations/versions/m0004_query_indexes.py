@@ -0,0 +1,29 @@
+"""
+Index the filters the CRUD layer uses that previously read whole tables.
+
+``scripts/check_query_plans.py`` found full scans for contract status and
+expiry filters, per-type contract summaries, vehicle lookups by staff, type and
+primary use, and staff deletes cascading through ``meeting_item_staff``.
+``meetings.scheduled_at`` backs date-ordered meeting views. The definitions
+live on the models; this creates the ones an existing database is missing.
+"""
+from sqlalchemy.engine import Connection
+
+VERSION = 4
+DESCRIPTION = "Indexes for contract, vehicle and meeting filters"
+
+INDEXES = {
+    "contracts": ("ix_contracts_status_end_date", "ix_contracts_type_status"),
+    "vehicles": ("ix_vehicles_assigned_staff_id", "ix_vehicles_vehicle_type", "ix_vehicles_primary_use"),
+    "meetings": ("ix_meetings_scheduled_at",),
+    "meeting_item_staff": ("ix_meeting_item_staff_staff_id",),
+}
+
+
+def upgrade(conn: Connection) -> None:
+    from app.database import Base
+
+    for table_name, index_names in INDEXES.items():
+        indexes = {index.name: index for index in Base.metadata.tables[table_name].indexes}
+        for name in index_names:
+            indexes[name].create(bind=conn, checkfirst=True)
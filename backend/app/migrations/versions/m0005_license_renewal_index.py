@@ -0,0 +1,18 @@
+"""
+Index vehicle licence renewal dates.
+
+The dashboard counts vehicles by renewal status and lists the nearest renewals,
+both filtered and ordered on ``vehicles.license_renewal_date``. The definition
+lives on the model; this creates it on an existing database.
+"""
+from sqlalchemy.engine import Connection
+
+VERSION = 5
+DESCRIPTION = "Index for vehicle licence renewal dates"
+
+
+def upgrade(conn: Connection) -> None:
+    from app.database import Base
+
+    indexes = {index.name: index for index in Base.metadata.tables["vehicles"].indexes}
+    indexes["ix_vehicles_license_renewal_date"].create(bind=conn, checkfirst=True)
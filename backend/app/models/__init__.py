@@ -4,5 +4,7 @@ from app.models.meeting import Meeting, MeetingItem
 from app.models.contract import Contract, ContractType, ContractStatus
 from app.models.vehicle import Vehicle, VehicleType, PrimaryUse
 from app.models.user import User, UserRole
+from app.models.tracking import VehiclePosition, SiteVisit, VehicleTrip, VehicleDailyRollup, TrackCompactionState
+from app.models.replication import ReplicationHeartbeat
 
-__all__ = ["Site", "SiteStaffLink", "Staff", "Meeting", "MeetingItem", "Contract", "ContractType", "ContractStatus", "Vehicle", "VehicleType", "PrimaryUse", "User", "UserRole"]
+__all__ = ["Site", "SiteStaffLink", "Staff", "Meeting", "MeetingItem", "Contract", "ContractType", "ContractStatus", "Vehicle", "VehicleType", "PrimaryUse", "User", "UserRole", "VehiclePosition", "SiteVisit", "VehicleTrip", "VehicleDailyRollup", "TrackCompactionState", "ReplicationHeartbeat"]
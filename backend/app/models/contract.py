@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Numeric, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -22,6 +22,11 @@ class ContractStatus(str, enum.Enum):
 class Contract(Base):
     """Contract model for power station service/supply agreements"""
     __tablename__ = "contracts"
+    __table_args__ = (
+        # Status filters, the expiry sweep (status + end_date) and per-type summaries
+        Index("ix_contracts_status_end_date", "status", "end_date"),
+        Index("ix_contracts_type_status", "contract_type", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -9,6 +9,8 @@ meeting_item_staff = Table(
     Base.metadata,
     Column("meeting_item_id", Integer, ForeignKey("meeting_items.id", ondelete="CASCADE"), primary_key=True),
     Column("staff_id", Integer, ForeignKey("staff.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key leads with meeting_item_id; lookups and cascades by staff need their own index
+    Index("ix_meeting_item_staff_staff_id", "staff_id"),
 )
 
 class Meeting(Base):
@@ -22,7 +24,7 @@ class Meeting(Base):
     apologies = Column(Text, nullable=True)
     chairperson_staff_id = Column(Integer, ForeignKey("staff.id", ondelete="SET NULL"), nullable=True, index=True)
     introduction = Column(Text, nullable=True)
-    scheduled_at = Column(DateTime, nullable=True)
+    scheduled_at = Column(DateTime, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
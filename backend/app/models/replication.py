@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime
+from app.database import Base
+
+
+class ReplicationHeartbeat(Base):
+    """Single-row heartbeat written to the primary and read back from replicas.
+
+    The age of the value a replica returns is its replication lag, independent
+    of backend (streaming PostgreSQL replicas or periodically copied SQLite files).
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
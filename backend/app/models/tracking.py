@@ -0,0 +1,118 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Float, Text, Date, DateTime, ForeignKey, Index, UniqueConstraint
+from app.database import Base
+
+
+class VehiclePosition(Base):
+    """Append-only GPS fix reported by a tracked vehicle.
+
+    Rows are never updated. ``recorded_date`` is the partition key: history
+    queries and retention always filter on it, so old days can be dropped as
+    whole ranges rather than row by row.
+    """
+    __tablename__ = "vehicle_positions"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    vehicle_registration_plate = Column(
+        String(255), ForeignKey("vehicles.vehicle_registration_plate", ondelete="CASCADE"), nullable=False
+    )
+    recorded_date = Column(Date, nullable=False)  # Partition key (UTC day of recorded_at)
+    recorded_at = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    speed = Column(Float, nullable=True)  # km/h
+
+    __table_args__ = (
+        Index("ix_vehicle_positions_partition", "recorded_date", "vehicle_registration_plate", "recorded_at"),
+        Index("ix_vehicle_positions_plate_time", "vehicle_registration_plate", "recorded_at"),
+    )
+
+    def __repr__(self):
+        return f"<VehiclePosition(plate={self.vehicle_registration_plate}, recorded_at={self.recorded_at})>"
+
+
+class SiteVisit(Base):
+    """Interval during which a tracked vehicle was inside a site's geofence.
+
+    ``departed_at`` is NULL while the vehicle is still on site. ``staff_id`` is
+    the vehicle's assigned staff member at arrival time.
+    """
+    __tablename__ = "site_visits"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_registration_plate = Column(
+        String(255), ForeignKey("vehicles.vehicle_registration_plate", ondelete="CASCADE"), nullable=False
+    )
+    site_id = Column(Integer, ForeignKey("sites.id", ondelete="CASCADE"), nullable=False)
+    staff_id = Column(Integer, ForeignKey("staff.id", ondelete="SET NULL"), nullable=True)
+    arrived_at = Column(DateTime, nullable=False)
+    departed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_site_visits_site_arrived", "site_id", "arrived_at"),
+        Index("ix_site_visits_staff_arrived", "staff_id", "arrived_at"),
+        Index("ix_site_visits_vehicle_arrived", "vehicle_registration_plate", "arrived_at"),
+    )
+
+    def __repr__(self):
+        return f"<SiteVisit(plate={self.vehicle_registration_plate}, site_id={self.site_id}, arrived_at={self.arrived_at})>"
+
+
+class VehicleTrip(Base):
+    """Continuous period of movement reconstructed from raw positions"""
+    __tablename__ = "vehicle_trips"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_registration_plate = Column(
+        String(255), ForeignKey("vehicles.vehicle_registration_plate", ondelete="CASCADE"), nullable=False
+    )
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    start_latitude = Column(Float, nullable=False)
+    start_longitude = Column(Float, nullable=False)
+    end_latitude = Column(Float, nullable=False)
+    end_longitude = Column(Float, nullable=False)
+    distance_km = Column(Float, nullable=False, default=0)
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    max_speed = Column(Float, nullable=True)  # km/h
+    point_count = Column(Integer, nullable=False, default=0)  # Raw fixes in the trip
+    path = Column(Text, nullable=True)  # Simplified track as JSON [[lat, lon], ...]
+
+    __table_args__ = (
+        Index("ix_vehicle_trips_vehicle_started", "vehicle_registration_plate", "started_at"),
+    )
+
+    def __repr__(self):
+        return f"<VehicleTrip(plate={self.vehicle_registration_plate}, started_at={self.started_at}, km={self.distance_km})>"
+
+
+class VehicleDailyRollup(Base):
+    """Per-vehicle, per-day totals maintained by the track compactor"""
+    __tablename__ = "vehicle_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vehicle_registration_plate = Column(
+        String(255), ForeignKey("vehicles.vehicle_registration_plate", ondelete="CASCADE"), nullable=False
+    )
+    day = Column(Date, nullable=False)
+    km_driven = Column(Float, nullable=False, default=0)
+    moving_seconds = Column(Integer, nullable=False, default=0)
+    trip_count = Column(Integer, nullable=False, default=0)
+    sites_visited = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("vehicle_registration_plate", "day", name="uq_vehicle_rollup_day"),
+        Index("ix_vehicle_daily_rollups_day", "day"),
+    )
+
+    def __repr__(self):
+        return f"<VehicleDailyRollup(plate={self.vehicle_registration_plate}, day={self.day}, km={self.km_driven})>"
+
+
+class TrackCompactionState(Base):
+    """High-water mark of raw positions already folded into trips and rollups"""
+    __tablename__ = "track_compaction_state"
+
+    vehicle_registration_plate = Column(
+        String(255), ForeignKey("vehicles.vehicle_registration_plate", ondelete="CASCADE"), primary_key=True
+    )
+    processed_until = Column(DateTime, nullable=False)
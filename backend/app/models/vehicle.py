@@ -32,13 +32,13 @@ class Vehicle(Base):
     description = Column(String(500), nullable=True)
     year = Column(Integer, nullable=False)
     vin_chassis_number = Column(String(255), nullable=True)
-    vehicle_type = Column(String(50), nullable=False)  # Bakkie / LDV, SUV / XUV, Sedan, Hatchback, Minibus / Stationwagon, Trailer
+    vehicle_type = Column(String(50), nullable=False, index=True)  # Bakkie / LDV, SUV / XUV, Sedan, Hatchback, Minibus / Stationwagon, Trailer
     colour = Column(String(100), nullable=True)
     purchase_date = Column(Date, nullable=True)
     active_tracking = Column(Boolean, default=True, nullable=False)
-    assigned_staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True)
-    primary_use = Column(String(50), nullable=False)  # Delivery, Sales, Executive, Pool Vehicle, Service
-    license_renewal_date = Column(Date, nullable=True)
+    assigned_staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True, index=True)
+    primary_use = Column(String(50), nullable=False, index=True)  # Delivery, Sales, Executive, Pool Vehicle, Service
+    license_renewal_date = Column(Date, nullable=True, index=True)
     general_notes = Column(String(1000), nullable=True)
     natis_document = Column(String(500), nullable=True)  # File path or URL
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
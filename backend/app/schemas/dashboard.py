@@ -0,0 +1,60 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from app.schemas.contract import ContractSummary
+
+
+class RecordCounts(BaseModel):
+    """Number of records of each kind"""
+    sites: int = 0
+    staff: int = 0
+    meetings: int = 0
+    vehicles: int = 0
+
+
+class FleetRegistrationSummary(BaseModel):
+    """Vehicles by licence renewal status (vehicles without a renewal date are not counted)"""
+    active: int = 0
+    expiring: int = 0
+    expired: int = 0
+    warning_days: int
+
+
+class DashboardMeeting(BaseModel):
+    """A meeting in a dashboard list"""
+    id: int
+    site_id: int
+    site_name: str
+    scheduled_at: Optional[datetime] = None
+
+
+class DashboardContract(BaseModel):
+    """An active contract nearing its end date"""
+    id: int
+    contract_type: str
+    eskom_reference: Optional[str] = None
+    site_id: int
+    site_name: str
+    end_date: datetime
+
+
+class DashboardRenewal(BaseModel):
+    """A vehicle with an upcoming (or missed) licence renewal"""
+    vehicle_registration_plate: str
+    make: str
+    model: str
+    license_renewal_date: date
+    expired: bool = False
+
+
+class DashboardResponse(BaseModel):
+    """Everything the dashboard shows, in one response"""
+    counts: RecordCounts
+    contracts: ContractSummary
+    contracts_by_type: Dict[str, ContractSummary]
+    fleet_registration: FleetRegistrationSummary
+    upcoming_meetings: List[DashboardMeeting] = []
+    recent_meetings: List[DashboardMeeting] = []
+    ending_contracts: List[DashboardContract] = []
+    upcoming_renewals: List[DashboardRenewal] = []
+    generated_at: datetime
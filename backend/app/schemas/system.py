@@ -0,0 +1,123 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class PoolStats(BaseModel):
+    """Database connection pool usage for the current worker process"""
+    engine: str = "sync"
+    backend: str
+    pool_class: str
+    size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts_total: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    wait_seconds_avg: float = 0.0
+    slow_checkouts_total: int = 0
+    overflow_events_total: int = 0
+    timeouts_total: int = 0
+    connects_total: int = 0
+    invalidations_total: int = 0
+    peak_checked_out: int = 0
+
+
+class ReplicaStatus(BaseModel):
+    """Health and lag of one read replica"""
+    name: str
+    url: str
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    last_checked_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    reads_routed: int = 0
+
+
+class ReplicaStats(BaseModel):
+    """Read routing counters for the current worker process"""
+    pin_seconds: float
+    max_lag_seconds: float
+    fallback_reads: int = 0
+    pinned_reads: int = 0
+    pinned_clients: int = 0
+    replicas: List[ReplicaStatus] = []
+
+
+class AdmissionStats(BaseModel):
+    """Concurrency budget, wait queue and shedding counters of one route class"""
+    route_class: str
+    limit: int
+    max_queue: int
+    queue_timeout_seconds: float
+    in_flight: int = 0
+    waiting: int = 0
+    admitted: int = 0
+    queued: int = 0
+    rejected: Dict[str, int] = {}
+    wait_seconds_total: float = 0.0
+
+
+class ProfileSummary(BaseModel):
+    """A stored request profile, without its call tree"""
+    id: str
+    method: str
+    path: str
+    trigger: str
+    created_at: datetime
+    status: Optional[int] = None
+    duration_ms: float
+    samples: int
+    sql_ms: Optional[float] = None
+    size_bytes: int
+
+
+class MemorySnapshot(BaseModel):
+    """A tracemalloc snapshot held by the current worker process"""
+    id: int
+    taken_at: datetime
+    traced_bytes: int
+    traceback_limit: int
+
+
+class MemoryStatus(BaseModel):
+    """Tracing state and memory use of the current worker process"""
+    pid: int
+    tracing: bool
+    traceback_limit: Optional[int] = None
+    traced_bytes: int = 0
+    traced_peak_bytes: int = 0
+    tracemalloc_overhead_bytes: int = 0
+    rss_bytes: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+    snapshots: List[MemorySnapshot] = []
+
+
+class AllocationSite(BaseModel):
+    """Memory allocated from one site (most recent frame first), or its change between snapshots"""
+    frames: List[str]
+    size_bytes: int
+    count: int
+    size_diff_bytes: Optional[int] = None
+    count_diff: Optional[int] = None
+
+
+class AllocationReport(BaseModel):
+    """Top allocation sites of a snapshot, or the largest changes against an earlier one"""
+    snapshot: MemorySnapshot
+    compared_to: Optional[MemorySnapshot] = None
+    group_by: str
+    total_bytes: int
+    sites: List[AllocationSite] = []
+
+
+class IdentityMapRoute(BaseModel):
+    """Session identity map sizes of one route's requests in the current worker process"""
+    method: str
+    route: str
+    requests: int
+    peak_max: int
+    peak_avg: float
+    loaded_total: int
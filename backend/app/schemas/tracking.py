@@ -0,0 +1,132 @@
+from pydantic import BaseModel, Field, field_validator
+import json
+from datetime import date, datetime
+from typing import Optional, List
+
+
+class PositionFix(BaseModel):
+    """A single GPS fix reported by a vehicle tracker"""
+    plate: str = Field(..., max_length=255, description="Vehicle registration plate")
+    timestamp: datetime = Field(..., description="Time the fix was recorded (UTC if no offset given)")
+    lat: float = Field(..., ge=-90, le=90, description="Latitude in decimal degrees")
+    lon: float = Field(..., ge=-180, le=180, description="Longitude in decimal degrees")
+    speed: Optional[float] = Field(None, ge=0, description="Speed in km/h")
+
+
+class PositionBatch(BaseModel):
+    """Batch of GPS fixes, possibly from several vehicles"""
+    fixes: List[PositionFix] = Field(..., max_length=10000)
+
+
+class PositionIngestResponse(BaseModel):
+    """Result of accepting a batch of fixes into the ingest buffer"""
+    accepted: int = 0
+    rejected: int = 0
+    rejected_plates: List[str] = Field(default_factory=list)
+
+
+class LatestPositionResponse(BaseModel):
+    """Most recent known position of a tracked vehicle"""
+    plate: str
+    timestamp: datetime
+    lat: float
+    lon: float
+    speed: Optional[float] = None
+
+
+class VehiclePositionResponse(BaseModel):
+    """Stored GPS fix"""
+    vehicle_registration_plate: str
+    recorded_at: datetime
+    latitude: float
+    longitude: float
+    speed: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TrackingBufferStats(BaseModel):
+    """Ingest buffer counters"""
+    buffered: int = 0
+    accepted_total: int = 0
+    flushed_total: int = 0
+    dropped_total: int = 0
+    rejected_total: int = 0
+    flush_count: int = 0
+    last_flush_at: Optional[datetime] = None
+    last_flush_seconds: Optional[float] = None
+    tracked_vehicles: int = 0
+
+
+class SiteVisitResponse(BaseModel):
+    """Vehicle visit to a site, detected by the geofence engine"""
+    id: int
+    vehicle_registration_plate: str
+    site_id: int
+    staff_id: Optional[int] = None
+    arrived_at: datetime
+    departed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class VehicleTripResponse(BaseModel):
+    """Trip reconstructed by the track compactor"""
+    id: int
+    vehicle_registration_plate: str
+    started_at: datetime
+    ended_at: datetime
+    start_latitude: float
+    start_longitude: float
+    end_latitude: float
+    end_longitude: float
+    distance_km: float
+    duration_seconds: int
+    max_speed: Optional[float] = None
+    point_count: int
+    path: List[List[float]] = Field(default_factory=list, description="Simplified track as [lat, lon] pairs")
+
+    @field_validator("path", mode="before")
+    @classmethod
+    def parse_path(cls, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    class Config:
+        from_attributes = True
+
+
+class VehicleDailyRollupResponse(BaseModel):
+    """Per-vehicle totals for one day"""
+    vehicle_registration_plate: str
+    day: date
+    km_driven: float
+    moving_seconds: int
+    trip_count: int
+    sites_visited: int
+
+    class Config:
+        from_attributes = True
+
+
+class FleetReportRow(BaseModel):
+    """Per-vehicle totals over a report period"""
+    vehicle_registration_plate: str
+    km_driven: float = 0
+    hours_moving: float = 0
+    trip_count: int = 0
+    site_visit_days: int = 0  # Sum of distinct sites visited per day
+    active_days: int = 0
+
+
+class CompactionResult(BaseModel):
+    """Outcome of a track compaction run"""
+    vehicles: int = 0
+    trips: int = 0
+    rollup_days: int = 0
+    expired_positions: int = 0
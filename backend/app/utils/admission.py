@@ -0,0 +1,210 @@
+"""
+Admission control for API requests.
+
+Each ``/api`` request belongs to one class with its own concurrency budget:
+
+- ``auth``: everything under ``/api/auth`` (logins and password changes hash
+  with bcrypt);
+- ``uploads``: multipart requests;
+- ``reads``: other GET and HEAD requests;
+- ``writes``: everything else.
+
+Up to ``limit`` requests of a class run at once. Further requests wait in a
+FIFO queue of at most ``max_queue`` entries, for at most ``queue_timeout``
+seconds. A request that finds the queue full, or is still waiting at its
+deadline, gets an immediate ``503`` with ``Retry-After`` instead of piling up
+behind the threadpool and the database lock until the client times out.
+
+The budgets sit inside the response cache, so 304s and cached replays are
+never shed. Paths outside ``/api`` (health checks, metrics, docs, uploaded
+files) and CORS preflights are not limited. Everything runs on the event
+loop thread, so the limiter needs no locks. Limits are per worker process.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+from starlette.datastructures import Headers
+from app.config import settings
+
+_UNLIMITED_METHODS = frozenset({"OPTIONS"})
+_READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+class AdmissionRejected(Exception):
+    """The request's class has no free slot and no room (or time left) to wait for one"""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class} admission rejected ({reason})")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Concurrency budget with a bounded, deadline-limited FIFO wait queue for one route class"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds_total = 0.0
+        # Smoothed time a request holds its slot, for Retry-After
+        self.service_seconds = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog would have drained, at least 1"""
+        backlog = self.in_flight + self.waiting
+        return max(1, min(30, math.ceil(backlog * self.service_seconds / max(1, self.limit))))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            # release() hands its slot over by resolving the future, so in_flight already counts this request
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted just as the deadline passed; take the slot
+                pass
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self.wait_seconds_total += time.perf_counter() - started
+                raise self._reject("timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self.wait_seconds_total += time.perf_counter() - started
+        self.admitted += 1
+
+    def release(self, held_seconds: float) -> None:
+        if held_seconds:
+            self.service_seconds = held_seconds if not self.service_seconds else (
+                0.9 * self.service_seconds + 0.1 * held_seconds
+            )
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "route_class": self.name,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "wait_seconds_total": self.wait_seconds_total,
+        }
+
+
+def route_class(scope: dict) -> Optional[str]:
+    """The admission class of a request, or None when it is not limited"""
+    if not scope["path"].startswith("/api/") or scope["method"] in _UNLIMITED_METHODS:
+        return None
+    if scope["path"].startswith("/api/auth/"):
+        return "auth"
+    if Headers(scope=scope).get("content-type", "").startswith("multipart/"):
+        return "uploads"
+    if scope["method"] in _READ_METHODS:
+        return "reads"
+    return "writes"
+
+
+class AdmissionController:
+    """One ``AdmissionLimiter`` per route class"""
+
+    def __init__(self, limiters: Iterable[AdmissionLimiter]):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    def stats(self) -> List[dict]:
+        return [limiter.stats() for limiter in self.limiters.values()]
+
+
+admission_controller = AdmissionController([
+    AdmissionLimiter(name, limit, max_queue, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    for name, limit, max_queue in (
+        ("reads", settings.ADMISSION_READ_LIMIT, settings.ADMISSION_READ_QUEUE),
+        ("writes", settings.ADMISSION_WRITE_LIMIT, settings.ADMISSION_WRITE_QUEUE),
+        ("uploads", settings.ADMISSION_UPLOAD_LIMIT, settings.ADMISSION_UPLOAD_QUEUE),
+        ("auth", settings.ADMISSION_AUTH_LIMIT, settings.ADMISSION_AUTH_QUEUE),
+    )
+])
+
+
+async def _send_rejection(send, rejected: AdmissionRejected) -> None:
+    body = b'{"detail":"Server is busy, retry shortly"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejected.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """Holds each ``/api`` request to its class budget; sheds excess load with 503 + Retry-After"""
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope)
+        limiter = self.controller.limiters.get(name) if name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as rejected:
+            await _send_rejection(send, rejected)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
@@ -1,13 +1,18 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.api.dependencies import get_db
+from sqlalchemy import inspect as sa_inspect
+from app.config import settings
+from app.database import SessionLocal
 from app.models.user import User, UserRole
 from app.schemas.user import TokenData
+from app.utils.cache import TTLCache
+from app.utils.hashing import PasswordHashPool
+from app.utils.table_versions import table_versions
+from app.utils.tracing import span
 
 # Security settings
 SECRET_KEY = "your-secret-key-change-in-production-make-it-long-and-random"
@@ -16,19 +21,41 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hash_pool = PasswordHashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
 
 # Bearer token scheme
 security = HTTPBearer()
 
+# Authenticated principals keyed by (user_id, token_version), stored with the users table version they were
+# read at. Any committed change to users by a worker on this host moves that version and forces a reload;
+# workers on other hosts see changes within the TTL.
+_principal_cache = TTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL_SECONDS)
+_USER_COLUMNS = [attr.key for attr in sa_inspect(User).column_attrs]
+
+
+def _bcrypt_verify(plain_password: str, hashed_password: str) -> bool:
+    with span("bcrypt.verify"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+
+def _bcrypt_hash(password: str) -> str:
+    with span("bcrypt.hash"):
+        return pwd_context.hash(password)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against its hash (runs on the password hashing pool)"""
+    return password_hash_pool.call(_bcrypt_verify, plain_password, hashed_password)[0]
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, float, float]:
+    """Verify a password without blocking; returns (valid, queue wait seconds, hash seconds)"""
+    return await password_hash_pool.call_async(_bcrypt_verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+    """Hash a password (runs on the password hashing pool)"""
+    return password_hash_pool.call(_bcrypt_hash, password)[0]
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -50,18 +77,57 @@ def decode_token(token: str) -> Optional[TokenData]:
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
         role: str = payload.get("role")
+        token_version: int = payload.get("ver", 0)
         if username is None:
             return None
-        return TokenData(username=username, user_id=user_id, role=UserRole(role) if role else None)
+        return TokenData(
+            username=username,
+            user_id=user_id,
+            role=UserRole(role) if role else None,
+            token_version=token_version,
+        )
     except JWTError:
         return None
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from the JWT token"""
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop every cached principal for a user (call after any change to the user)"""
+    _principal_cache.discard_where(lambda key: key[0] == user_id)
+
+
+def _load_principal(token_data: TokenData) -> Optional[dict]:
+    """Read the user's columns from the database, or None if the token is stale"""
+    db = SessionLocal()
+    try:
+        user = db.get(User, token_data.user_id)
+        if user is None or user.token_version != token_data.token_version:
+            return None
+        return {key: getattr(user, key) for key in _USER_COLUMNS}
+    finally:
+        db.close()
+
+
+def _principal(token_data: TokenData) -> Optional[dict]:
+    """The token's user from the cache, reloaded if the users table changed since it was cached"""
+    key = (token_data.user_id, token_data.token_version)
+    # Read before loading, so a change committed during the load invalidates the entry
+    version = table_versions.versions(("users",))
+    cached = _principal_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    principal = _load_principal(token_data)
+    if principal is not None:
+        _principal_cache.set(key, (version, principal))
+    return principal
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    """Get the current authenticated user from the JWT token.
+
+    The user is resolved from an in-process cache, so an authenticated request
+    normally costs no database round-trip. The returned ``User`` is a detached
+    copy: use its id to load the user into a session before modifying it.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -71,21 +137,39 @@ def get_current_user(
     token = credentials.credentials
     token_data = decode_token(token)
     
-    if token_data is None:
+    if token_data is None or token_data.user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    principal = _principal(token_data)
+    if principal is None:
+        raise credentials_exception
     
-    if user is None:
+    if principal["username"] != token_data.username:
+        # Username changed since the token was issued
         raise credentials_exception
     
-    if not user.is_active:
+    if not principal["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is deactivated"
         )
     
-    return user
+    return User(**principal)
+
+
+def is_admin_token(token: str) -> bool:
+    """Whether a bearer token belongs to an active admin (for checks outside endpoint dependencies)"""
+    token_data = decode_token(token)
+    if token_data is None or token_data.user_id is None:
+        return False
+    principal = _principal(token_data)
+    if principal is None:
+        return False
+    return (
+        principal["username"] == token_data.username
+        and principal["is_active"]
+        and principal["role"] == UserRole.ADMIN
+    )
 
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
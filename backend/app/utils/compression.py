@@ -0,0 +1,355 @@
+"""
+HTTP response compression.
+
+``CompressionMiddleware`` compresses response bodies with the best encoding the
+client accepts: Brotli, then zstd, then gzip. Brotli and zstd are used when
+their packages (``brotli``, ``zstandard``) are installed; gzip is always
+available. A response is compressed only when all of these hold:
+
+- its content type is in the allowlist;
+- it is at least ``COMPRESSION_MINIMUM_SIZE`` bytes;
+- it is not already encoded;
+- compressing it makes it smaller.
+
+Streamed bodies are compressed chunk by chunk, and large single bodies are
+compressed on a worker thread so the event loop keeps serving.
+
+Uploaded documents are compressed once, after upload, at high settings.
+``PrecompressedStaticFiles`` and ``precompressed_file_response`` then serve the
+``.br``/``.gz`` sibling to clients that accept it. Siblings are kept only when
+they save at least ``PRECOMPRESS_MIN_SAVING`` of the original.
+"""
+import logging
+import mimetypes
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from app.config import settings
+from app.utils.tracing import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Single bodies at least this large are compressed off the event loop
+THREAD_THRESHOLD_BYTES = 256 * 1024
+
+# Document types worth precompressing; PDFs, images and Office Open XML files are already compressed
+PRECOMPRESS_EXTENSIONS = frozenset({".txt", ".csv", ".doc", ".xls", ".json", ".xml", ".svg", ".html"})
+PRECOMPRESS_MIN_SAVING = 0.1
+# Static variants in preference order; zstd is left out as few clients accept it for downloads yet
+STATIC_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class Codec:
+    """One content-coding with one-shot and streaming compression"""
+
+    def __init__(self, name: str, level: int):
+        self.name = name
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == "br":
+            return brotli.compress(data, quality=self.level)
+        if self.name == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self) -> "StreamCompressor":
+        return StreamCompressor(self)
+
+
+class StreamCompressor:
+    """Incremental compressor with a common ``compress``/``finish`` interface"""
+
+    def __init__(self, codec: Codec):
+        if codec.name == "br":
+            self._compressor = brotli.Compressor(quality=codec.level)
+            self._compress, self._finish = self._compressor.process, self._compressor.finish
+        elif codec.name == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=codec.level).compressobj()
+            self._compress, self._finish = self._compressor.compress, self._compressor.flush
+        else:
+            self._compressor = zlib.compressobj(codec.level, zlib.DEFLATED, 31)
+            self._compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def available_codecs(gzip_level: int, brotli_quality: int, zstd_level: int) -> List[Codec]:
+    """Codecs this process can produce, in server preference order"""
+    codecs = []
+    if brotli is not None:
+        codecs.append(Codec("br", brotli_quality))
+    if zstandard is not None:
+        codecs.append(Codec("zstd", zstd_level))
+    codecs.append(Codec("gzip", gzip_level))
+    return codecs
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """``gzip;q=0.8, br`` -> ``{"gzip": 0.8, "br": 1.0}``"""
+    accepted = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str], names: Iterable[str]) -> Optional[str]:
+    """The accepted coding with the highest q-value, ties broken by the order of ``names``"""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in names:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def content_type_allowed(content_type: str, allowlist: Iterable[str]) -> bool:
+    """Entries ending in ``/`` match a whole major type (``text/``)"""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return any(media_type.startswith(entry) if entry.endswith("/") else media_type == entry for entry in allowlist)
+
+
+class CompressionMiddleware:
+    """Compresses allowlisted responses of at least ``minimum_size`` bytes with the negotiated encoding"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE,
+        content_types: Optional[Iterable[str]] = None,
+        codecs: Optional[List[Codec]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        if content_types is None:
+            content_types = (entry.strip().lower() for entry in settings.COMPRESSION_CONTENT_TYPES.split(","))
+        self.content_types = tuple(entry for entry in content_types if entry)
+        self.codecs = codecs if codecs is not None else available_codecs(
+            settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_BROTLI_QUALITY, settings.COMPRESSION_ZSTD_LEVEL
+        )
+        self._by_name = {codec.name: codec for codec in self.codecs}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self._by_name)
+        codec = self._by_name.get(encoding)
+        start: Optional[dict] = None
+        streamer: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, streamer, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if streamer is not None:
+                chunk = streamer.compress(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    chunk += streamer.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            # First body message: decide for the whole response
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            eligible = (
+                200 <= start["status"] < 300 and start["status"] != 204
+                and "content-encoding" not in headers
+                and content_type_allowed(headers.get("content-type", ""), self.content_types)
+            )
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+            if not eligible or codec is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if more_body:
+                streamer = codec.stream()
+                compressed = streamer.compress(body)
+            else:
+                if len(body) >= THREAD_THRESHOLD_BYTES:
+                    compressed = await anyio.to_thread.run_sync(codec.compress, body)
+                else:
+                    compressed = codec.compress(body)
+                if len(compressed) >= len(body):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+            headers["content-encoding"] = codec.name
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The bytes differ from the identity representation
+                headers["etag"] = 'W/"' + etag.strip('"') + '"'
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(compressed))
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Precompressed files
+
+def _variant_path(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def _static_codecs() -> List[Tuple[str, str, Codec]]:
+    codecs = []
+    for name, suffix in STATIC_VARIANTS:
+        if name == "br" and brotli is None:
+            continue
+        level = settings.PRECOMPRESS_BROTLI_QUALITY if name == "br" else 9
+        codecs.append((name, suffix, Codec(name, level)))
+    return codecs
+
+
+def discard_precompressed(path) -> None:
+    """Remove a file's precompressed siblings (call before replacing or deleting it)"""
+    path = Path(path)
+    for _, suffix in STATIC_VARIANTS:
+        try:
+            _variant_path(path, suffix).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def precompress_file(path) -> Dict[str, int]:
+    """Write ``.br``/``.gz`` siblings for a compressible upload; returns the size of each variant kept"""
+    path = Path(path)
+    if path.suffix.lower() not in PRECOMPRESS_EXTENSIONS or not path.exists():
+        return {}
+    data = path.read_bytes()
+    kept = {}
+    for name, suffix, codec in _static_codecs():
+        variant = _variant_path(path, suffix)
+        compressed = codec.compress(data)
+        if len(compressed) > len(data) * (1 - PRECOMPRESS_MIN_SAVING):
+            variant.unlink(missing_ok=True)
+            continue
+        partial = variant.with_name(variant.name + ".tmp")
+        partial.write_bytes(compressed)
+        os.replace(partial, variant)
+        kept[name] = len(compressed)
+    return kept
+
+
+def precompress_in_background(path) -> None:
+    """``precompress_file`` for BackgroundTasks: failures are logged, the original is always served"""
+    try:
+        with span("file.precompress", {"file.path": str(path)}):
+            precompress_file(path)
+    except Exception:
+        logger.exception("Could not precompress %s", path)
+
+
+def precompressed_variant(path, accept_encoding: Optional[str]) -> Optional[Tuple[str, Path]]:
+    """The accepted precompressed sibling of ``path`` that is at least as new as it, if any"""
+    path = Path(path)
+    if path.suffix.lower() not in PRECOMPRESS_EXTENSIONS or not accept_encoding:
+        return None
+    try:
+        modified = path.stat().st_mtime
+    except OSError:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    # Highest q-value first; the stable sort keeps STATIC_VARIANTS order for ties
+    for name, suffix in sorted(STATIC_VARIANTS, key=lambda variant: -accepted.get(variant[0], wildcard)):
+        if accepted.get(name, wildcard) <= 0:
+            continue
+        variant = _variant_path(path, suffix)
+        try:
+            if variant.stat().st_mtime >= modified:
+                return name, variant
+        except OSError:
+            continue
+    return None
+
+
+def precompressed_file_response(path, accept_encoding: Optional[str], **kwargs) -> FileResponse:
+    """``FileResponse`` for ``path``, served from its precompressed sibling when the client accepts one"""
+    path = Path(path)
+    variant = precompressed_variant(path, accept_encoding)
+    if variant is None:
+        return FileResponse(path, **kwargs)
+    encoding, variant_path = variant
+    kwargs.setdefault("media_type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+    headers = {**kwargs.pop("headers", {}), "Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    return FileResponse(variant_path, headers=headers, **kwargs)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves ``name.br``/``name.gz`` in place of ``name`` when the client accepts it"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        variant = precompressed_variant(full_path, request_headers.get("accept-encoding"))
+        if variant is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        encoding, variant_path = variant
+        response = FileResponse(
+            variant_path,
+            status_code=status_code,
+            stat_result=os.stat(variant_path),
+            method=scope["method"],
+            media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
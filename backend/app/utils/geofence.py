@@ -0,0 +1,213 @@
+"""
+Geofence engine matching vehicle positions to power station sites.
+
+Site coordinates are parsed once into a uniform lat/lon grid whose cells are at
+least one exit radius wide, so a fix only has to be compared against the sites
+in its own and the eight neighbouring cells. Each flushed batch is grouped by
+vehicle and by grid cell before any distance is computed, and candidate sites
+are looked up once per distinct cell rather than once per fix.
+
+Entering uses ``radius``; leaving uses ``radius * EXIT_HYSTERESIS`` so a vehicle
+parked on the boundary does not produce a stream of short visits.
+
+Every worker process flushes the fixes it received and runs the engine on them.
+Open visits therefore live only in the database: each batch reads them under a
+cross-process lock (``app.utils.locks``) held until its flush commits, so one
+vehicle's fixes arriving at different workers still open a single visit. The
+site grid is cached per process and rebuilt when the ``sites`` table version
+moves.
+"""
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.site import Site
+from app.models.tracking import SiteVisit
+from app.models.vehicle import Vehicle
+from app.utils.locks import transaction_lock
+from app.utils.table_versions import table_versions
+
+EARTH_RADIUS_METERS = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+EXIT_HYSTERESIS = 1.2
+
+_COORDINATE_RE = re.compile(r"(-?\d+(?:\.\d+)?)\s*[,;\s]\s*(-?\d+(?:\.\d+)?)")
+
+
+def parse_coordinates(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse a "lat, lon" string as entered on the site form"""
+    if not value:
+        return None
+    match = _COORDINATE_RE.search(value)
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class _SiteGrid:
+    """Immutable spatial index of site centres"""
+
+    def __init__(self, sites: List[Tuple[int, float, float]], cell_meters: float):
+        self.cell_lat = cell_meters / METERS_PER_DEGREE_LAT
+        max_abs_lat = max((abs(lat) for _, lat, _ in sites), default=0.0)
+        # Widen longitude cells for the most poleward site so one cell always spans the exit radius
+        self.cell_lon = self.cell_lat / max(math.cos(math.radians(max_abs_lat + self.cell_lat)), 0.05)
+        self.site_ids = frozenset(site_id for site_id, _, _ in sites)
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, float, float, float]]] = defaultdict(list)
+        for site_id, lat, lon in sites:
+            entry = (site_id, math.radians(lat), math.radians(lon), math.cos(math.radians(lat)))
+            self.cells[self.cell_of(lat, lon)].append(entry)
+
+    def cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_lat)), int(math.floor(lon / self.cell_lon))
+
+    def candidates(self, cell: Tuple[int, int]) -> List[Tuple[int, float, float, float]]:
+        row, col = cell
+        found = []
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                found.extend(self.cells.get((row + d_row, col + d_col), ()))
+        return found
+
+
+class GeofenceEngine:
+    """Detects arrivals and departures of tracked vehicles at sites"""
+
+    def __init__(self, radius_meters: float):
+        self.radius_meters = radius_meters
+        self.exit_radius_meters = radius_meters * EXIT_HYSTERESIS
+        self._lock = threading.Lock()
+        self._grid: Optional[_SiteGrid] = None
+        self._grid_version: Optional[Tuple[int, ...]] = None
+
+    def _site_grid(self, db: Session) -> _SiteGrid:
+        """Site grid, rebuilt whenever a committed write in any worker changed the sites table"""
+        version = table_versions.versions(("sites",))
+        if self._grid is None or version != self._grid_version:
+            sites = []
+            for site_id, coordinates in db.execute(select(Site.id, Site.coordinates)).all():
+                point = parse_coordinates(coordinates)
+                if point is not None:
+                    sites.append((site_id, point[0], point[1]))
+            self._grid = _SiteGrid(sites, self.exit_radius_meters)
+            self._grid_version = version
+        return self._grid
+
+    def _open_visits(self, db: Session, plates, grid: _SiteGrid) -> Dict[str, Dict[int, int]]:
+        """plate -> {site_id: open SiteVisit id}; sites removed or un-geocoded since arrival are left out"""
+        open_visits: Dict[str, Dict[int, int]] = defaultdict(dict)
+        rows = db.execute(
+            select(SiteVisit.id, SiteVisit.vehicle_registration_plate, SiteVisit.site_id)
+            .where(SiteVisit.departed_at.is_(None), SiteVisit.vehicle_registration_plate.in_(plates))
+        ).all()
+        for visit_id, plate, site_id in rows:
+            if site_id in grid.site_ids:
+                open_visits[plate][site_id] = visit_id
+        return open_visits
+
+    def _last_events(self, db: Session, plates) -> Dict[str, object]:
+        """plate -> time of its latest recorded arrival or departure"""
+        return dict(db.execute(
+            select(
+                SiteVisit.vehicle_registration_plate,
+                func.max(func.coalesce(SiteVisit.departed_at, SiteVisit.arrived_at)),
+            )
+            .where(SiteVisit.vehicle_registration_plate.in_(plates))
+            .group_by(SiteVisit.vehicle_registration_plate)
+        ).all())
+
+    def _sites_within(self, candidates, lat: float, lon: float, open_sites) -> set:
+        """Site ids whose fence contains the point (exit radius for already-open visits)"""
+        lat_r = math.radians(lat)
+        lon_r = math.radians(lon)
+        inside = set()
+        for site_id, site_lat, site_lon, site_cos in candidates:
+            # Equirectangular approximation: accurate to well under 1% at geofence scale
+            x = (lon_r - site_lon) * 0.5 * (site_cos + math.cos(lat_r))
+            y = lat_r - site_lat
+            distance = EARTH_RADIUS_METERS * math.sqrt(x * x + y * y)
+            limit = self.exit_radius_meters if site_id in open_sites else self.radius_meters
+            if distance <= limit:
+                inside.add(site_id)
+        return inside
+
+    def process(self, db: Session, rows: List[dict]) -> None:
+        """Flush listener: turn a batch of fixes into site visit changes.
+
+        Every worker flushes the fixes it received, so open visits are read from the
+        database under a lock held until the flush commits, never kept in memory.
+        """
+        with self._lock:
+            transaction_lock(db, "geofence")
+            grid = self._site_grid(db)
+
+            by_plate: Dict[str, List[dict]] = defaultdict(list)
+            for row in rows:
+                by_plate[row["vehicle_registration_plate"]].append(row)
+            open_visits = self._open_visits(db, list(by_plate), grid)
+            if not grid.cells and not open_visits:
+                return
+            last_events = self._last_events(db, list(by_plate))
+
+            cell_candidates: Dict[Tuple[int, int], list] = {}
+            # [plate, site_id, arrived_at, departed_at] for visits opened in this batch
+            arrivals: List[list] = []
+            departures: Dict[int, object] = {}
+
+            for plate, fixes in by_plate.items():
+                fixes.sort(key=lambda r: r["recorded_at"])
+                last_event = last_events.get(plate)
+                open_sites = open_visits[plate]
+                for fix in fixes:
+                    recorded_at = fix["recorded_at"]
+                    if last_event is not None and recorded_at < last_event:
+                        continue  # Late fix; this vehicle's visits are already past it
+                    cell = grid.cell_of(fix["latitude"], fix["longitude"])
+                    candidates = cell_candidates.get(cell)
+                    if candidates is None:
+                        candidates = cell_candidates[cell] = grid.candidates(cell)
+                    if not candidates and not open_sites:
+                        continue
+                    inside = self._sites_within(candidates, fix["latitude"], fix["longitude"], open_sites)
+                    for site_id in [s for s in open_sites if s not in inside]:
+                        visit = open_sites.pop(site_id)
+                        if isinstance(visit, list):
+                            visit[3] = recorded_at  # Arrived and left within this batch
+                        else:
+                            departures[visit] = recorded_at
+                    for site_id in inside:
+                        if site_id not in open_sites:
+                            visit = [plate, site_id, recorded_at, None]
+                            arrivals.append(visit)
+                            open_sites[site_id] = visit
+
+            for visit_id, departed_at in departures.items():
+                db.execute(update(SiteVisit).where(SiteVisit.id == visit_id).values(departed_at=departed_at))
+
+            if arrivals:
+                plates = {a[0] for a in arrivals}
+                staff_by_plate = dict(db.execute(
+                    select(Vehicle.vehicle_registration_plate, Vehicle.assigned_staff_id)
+                    .where(Vehicle.vehicle_registration_plate.in_(plates))
+                ).all())
+                db.add_all([
+                    SiteVisit(
+                        vehicle_registration_plate=plate,
+                        site_id=site_id,
+                        staff_id=staff_by_plate.get(plate),
+                        arrived_at=arrived_at,
+                        departed_at=departed_at,
+                    )
+                    for plate, site_id, arrived_at, departed_at in arrivals
+                ])
+                db.flush()
+
+
+geofence_engine = GeofenceEngine(settings.GEOFENCE_RADIUS_METERS)
@@ -0,0 +1,104 @@
+"""
+Dedicated executor for password hashing.
+
+bcrypt is deliberately slow and releases the GIL while it works, so it runs on
+a small thread pool of its own instead of the shared request threadpool. The
+pool admits at most ``workers + max_queue`` calls at once; anything beyond that
+fails immediately with ``HashingBusyError`` (surfaced as HTTP 429) instead of
+queueing behind a login burst.
+
+Calls run in the caller's context, so request-scoped state such as the current
+trace span follows them onto the pool. A forked child (a pre-forked server
+worker) gets a fresh executor, since the parent's threads do not exist in the
+child.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing pool has no free slot"""
+
+
+class PasswordHashPool:
+    """Bounded thread pool for bcrypt work"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_compute_seconds = 0.0
+        self.total_wait_seconds = 0.0
+
+    def _submit(self, fn: Callable, *args) -> "Future[Tuple[Any, float, float]]":
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HashingBusyError("Password hashing capacity exhausted")
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+        with self._stats_lock:
+            self.in_flight += 1
+
+        def task():
+            started = time.perf_counter()
+            result = context.run(fn, *args)
+            return result, started - submitted, time.perf_counter() - started
+
+        def done(future: Future):
+            self._slots.release()
+            with self._stats_lock:
+                self.in_flight -= 1
+                if not future.cancelled() and future.exception() is None:
+                    _, wait, compute = future.result()
+                    self.completed += 1
+                    self.total_wait_seconds += wait
+                    self.total_compute_seconds += compute
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._slots.release()
+            with self._stats_lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(done)
+        return future
+
+    def call(self, fn: Callable, *args) -> Tuple[Any, float, float]:
+        """Run ``fn`` on the pool and block for it; returns (result, queue wait, compute time)"""
+        return self._submit(fn, *args).result()
+
+    async def call_async(self, fn: Callable, *args) -> Tuple[Any, float, float]:
+        """Run ``fn`` on the pool without holding an event-loop or threadpool thread"""
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "total_wait_seconds": self.total_wait_seconds,
+                "total_compute_seconds": self.total_compute_seconds,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
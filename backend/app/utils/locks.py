@@ -0,0 +1,74 @@
+"""
+Cross-process locks held for the rest of a database transaction.
+
+Background jobs run in every worker process, and some of them read state,
+decide, and write it back: the geofence engine (open site visits) and the track
+compactor (compaction watermarks). ``transaction_lock`` makes those
+transactions take turns:
+
+- on PostgreSQL it takes a transaction-level advisory lock, which also excludes
+  workers on other hosts and is released by the commit or rollback;
+- elsewhere it takes an ``flock`` on a per-database lock file in the system temp
+  directory, released when the session's transaction ends. SQLite databases
+  live on one host, so this covers every writer.
+
+Take the lock before reading the state it protects. Without ``fcntl`` only the
+PostgreSQL lock is available, and other databases run unlocked.
+"""
+import os
+import tempfile
+import zlib
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def lock_key(name: str) -> int:
+    """Advisory lock key for ``name``"""
+    return zlib.crc32(f"ksa-psms:{name}".encode())
+
+
+def lock_path(name: str) -> str:
+    """One lock file per lock name and database, in the system temp directory"""
+    return os.path.join(tempfile.gettempdir(), f"ksa-{name}-{zlib.crc32(settings.DATABASE_URL.encode()):08x}.lock")
+
+
+def transaction_lock(db: Session, name: str, wait: bool = True) -> bool:
+    """Hold the lock ``name`` until the current transaction of ``db`` commits or rolls back.
+
+    With ``wait=False`` returns False at once, instead of waiting, when another transaction holds it.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        function = "pg_advisory_xact_lock" if wait else "pg_try_advisory_xact_lock"
+        acquired = db.execute(text(f"SELECT {function}(:key)"), {"key": lock_key(name)}).scalar()
+        return wait or bool(acquired)
+    if fcntl is None:
+        return True
+
+    # Begin the transaction first, so that its end is guaranteed to release the lock
+    db.connection()
+    fd = os.open(lock_path(name), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    except BaseException:
+        os.close(fd)
+        raise
+
+    held = [fd]
+
+    def release(session, transaction) -> None:
+        # Savepoints end inside the transaction
+        if transaction.parent is None and held:
+            # Closing the descriptor releases the lock
+            os.close(held.pop())
+
+    event.listen(db, "after_transaction_end", release)
+    return True
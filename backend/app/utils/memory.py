@@ -0,0 +1,323 @@
+"""
+Memory diagnostics for long-lived workers.
+
+Two views of where a worker's memory goes:
+
+- ``memory_tracer`` drives ``tracemalloc``. Admins start and stop tracing and
+  take snapshots under ``/api/system/memory``, then list the top allocation
+  sites of a snapshot, or what grew between two snapshots. Tracing slows
+  allocations down noticeably and every snapshot holds a copy of all traces,
+  so it is off by default and only ``MEMORY_MAX_SNAPSHOTS`` snapshots are kept
+  (oldest dropped first). Set ``PYTHONTRACEMALLOC`` to trace from the first
+  import instead.
+- ``IdentityMapMiddleware`` records, for each request, how many ORM objects
+  its sessions loaded and the largest size any one session's identity map
+  reached. The per-route totals are served at
+  ``/api/system/memory/identity-maps`` and as histograms on ``/metrics``, so an
+  endpoint that starts holding whole object graphs shows up by name. Requests
+  whose identity map peaks above ``IDENTITY_MAP_WARN`` objects are also logged
+  to the slow-query log. The session hooks cost a ``len()`` per loaded object.
+
+Everything is per worker process; responses carry the worker's ``pid``, and
+tracing is easiest to follow with ``WORKERS=1``.
+"""
+import itertools
+import os
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.utils.metrics import Histogram, request_method, route_template
+from app.utils.query_stats import slow_log
+
+# Identity map sizes, in objects
+IDENTITY_MAP_BUCKETS = (10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000)
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# The tracer's own allocations and import machinery are noise in every report
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory of this process in bytes, from /proc (None elsewhere)"""
+    values: Dict[str, Optional[int]] = {"rss_bytes": None, "peak_rss_bytes": None}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                key = line.split(":")[0]
+                if key == "VmRSS":
+                    values["rss_bytes"] = int(line.split()[1]) * 1024
+                elif key == "VmHWM":
+                    values["peak_rss_bytes"] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def _short_path(filename: str) -> str:
+    """``filename`` relative to the longest ``sys.path`` entry containing it"""
+    best = ""
+    for entry in sys.path:
+        if entry and filename.startswith(entry.rstrip(os.sep) + os.sep) and len(entry) > len(best):
+            best = entry
+    return filename[len(best.rstrip(os.sep)) + 1:] if best else filename
+
+
+def _frames(traceback: tracemalloc.Traceback, group_by: str) -> List[str]:
+    """Frames of a statistic, most recent call first"""
+    if group_by == "filename":
+        return [_short_path(frame.filename) for frame in traceback]
+    return [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in reversed(traceback)]
+
+
+class _Snapshot:
+    __slots__ = ("id", "taken_at", "snapshot", "traced_bytes", "traceback_limit")
+
+    def __init__(self, snapshot_id: int, snapshot: tracemalloc.Snapshot, traced_bytes: int):
+        self.id = snapshot_id
+        self.taken_at = datetime.utcnow()
+        self.snapshot = snapshot
+        self.traced_bytes = traced_bytes
+        self.traceback_limit = snapshot.traceback_limit
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "taken_at": self.taken_at,
+            "traced_bytes": self.traced_bytes,
+            "traceback_limit": self.traceback_limit,
+        }
+
+
+class MemoryTracer:
+    """Starts and stops tracemalloc and keeps the newest ``max_snapshots`` snapshots"""
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, _Snapshot]" = OrderedDict()
+        self._ids = itertools.count(1)
+        # Endpoints run on threadpool threads
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int) -> None:
+        """Start tracing with ``frames`` frames per traceback; restarts tracing at a different depth"""
+        if tracemalloc.is_tracing():
+            if tracemalloc.get_traceback_limit() == frames:
+                return
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing and free the traces; snapshots already taken are kept"""
+        tracemalloc.stop()
+
+    def take_snapshot(self) -> dict:
+        """Snapshot the current traces (tracing must be on)"""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        traced_bytes, _ = tracemalloc.get_traced_memory()
+        with self._lock:
+            entry = _Snapshot(next(self._ids), snapshot, traced_bytes)
+            self._snapshots[entry.id] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return entry.summary()
+
+    def snapshots(self) -> List[dict]:
+        with self._lock:
+            return [entry.summary() for entry in self._snapshots.values()]
+
+    def allocations(self, snapshot_id: int, group_by: str = "lineno", limit: int = 25,
+                    compare_to: Optional[int] = None) -> Optional[dict]:
+        """Top allocation sites of a snapshot, or the largest changes since ``compare_to``.
+
+        None when either snapshot is unknown (never taken, or already dropped).
+        """
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+            base = self._snapshots.get(compare_to) if compare_to is not None else None
+        if entry is None or (compare_to is not None and base is None):
+            return None
+
+        if base is None:
+            statistics = entry.snapshot.statistics(group_by)
+            sites = [
+                {"frames": _frames(stat.traceback, group_by), "size_bytes": stat.size, "count": stat.count}
+                for stat in statistics[:limit]
+            ]
+        else:
+            # Sorted by the absolute size change, largest first
+            statistics = entry.snapshot.compare_to(base.snapshot, group_by)
+            sites = [
+                {
+                    "frames": _frames(stat.traceback, group_by),
+                    "size_bytes": stat.size,
+                    "count": stat.count,
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in statistics[:limit]
+            ]
+        return {
+            "snapshot": entry.summary(),
+            "compared_to": base.summary() if base is not None else None,
+            "group_by": group_by,
+            "total_bytes": sum(stat.size for stat in statistics),
+            "sites": sites,
+        }
+
+    def status(self) -> dict:
+        traced_bytes, traced_peak_bytes = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "tracing": tracemalloc.is_tracing(),
+            "traceback_limit": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+            "traced_bytes": traced_bytes,
+            "traced_peak_bytes": traced_peak_bytes,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            **process_memory(),
+            "snapshots": self.snapshots(),
+        }
+
+
+memory_tracer = MemoryTracer(settings.MEMORY_MAX_SNAPSHOTS)
+
+
+# Session identity maps
+
+class RequestSessionStats:
+    """ORM objects loaded by the sessions of one request, and the largest identity map any of them reached"""
+
+    __slots__ = ("loaded", "peak")
+
+    def __init__(self):
+        self.loaded = 0
+        self.peak = 0
+
+
+_current: ContextVar[Optional[RequestSessionStats]] = ContextVar("request_session_stats", default=None)
+
+
+def _observe(session, instance) -> None:
+    stats = _current.get()
+    if stats is None:
+        return
+    size = len(session.identity_map)
+    if size > stats.peak:
+        stats.peak = size
+
+
+def _loaded_as_persistent(session, instance) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.loaded += 1
+        _observe(session, instance)
+
+
+def track_identity_maps() -> None:
+    """Measure identity maps of every session (async sessions included, through their sync session)"""
+    if event.contains(Session, "loaded_as_persistent", _loaded_as_persistent):
+        return
+    event.listen(Session, "loaded_as_persistent", _loaded_as_persistent)
+    # Objects added by the request join the identity map when flushed
+    event.listen(Session, "pending_to_persistent", _observe)
+
+
+class IdentityMapSeries:
+    """Identity map sizes recorded for one (method, route)"""
+
+    __slots__ = ("peak", "peak_max", "loaded")
+
+    def __init__(self):
+        self.peak = Histogram(IDENTITY_MAP_BUCKETS)
+        self.peak_max = 0
+        self.loaded = 0
+
+
+class IdentityMapStats:
+    """Per-route identity map peaks; recorded on the event loop thread only"""
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str], IdentityMapSeries] = {}
+
+    def record(self, method: str, route: str, stats: RequestSessionStats) -> None:
+        key = (method, route)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = IdentityMapSeries()
+        series.peak.observe(stats.peak)
+        series.peak_max = max(series.peak_max, stats.peak)
+        series.loaded += stats.loaded
+
+    def routes(self) -> List[dict]:
+        """Routes by their largest identity map, largest first"""
+        return sorted(
+            (
+                {
+                    "method": method,
+                    "route": route,
+                    "requests": series.peak.count,
+                    "peak_max": series.peak_max,
+                    "peak_avg": series.peak.sum / series.peak.count if series.peak.count else 0.0,
+                    "loaded_total": series.loaded,
+                }
+                for (method, route), series in self.series.items()
+            ),
+            key=lambda route: route["peak_max"],
+            reverse=True,
+        )
+
+
+identity_map_stats = IdentityMapStats()
+
+
+def memory_metrics() -> dict:
+    """Point-in-time memory figures plus the identity map series, for ``render_metrics``"""
+    traced_bytes, _ = tracemalloc.get_traced_memory()
+    return {
+        **process_memory(),
+        "traced_bytes": traced_bytes if tracemalloc.is_tracing() else None,
+        "identity_maps": identity_map_stats.series,
+    }
+
+
+class IdentityMapMiddleware:
+    """Records each request's peak session identity map size under its route template"""
+
+    def __init__(self, app, stats: IdentityMapStats = identity_map_stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_stats = RequestSessionStats()
+        token = _current.set(request_stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            if request_stats.loaded or request_stats.peak:
+                self.stats.record(request_method(scope), route_template(scope), request_stats)
+            if request_stats.peak > settings.IDENTITY_MAP_WARN:
+                slow_log.warning(
+                    "identity map reached %d objects (%d loaded) for %s %s",
+                    request_stats.peak, request_stats.loaded, scope["method"], scope["path"],
+                )
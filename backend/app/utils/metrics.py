@@ -0,0 +1,400 @@
+"""
+Prometheus metrics.
+
+``MetricsMiddleware`` records request counts, latency and response size
+histograms, request body and upload bytes, and in-flight requests. Series are
+labelled by route template (``/api/contracts/{contract_id}``), not raw path,
+and by standard method (anything else is ``OTHER``), so the number of series
+stays bounded. All recording happens on the event loop
+thread, which is the only thread that runs ASGI middleware. It therefore needs
+no locks and costs a few dict and list operations per request.
+
+``render_metrics`` adds point-in-time gauges when ``/metrics`` is scraped:
+connection pools, replica lag, threadpool saturation, background job
+backlogs, response cache outcomes, startup phase durations and admission
+control queues, and process memory with per-route session identity map
+sizes. The output is the Prometheus text exposition format. Values are per
+worker process.
+"""
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import anyio.to_thread
+from starlette.datastructures import Headers
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+# Any other request method is labelled OTHER, so clients cannot add series by inventing verbs
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"))
+OTHER_METHOD = "OTHER"
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket and made cumulative on export"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteSeries:
+    """Everything recorded for one (method, route, status) combination"""
+
+    __slots__ = ("latency", "response_size", "request_bytes", "upload_bytes")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.request_bytes = 0
+        self.upload_bytes = 0
+
+
+class RequestMetrics:
+    """Per-route request series plus the in-flight gauge"""
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str, str], RouteSeries] = {}
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def record(self, method: str, route: str, status: int, seconds: float, response_bytes: int,
+               request_bytes: int, upload: bool) -> None:
+        key = (method, route, str(status))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = RouteSeries()
+        series.latency.observe(seconds)
+        series.response_size.observe(response_bytes)
+        series.request_bytes += request_bytes
+        if upload:
+            series.upload_bytes += request_bytes
+
+
+request_metrics = RequestMetrics()
+
+
+def route_template(scope: dict) -> str:
+    """The matched route's path template, the mount path for mounted apps, or ``<unmatched>``"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    root_path = scope.get("root_path")
+    if root_path:
+        return root_path + "/{path}"
+    return UNMATCHED_ROUTE
+
+
+def request_method(scope: dict) -> str:
+    """The request method, or ``OTHER`` for a non-standard one"""
+    method = scope["method"]
+    return method if method in HTTP_METHODS else OTHER_METHOD
+
+
+class MetricsMiddleware:
+    """Records per-route latency, sizes and in-flight requests into ``request_metrics``"""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+        request_bytes = 0
+        upload = Headers(scope=scope).get("content-type", "").startswith("multipart/")
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            metrics.in_flight -= 1
+            metrics.record(
+                request_method(scope), route_template(scope), status, time.perf_counter() - started,
+                response_bytes, request_bytes, upload,
+            )
+
+
+# Exposition
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class _Writer:
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, labels: Dict[str, object], value) -> None:
+        if value is None:
+            return
+        self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, labels: Dict[str, object], histogram: Histogram) -> None:
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            self.sample(f"{name}_bucket", {**labels, "le": _number(bound)}, cumulative)
+        self.sample(f"{name}_bucket", {**labels, "le": "+Inf"}, histogram.count)
+        self.sample(f"{name}_sum", labels, histogram.sum)
+        self.sample(f"{name}_count", labels, histogram.count)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    """Naive UTC datetimes (how the app stores them) as Unix time"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _write_requests(out: _Writer, metrics: RequestMetrics) -> None:
+    series = sorted(metrics.series.items())
+
+    out.family("ksa_http_requests_in_flight", "gauge", "Requests currently being served")
+    out.sample("ksa_http_requests_in_flight", {}, metrics.in_flight)
+
+    out.family("ksa_http_requests_total", "counter", "Requests served, by route template and status")
+    for (method, route, status), values in series:
+        out.sample("ksa_http_requests_total", {"method": method, "route": route, "status": status}, values.latency.count)
+
+    out.family("ksa_http_request_duration_seconds", "histogram", "Request latency, by route template")
+    for (method, route, status), values in series:
+        out.histogram(
+            "ksa_http_request_duration_seconds", {"method": method, "route": route, "status": status}, values.latency
+        )
+
+    out.family("ksa_http_response_size_bytes", "histogram", "Response body size, by route template")
+    for (method, route, status), values in series:
+        out.histogram(
+            "ksa_http_response_size_bytes", {"method": method, "route": route, "status": status}, values.response_size
+        )
+
+    out.family("ksa_http_request_body_bytes_total", "counter", "Request body bytes received, by route template")
+    for (method, route, status), values in series:
+        if values.request_bytes:
+            out.sample(
+                "ksa_http_request_body_bytes_total",
+                {"method": method, "route": route, "status": status},
+                values.request_bytes,
+            )
+
+    out.family("ksa_upload_bytes_total", "counter", "Multipart upload bytes received, by route template")
+    for (method, route, status), values in series:
+        if values.upload_bytes:
+            out.sample(
+                "ksa_upload_bytes_total", {"method": method, "route": route, "status": status}, values.upload_bytes
+            )
+
+
+def _write_pools(out: _Writer, pools: Iterable[dict]) -> None:
+    pools = list(pools)
+    gauges = {
+        "size": "Configured pool size",
+        "checked_out": "Connections currently checked out",
+        "checked_in": "Idle connections in the pool",
+        "overflow": "Connections open beyond the pool size",
+    }
+    counters = {
+        "checkouts_total": "Connection checkouts",
+        "wait_seconds_total": "Time spent waiting for a connection",
+        "slow_checkouts_total": "Checkouts that waited at least 100ms",
+        "overflow_events_total": "Checkouts that opened an overflow connection",
+        "timeouts_total": "Checkouts that timed out",
+        "connects_total": "New DBAPI connections opened",
+        "invalidations_total": "Connections invalidated",
+    }
+    for field, help_text in gauges.items():
+        out.family(f"ksa_db_pool_{field}", "gauge", help_text)
+        for stats in pools:
+            out.sample(f"ksa_db_pool_{field}", {"engine": stats["engine"]}, stats.get(field))
+    out.family("ksa_db_pool_wait_seconds_max", "gauge", "Longest connection checkout wait since startup")
+    for stats in pools:
+        out.sample("ksa_db_pool_wait_seconds_max", {"engine": stats["engine"]}, stats.get("wait_seconds_max"))
+    for field, help_text in counters.items():
+        out.family(f"ksa_db_pool_{field}", "counter", help_text)
+        for stats in pools:
+            out.sample(f"ksa_db_pool_{field}", {"engine": stats["engine"]}, stats.get(field))
+
+
+def _write_replicas(out: _Writer, replicas: dict) -> None:
+    out.family("ksa_db_replica_lag_seconds", "gauge", "Replication lag measured from the heartbeat row")
+    for replica in replicas["replicas"]:
+        out.sample("ksa_db_replica_lag_seconds", {"replica": replica["name"]}, replica["lag_seconds"])
+    out.family("ksa_db_replica_healthy", "gauge", "Whether the replica answered its last lag check")
+    for replica in replicas["replicas"]:
+        out.sample("ksa_db_replica_healthy", {"replica": replica["name"]}, replica["healthy"])
+    out.family("ksa_db_replica_reads_total", "counter", "Read requests routed to each replica")
+    for replica in replicas["replicas"]:
+        out.sample("ksa_db_replica_reads_total", {"replica": replica["name"]}, replica["reads_routed"])
+    out.family("ksa_db_primary_reads_total", "counter", "Read requests kept on the primary, by reason")
+    out.sample("ksa_db_primary_reads_total", {"reason": "pinned"}, replicas["pinned_reads"])
+    out.sample("ksa_db_primary_reads_total", {"reason": "no_replica"}, replicas["fallback_reads"])
+
+
+def _write_threadpool(out: _Writer) -> None:
+    # Sync endpoints and dependencies run on anyio's default limiter; must be read on the event loop
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    out.family("ksa_threadpool_size", "gauge", "Worker threads available to sync endpoints")
+    out.sample("ksa_threadpool_size", {}, int(limiter.total_tokens))
+    out.family("ksa_threadpool_busy", "gauge", "Worker threads currently running sync endpoints")
+    out.sample("ksa_threadpool_busy", {}, int(limiter.borrowed_tokens))
+    out.family("ksa_threadpool_waiting", "gauge", "Calls waiting for a free worker thread")
+    out.sample("ksa_threadpool_waiting", {}, limiter.statistics().tasks_waiting)
+
+
+def _write_jobs(out: _Writer, jobs: Dict[str, dict]) -> None:
+    out.family("ksa_job_pending", "gauge", "Items buffered by a background job and not yet written")
+    for job, values in jobs.items():
+        out.sample("ksa_job_pending", {"job": job}, values.get("pending"))
+    out.family(
+        "ksa_job_last_success_timestamp_seconds", "gauge",
+        "Unix time of the job's last successful run that did work; lag is time() minus this",
+    )
+    for job, values in jobs.items():
+        out.sample("ksa_job_last_success_timestamp_seconds", {"job": job}, _timestamp(values.get("last_success_at")))
+    out.family("ksa_job_last_duration_seconds", "gauge", "Duration of the job's last run")
+    for job, values in jobs.items():
+        out.sample("ksa_job_last_duration_seconds", {"job": job}, values.get("last_duration_seconds"))
+
+
+def _write_response_cache(out: _Writer, stats: dict) -> None:
+    out.family("ksa_response_cache_entries", "gauge", "Responses held in the in-process response cache")
+    out.sample("ksa_response_cache_entries", {}, stats["entries"])
+    out.family("ksa_response_cache_requests_total", "counter", "Cacheable GETs, by outcome")
+    out.sample("ksa_response_cache_requests_total", {"outcome": "not_modified"}, stats["not_modified"])
+    out.sample("ksa_response_cache_requests_total", {"outcome": "hit"}, stats["hits"])
+    out.sample("ksa_response_cache_requests_total", {"outcome": "miss"}, stats["misses"])
+    out.family("ksa_response_cache_stored_total", "counter", "Responses stored in the response cache")
+    out.sample("ksa_response_cache_stored_total", {}, stats["stored"])
+    out.family("ksa_response_cache_oversized_total", "counter", "Responses too large to cache")
+    out.sample("ksa_response_cache_oversized_total", {}, stats["skipped"])
+
+
+def _write_startup(out: _Writer, phases: Dict[str, float]) -> None:
+    out.family("ksa_startup_seconds", "gauge", "Time this worker spent in each startup phase")
+    for phase, seconds in phases.items():
+        out.sample("ksa_startup_seconds", {"phase": phase}, seconds)
+
+
+def _write_admission(out: _Writer, classes: List[dict]) -> None:
+    out.family("ksa_admission_limit", "gauge", "Concurrent requests allowed, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_limit", {"class": stats["route_class"]}, stats["limit"])
+    out.family("ksa_admission_in_flight", "gauge", "Requests holding a slot, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_in_flight", {"class": stats["route_class"]}, stats["in_flight"])
+    out.family("ksa_admission_queue_depth", "gauge", "Requests waiting for a slot, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_queue_depth", {"class": stats["route_class"]}, stats["waiting"])
+    out.family("ksa_admission_queue_limit", "gauge", "Requests allowed to wait for a slot, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_queue_limit", {"class": stats["route_class"]}, stats["max_queue"])
+    out.family("ksa_admission_admitted_total", "counter", "Requests admitted, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_admitted_total", {"class": stats["route_class"]}, stats["admitted"])
+    out.family("ksa_admission_queued_total", "counter", "Requests that had to wait for a slot, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_queued_total", {"class": stats["route_class"]}, stats["queued"])
+    out.family("ksa_admission_queue_wait_seconds_total", "counter", "Time spent waiting for a slot, by route class")
+    for stats in classes:
+        out.sample("ksa_admission_queue_wait_seconds_total", {"class": stats["route_class"]}, stats["wait_seconds_total"])
+    out.family("ksa_admission_rejected_total", "counter", "Requests shed with 503, by route class and reason")
+    for stats in classes:
+        for reason, count in stats["rejected"].items():
+            out.sample("ksa_admission_rejected_total", {"class": stats["route_class"], "reason": reason}, count)
+
+
+def _write_memory(out: _Writer, memory: dict) -> None:
+    out.family("ksa_process_resident_memory_bytes", "gauge", "Resident memory of this worker")
+    out.sample("ksa_process_resident_memory_bytes", {}, memory.get("rss_bytes"))
+    out.family("ksa_process_resident_memory_peak_bytes", "gauge", "Largest resident memory of this worker so far")
+    out.sample("ksa_process_resident_memory_peak_bytes", {}, memory.get("peak_rss_bytes"))
+    out.family("ksa_tracemalloc_traced_bytes", "gauge", "Memory traced by tracemalloc, while tracing is on")
+    out.sample("ksa_tracemalloc_traced_bytes", {}, memory.get("traced_bytes"))
+    series = sorted(memory["identity_maps"].items())
+    out.family(
+        "ksa_session_identity_map_peak_objects", "histogram",
+        "Largest session identity map of each request, by route template",
+    )
+    for (method, route), values in series:
+        out.histogram("ksa_session_identity_map_peak_objects", {"method": method, "route": route}, values.peak)
+    out.family("ksa_session_objects_loaded_total", "counter", "ORM objects loaded by sessions, by route template")
+    for (method, route), values in series:
+        out.sample("ksa_session_objects_loaded_total", {"method": method, "route": route}, values.loaded)
+
+
+def render_metrics(pools: Iterable[dict], replicas: dict, jobs: Dict[str, dict],
+                   response_cache: Optional[dict] = None, startup: Optional[Dict[str, float]] = None,
+                   admission: Optional[List[dict]] = None, memory: Optional[dict] = None,
+                   metrics: RequestMetrics = request_metrics) -> str:
+    """Prometheus text exposition of the request series plus the given point-in-time stats"""
+    out = _Writer()
+    out.family("ksa_process_start_time_seconds", "gauge", "Unix time this worker started recording")
+    out.sample("ksa_process_start_time_seconds", {}, metrics.started_at)
+    _write_requests(out, metrics)
+    _write_pools(out, pools)
+    _write_replicas(out, replicas)
+    _write_threadpool(out)
+    _write_jobs(out, jobs)
+    if response_cache is not None:
+        _write_response_cache(out, response_cache)
+    if startup:
+        _write_startup(out, startup)
+    if admission:
+        _write_admission(out, admission)
+    if memory is not None:
+        _write_memory(out, memory)
+    return out.text()
@@ -0,0 +1,144 @@
+"""
+Connection pool instrumentation.
+
+``InstrumentedQueuePool`` is a drop-in ``QueuePool`` that times every checkout,
+so the wait for a free connection is measured separately from query time. It
+also counts connections opened beyond ``pool_size`` (overflow), checkouts that
+timed out, and connections invalidated by pre-ping or disconnects.
+Counters are per process.
+"""
+import threading
+import time
+from typing import Optional
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Checkouts that wait longer than this are counted as slow
+SLOW_CHECKOUT_SECONDS = 0.1
+
+
+class PoolMetrics:
+    """Counters for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.slow_checkouts_total = 0
+        self.overflow_events_total = 0
+        self.timeouts_total = 0
+        self.connects_total = 0
+        self.invalidations_total = 0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, waited: float, overflowed: bool, checked_out: int) -> None:
+        with self._lock:
+            self.checkouts_total += 1
+            self.wait_seconds_total += waited
+            if waited > self.wait_seconds_max:
+                self.wait_seconds_max = waited
+            if waited >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts_total += 1
+            if overflowed:
+                self.overflow_events_total += 1
+            if checked_out > self.peak_checked_out:
+                self.peak_checked_out = checked_out
+
+    def record_timeout(self, waited: float) -> None:
+        with self._lock:
+            self.timeouts_total += 1
+            self.wait_seconds_total += waited
+
+    def on_connect(self, *_) -> None:
+        with self._lock:
+            self.connects_total += 1
+
+    def on_invalidate(self, *_) -> None:
+        with self._lock:
+            self.invalidations_total += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time and overflow usage"""
+
+    def __init__(self, *args, **kwargs):
+        recreated = kwargs.get("_dispatch") is not None
+        super().__init__(*args, **kwargs)
+        self._timing = threading.local()
+        if not recreated:
+            # A recreated pool inherits these listeners and gets its predecessor's metrics in recreate()
+            self.metrics = PoolMetrics()
+            event.listen(self, "connect", self.metrics.on_connect)
+            event.listen(self, "invalidate", self.metrics.on_invalidate)
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        # QueuePool._do_get can call itself when it races for an overflow slot; time the outer call only
+        if getattr(self._timing, "active", False):
+            return super()._do_get()
+        self._timing.active = True
+        started = time.perf_counter()
+        overflow_before = self.overflow()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        finally:
+            self._timing.active = False
+        overflow_after = self.overflow()
+        self.metrics.record_checkout(
+            time.perf_counter() - started,
+            overflowed=overflow_after > overflow_before and overflow_after > 0,
+            checked_out=self.checkedout(),
+        )
+        return connection
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Instrumented pool for asyncio engines"""
+
+
+def pool_stats(engine: Engine, name: str = "sync") -> dict:
+    """Current pool occupancy plus the counters, when the pool is instrumented"""
+    pool = engine.pool
+    stats = {
+        "engine": name,
+        "backend": engine.dialect.name,
+        "pool_class": type(pool).__name__,
+        "size": None,
+        "max_overflow": None,
+        "checked_out": None,
+        "checked_in": None,
+        "overflow": None,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    metrics: Optional[PoolMetrics] = getattr(pool, "metrics", None)
+    if metrics is not None:
+        with metrics._lock:
+            stats.update(
+                checkouts_total=metrics.checkouts_total,
+                wait_seconds_total=metrics.wait_seconds_total,
+                wait_seconds_max=metrics.wait_seconds_max,
+                wait_seconds_avg=metrics.wait_seconds_total / metrics.checkouts_total if metrics.checkouts_total else 0.0,
+                slow_checkouts_total=metrics.slow_checkouts_total,
+                overflow_events_total=metrics.overflow_events_total,
+                timeouts_total=metrics.timeouts_total,
+                connects_total=metrics.connects_total,
+                invalidations_total=metrics.invalidations_total,
+                peak_checked_out=metrics.peak_checked_out,
+            )
+    return stats
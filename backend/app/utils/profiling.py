@@ -0,0 +1,478 @@
+"""
+On-demand statistical profiling of individual requests.
+
+A request is profiled when it carries ``X-Profile: 1`` together with an admin
+bearer token, or when it is picked at random with probability
+``PROFILE_SAMPLE_RATE``. Otherwise ``ProfilingMiddleware`` only checks for the
+header, and the SQL hooks only read an unset context variable.
+
+While profiled requests are running, one ``profiler`` thread wakes every
+``PROFILE_INTERVAL_MS`` and looks at every thread's stack
+(``sys._current_frames``). Each sample is weighted by the wall time since the
+previous one and attributed to the request as follows:
+
+- on the event loop thread: the frames above the middleware's own coroutine
+  frame, so other requests' tasks are not counted. Async session work runs in
+  a greenlet, which is linked back to the request through the loop thread's
+  suspended main greenlet;
+- on a threadpool thread running the request's context (sync endpoints and
+  dependencies): that thread's stack under ``[threadpool]``;
+- anywhere else: ``[awaiting]``, which covers I/O, the threadpool queue and
+  the password hashing pool.
+
+Statements are not sampled: the cursor hooks time each one exactly and add it
+under the stack that issued it, as an ``SQL ...`` leaf, and the sampler leaves
+that time out. Everything is merged into one call tree whose nodes carry total,
+self and SQL time. The tree, the request's SQL statistics (``query_stats``) and its status
+and duration are written as JSON to ``PROFILE_DIR``. Only the newest
+``PROFILE_MAX_FILES`` profiles are kept. The response reports the profile's id
+in ``X-Profile-Id``, and admins list and download profiles under
+``/api/system/profiles``.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+from app.utils.auth import is_admin_token
+from app.utils.query_stats import current_stats
+
+try:
+    from anyio._backends._asyncio import WorkerThread
+    # Threadpool threads run each call as ``context.run(func, *args)`` inside this frame
+    _WORKER_RUN_CODE = WorkerThread.run.__code__
+except (ImportError, AttributeError):
+    _WORKER_RUN_CODE = None
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_PATTERN = re.compile(r"[0-9]{8}T[0-9]{12}-[0-9]+-[0-9a-f]{6}")
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+Frame = Tuple[str, str]
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    filename = code.co_filename
+    for marker in ("site-packages/", "/backend/"):
+        index = filename.rfind(marker)
+        if index != -1:
+            filename = filename[index + len(marker):]
+            break
+    return getattr(code, "co_qualname", code.co_name), f"{filename}:{code.co_firstlineno}"
+
+
+def _stack(frame, stop=None) -> List[Frame]:
+    """Frames from the outermost down to ``frame``, excluding ``stop`` and everything below it"""
+    keys = []
+    while frame is not None and frame is not stop:
+        keys.append(_frame_key(frame))
+        frame = frame.f_back
+    keys.reverse()
+    return keys
+
+
+def _calling_stack(frame, root) -> List[Frame]:
+    """The request's frames down to ``frame``, which runs on the current thread (inside a greenlet for async SQL)"""
+    keys = []
+    current = greenlet.getcurrent() if greenlet is not None else None
+    while True:
+        while frame is not None:
+            if frame is root:
+                keys.reverse()
+                return keys
+            if frame.f_code is _WORKER_RUN_CODE:
+                keys.append(("[threadpool]", ""))
+                keys.reverse()
+                return keys
+            keys.append(_frame_key(frame))
+            frame = frame.f_back
+        # Off the bottom of a greenlet (SQLAlchemy's asyncio bridge): continue where its parent switched in
+        current = current.parent if current is not None else None
+        if current is None:
+            keys.reverse()
+            return keys
+        frame = current.gr_frame
+
+
+class _Node:
+    __slots__ = ("total", "self", "sql", "children")
+
+    def __init__(self):
+        self.total = 0.0
+        self.self = 0.0
+        self.sql = 0.0
+        self.children: Dict[Frame, "_Node"] = {}
+
+    def export(self, name: str, location: str = "") -> dict:
+        children = sorted(self.children.items(), key=lambda item: item[1].total, reverse=True)
+        return {
+            "name": name,
+            "location": location,
+            "total_ms": round(self.total * 1000, 3),
+            "self_ms": round(self.self * 1000, 3),
+            "sql_ms": round(self.sql * 1000, 3),
+            "children": [child.export(*key) for key, child in children],
+        }
+
+
+class RequestProfile:
+    """Samples and SQL attributed to one request"""
+
+    def __init__(self, method: str, path: str, trigger: str, root_frame):
+        now = datetime.utcnow()
+        # Sorts by time across workers
+        self.id = f"{now:%Y%m%dT%H%M%S%f}-{os.getpid()}-{random.getrandbits(24):06x}"
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.created_at = now
+        self.root_frame = root_frame
+        self.loop_thread = threading.get_ident()
+        self.tree = _Node()
+        self.samples = 0
+        self.status: Optional[int] = None
+        self.started = time.perf_counter()
+        self.last_sample = self.started
+        self.duration = 0.0
+        # While the loop thread runs a greenlet (async session work), this one holds the request's frames
+        self.loop_greenlet = greenlet.getcurrent() if greenlet is not None else None
+        self._lock = threading.Lock()
+        self._sql_caller: Optional[List[Frame]] = None
+        self._sql_leaf: Frame = ("SQL", "")
+        self._sql_started: Optional[float] = None
+        self._sql_since_sample = 0.0
+        self._worker_thread: Optional[int] = None
+
+    # Called by the cursor hooks, on whichever thread runs the statement
+
+    def begin_sql(self, statement: str) -> None:
+        head = " ".join(statement.split())[:100]
+        # Skip this method and the cursor hook
+        caller = _calling_stack(sys._getframe(2), self.root_frame)
+        with self._lock:
+            self._sql_caller = caller
+            self._sql_leaf = (f"SQL {head}", "")
+            self._sql_started = time.perf_counter()
+
+    def end_sql(self) -> None:
+        """Statements are timed exactly rather than sampled; the sampler leaves their time out"""
+        started = self._sql_started
+        if started is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._add(self._sql_caller + [self._sql_leaf], now - started, sql=True)
+            self._sql_since_sample += now - max(started, self.last_sample)
+            self._sql_started = None
+
+    # Called by the sampler thread
+
+    def _find_root(self, frame) -> bool:
+        while frame is not None:
+            if frame is self.root_frame:
+                return True
+            frame = frame.f_back
+        return False
+
+    def _request_stack(self, frames: dict) -> Optional[List[Frame]]:
+        loop_frame = frames.get(self.loop_thread)
+        if self._find_root(loop_frame):
+            return _stack(loop_frame, stop=self.root_frame)
+        suspended = self.loop_greenlet.gr_frame if self.loop_greenlet is not None else None
+        if suspended is not None and self._find_root(suspended):
+            return _stack(suspended, stop=self.root_frame) + _stack(loop_frame)
+        if _WORKER_RUN_CODE is None:
+            return None
+        # The thread that ran this request last time is the likeliest one
+        candidates = sorted(frames, key=lambda thread: thread != self._worker_thread)
+        for thread in candidates:
+            if thread == self.loop_thread:
+                continue
+            top = frames[thread]
+            frame = top
+            while frame is not None and frame.f_code is not _WORKER_RUN_CODE:
+                frame = frame.f_back
+            if frame is None:
+                continue
+            context = frame.f_locals.get("context")
+            if context is not None and context.get(_active) is self:
+                self._worker_thread = thread
+                return [("[threadpool]", "")] + _stack(top, stop=frame)
+        return None
+
+    def _add(self, stack: List[Frame], seconds: float, sql: bool) -> None:
+        node = self.tree
+        node.total += seconds
+        if sql:
+            node.sql += seconds
+        for key in stack:
+            node = node.children.get(key) or node.children.setdefault(key, _Node())
+            node.total += seconds
+            if sql:
+                node.sql += seconds
+        node.self += seconds
+
+    def sample(self, frames: dict, now: float) -> None:
+        """Charge the time since the previous sample, less statement time, to the current stack"""
+        with self._lock:
+            previous, self.last_sample = self.last_sample, now
+            seconds = now - previous - self._sql_since_sample
+            self._sql_since_sample = 0.0
+            started = self._sql_started
+            if started is not None:
+                # The statement's time is added when it finishes; only the part before it is charged here
+                seconds -= now - max(started, previous)
+                stack = self._sql_caller
+            else:
+                stack = self._request_stack(frames) or [("[awaiting]", "")]
+            if seconds > 0:
+                self._add(stack, seconds, sql=False)
+            self.samples += 1
+
+    def report(self) -> dict:
+        stats = current_stats()
+        sql = None
+        if stats is not None:
+            sql = {
+                "count": stats.count,
+                "ms": round(stats.seconds * 1000, 3),
+                "slowest": stats.slowest(),
+                "most_repeated": [
+                    {"count": count, "statement": statement} for count, statement in stats.most_repeated(10)
+                ],
+            }
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "created_at": self.created_at.isoformat(),
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": self.samples,
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "sql": sql,
+            "tree": self.tree.export(f"{self.method} {self.path}"),
+        }
+
+
+class Sampler:
+    """One thread that samples every running profile; runs only while there is one"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._profiles: List[RequestProfile] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                now = time.perf_counter()
+                for profile in self._profiles:
+                    profile.sample(frames, now)
+                del frames
+
+
+sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+
+
+class ProfileStore:
+    """Profiles as JSON files in one directory, newest ``max_files`` kept"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def _files(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob("*.json"), key=lambda path: path.name, reverse=True)
+
+    def save(self, report: dict) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{report['id']}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(report, separators=(",", ":")))
+        temporary.replace(path)
+        for stale in self._files()[self.max_files:]:
+            stale.unlink(missing_ok=True)
+        return path
+
+    def list(self) -> List[dict]:
+        """Newest first, without the trees"""
+        summaries = []
+        for path in self._files():
+            try:
+                report = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            summary = {
+                key: report.get(key)
+                for key in ("id", "method", "path", "trigger", "created_at", "status", "duration_ms", "samples")
+            }
+            summary["sql_ms"] = (report.get("sql") or {}).get("ms")
+            summary["size_bytes"] = path.stat().st_size
+            summaries.append(summary)
+        return summaries
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.json"
+        return path if path.is_file() else None
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+
+def collapsed_stacks(report: dict) -> str:
+    """The tree as folded stacks (``a;b;c <microseconds>``) for flame graph tools such as speedscope"""
+    lines = []
+
+    def walk(node: dict, prefix: str) -> None:
+        name = prefix + node["name"].replace(";", ",")
+        if node["self_ms"]:
+            lines.append(f"{name} {round(node['self_ms'] * 1000)}")
+        for child in node["children"]:
+            walk(child, name + ";")
+
+    walk(report["tree"], "")
+    return "\n".join(lines) + "\n"
+
+
+# SQL hooks (every engine)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is not None:
+        profile.begin_sql(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is not None:
+        profile.end_sql()
+
+
+def _handle_error(exception_context):
+    profile = _active.get()
+    if profile is not None:
+        profile.end_sql()
+
+
+def profile_sql() -> None:
+    """Attribute statement time to the profiled request that runs it"""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+def _has_profile_header(scope) -> bool:
+    for name, _ in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return True
+    return False
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it (admins) or are sampled, and stores the result"""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+
+    async def _trigger(self, scope) -> Optional[str]:
+        """``sampled``, ``header`` (an admin asked) or None; only a header with a token costs more than a scan"""
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return "sampled"
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                if value.strip() not in (b"1", b"true"):
+                    return None
+                authorization = Headers(scope=scope).get("authorization", "")
+                scheme, _, token = authorization.partition(" ")
+                if scheme.lower() == "bearer" and token and await run_in_threadpool(is_admin_token, token):
+                    return "header"
+                return None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not settings.PROFILE_SAMPLE_RATE and not _has_profile_header(scope):
+            await self.app(scope, receive, send)
+            return
+        trigger = await self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        # This coroutine's frame: stacks on the event loop above it belong to this request
+        profile = RequestProfile(scope["method"], scope["path"], trigger, sys._getframe())
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                MutableHeaders(scope=message)["x-profile-id"] = profile.id
+            await send(message)
+
+        token = _active.set(profile)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration = time.perf_counter() - profile.started
+            sampler.remove(profile)
+            _active.reset(token)
+            report = profile.report()
+            try:
+                await run_in_threadpool(self.store.save, report)
+            except OSError:
+                logger.exception("Could not store profile %s", profile.id)
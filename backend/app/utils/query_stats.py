@@ -0,0 +1,185 @@
+"""
+Per-request SQL instrumentation and the slow-query log.
+
+Every engine built by ``app.database`` gets cursor event hooks that time each
+statement. While a request is being served, ``QueryStatsMiddleware`` collects
+the following into a ``RequestQueryStats`` held in a context variable, which
+carries into threadpool endpoints and async sessions:
+
+- the query count;
+- the total database time;
+- the slowest statements;
+- how often each statement repeated.
+
+The totals go back to the client as ``Server-Timing: db;dur=...;desc="N queries"``.
+
+Two things go to the ``app.sql.slow`` logger, which writes to a rotating file:
+
+- statements slower than ``SLOW_QUERY_THRESHOLD_MS``;
+- requests that issue more than ``SQL_REQUEST_QUERY_WARN`` statements, which is
+  usually an N+1 pattern, or spend more than ``SQL_REQUEST_DURATION_WARN_MS`` in
+  the database altogether.
+
+Parameter values are never logged; only their count and types are.
+"""
+import heapq
+import logging
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from app.config import settings
+
+slow_log = logging.getLogger("app.sql.slow")
+
+_current: ContextVar[Optional["RequestQueryStats"]] = ContextVar("request_query_stats", default=None)
+
+
+def redact_parameters(parameters) -> str:
+    """Describe bound parameters without their values, e.g. ``[str, int]`` or ``3 rows x [str, float]``"""
+    if not parameters:
+        return "[]"
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany
+        return f"{len(parameters)} rows x {redact_parameters(parameters[0])}"
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    return "[" + ", ".join(type(value).__name__ for value in values) + "]"
+
+
+def _one_line(statement: str, limit: Optional[int] = None) -> str:
+    text = " ".join(statement.split())
+    return text if limit is None or len(text) <= limit else text[:limit] + "..."
+
+
+class RequestQueryStats:
+    """SQL statements issued while serving one request"""
+
+    def __init__(self, method: str, path: str, keep_slowest: int):
+        self.method = method
+        self.path = path
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.seconds = 0.0
+        self._slowest: List[Tuple[float, int, str, str]] = []
+        self._repeats: dict = {}
+
+    def record(self, statement: str, parameters, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        self._repeats[statement] = self._repeats.get(statement, 0) + 1
+        if self.keep_slowest <= 0:
+            return
+        entry = (elapsed, self.count, statement, redact_parameters(parameters))
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[dict]:
+        """Slowest statements, slowest first"""
+        return [
+            {"ms": round(elapsed * 1000, 3), "statement": _one_line(statement, 300), "parameters": parameters}
+            for elapsed, _, statement, parameters in sorted(self._slowest, reverse=True)
+        ]
+
+    def most_repeated(self, limit: int = 3) -> List[Tuple[int, str]]:
+        ranked = sorted(self._repeats.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(count, _one_line(statement, 300)) for statement, count in ranked if count > 1]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    """Stats for the request being served, if any"""
+    return _current.get()
+
+
+# Engine hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        where = f"{stats.method} {stats.path}" if stats is not None else "background"
+        slow_log.warning(
+            "slow query %.1fms [%s] %s params=%s",
+            elapsed * 1000, where, _one_line(statement), redact_parameters(parameters),
+        )
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement run on ``engine`` (pass ``AsyncEngine.sync_engine`` for asyncio engines)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def configure_slow_query_log() -> None:
+    """Send the slow-query logger to a rotating file (``SLOW_QUERY_LOG_FILE``; empty keeps it on stderr)"""
+    if not settings.SLOW_QUERY_LOG_FILE or any(
+        isinstance(handler, RotatingFileHandler) for handler in slow_log.handlers
+    ):
+        return
+    path = Path(settings.SLOW_QUERY_LOG_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES, backupCount=settings.SLOW_QUERY_LOG_BACKUPS
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.INFO)
+
+
+class QueryStatsMiddleware:
+    """Collects per-request SQL stats and reports them in a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope["method"], scope["path"], settings.SQL_SLOWEST_PER_REQUEST)
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stats.count:
+                headers = MutableHeaders(scope=message)
+                existing = headers.get("server-timing")
+                # Endpoints may set their own Server-Timing (login reports hashing time); extend it
+                headers["server-timing"] = f"{existing}, {stats.server_timing()}" if existing else stats.server_timing()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if (stats.count > settings.SQL_REQUEST_QUERY_WARN
+                    or stats.seconds * 1000 > settings.SQL_REQUEST_DURATION_WARN_MS):
+                slow_log.warning(
+                    "%d queries (%.1fms) for %s %s; most repeated: %s; slowest: %s",
+                    stats.count, stats.seconds * 1000, stats.method, stats.path,
+                    stats.most_repeated(), stats.slowest(),
+                )
@@ -0,0 +1,248 @@
+"""
+Read replica routing.
+
+``get_db`` and ``get_async_db`` ask the ``ReplicaRouter`` for a session. A
+request gets a replica session when all of these hold:
+
+- it is a GET or HEAD request;
+- at least one replica is healthy and within ``REPLICA_MAX_LAG_SECONDS``;
+- the client has not written recently.
+
+Everything else gets the primary.
+
+After a successful write, ``ReadYourWritesMiddleware`` pins the client to the
+primary for ``READ_YOUR_WRITES_SECONDS``. The pin is recorded in memory, keyed by
+bearer token or client address, and in a cookie, so other workers and nodes
+honour it too. The pin is set before the response starts, so the client's next
+read cannot beat it.
+
+Lag comes from a heartbeat row on the primary. Every worker reads it back from
+the replicas every ``REPLICA_LAG_CHECK_SECONDS``, but only one worker rewrites it
+per interval. Its age on each replica is the lag, measured to within about one
+and a half check intervals.
+"""
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.engine import make_url
+from starlette.datastructures import Headers, MutableHeaders
+from app.utils.cache import TTLCache
+from app.utils.locks import transaction_lock
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+PIN_COOKIE = "ksa_primary_until"
+
+_READ_HEARTBEAT = text("SELECT beat_at FROM replication_heartbeat WHERE id = 1").columns(beat_at=DateTime)
+_UPDATE_HEARTBEAT = text("UPDATE replication_heartbeat SET beat_at = :beat_at WHERE id = 1").bindparams(
+    bindparam("beat_at", type_=DateTime)
+)
+_INSERT_HEARTBEAT = text("INSERT INTO replication_heartbeat (id, beat_at) VALUES (1, :beat_at)").bindparams(
+    bindparam("beat_at", type_=DateTime)
+)
+
+
+def client_key(scope: dict) -> str:
+    """Identify a client for read-your-writes pinning: its bearer token, else its address"""
+    authorization = Headers(scope=scope).get("authorization")
+    if authorization:
+        return authorization
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class Replica:
+    """A read replica with its engines, session factories and health"""
+
+    def __init__(self, name: str, url: str, engine, session_factory, async_engine, async_session_factory):
+        self.name = name
+        self.url = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.session_factory = session_factory
+        self.async_engine = async_engine
+        self.async_session_factory = async_session_factory
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_checked_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.reads_routed = 0
+
+
+class ReplicaRouter:
+    """Chooses between the primary and read replicas for each request"""
+
+    def __init__(
+        self,
+        primary_session_factory,
+        primary_async_session_factory,
+        replicas: List[Replica],
+        pin_seconds: float,
+        max_lag_seconds: float,
+        check_interval: float,
+    ):
+        self.primary_session_factory = primary_session_factory
+        self.primary_async_session_factory = primary_async_session_factory
+        self.replicas = replicas
+        self.pin_seconds = pin_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._pins = TTLCache(maxsize=100_000, ttl=pin_seconds)
+        self._round_robin = itertools.count()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fallback_reads = 0
+        self.pinned_reads = 0
+
+    # Read-your-writes
+
+    def pin(self, scope: dict) -> float:
+        """Send this client's reads to the primary for the pin window; returns the expiry time"""
+        self._pins.set(client_key(scope), True)
+        return time.time() + self.pin_seconds
+
+    def is_pinned(self, scope: dict) -> bool:
+        if self._pins.get(client_key(scope)):
+            return True
+        cookie = Headers(scope=scope).get("cookie")
+        if cookie and PIN_COOKIE in cookie:
+            for part in cookie.split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == PIN_COOKIE:
+                    try:
+                        return float(value) > time.time()
+                    except ValueError:
+                        return False
+        return False
+
+    # Routing
+
+    def pick(self, request) -> Optional[Replica]:
+        """Replica to serve this request from, or None for the primary"""
+        if not self.replicas or request is None or request.method not in READ_METHODS:
+            return None
+        if self.is_pinned(request.scope):
+            self.pinned_reads += 1
+            return None
+        candidates = [
+            replica for replica in self.replicas
+            if replica.healthy and replica.lag_seconds is not None and replica.lag_seconds <= self.max_lag_seconds
+        ]
+        if not candidates:
+            self.fallback_reads += 1
+            return None
+        replica = candidates[next(self._round_robin) % len(candidates)]
+        replica.reads_routed += 1
+        # Lets the response cache skip data that may lag the table versions
+        request.state.db_replica = replica.name
+        return replica
+
+    def session(self, request=None):
+        replica = self.pick(request)
+        return replica.session_factory() if replica else self.primary_session_factory()
+
+    def async_session(self, request=None):
+        replica = self.pick(request)
+        return replica.async_session_factory() if replica else self.primary_async_session_factory()
+
+    # Lag monitoring
+
+    def check_lag(self) -> None:
+        """Read each replica's heartbeat, then write a fresh one to the primary unless another worker just did"""
+        now = datetime.utcnow()
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    beat_at = conn.execute(_READ_HEARTBEAT).scalar()
+                replica.lag_seconds = max((now - beat_at).total_seconds(), 0.0) if beat_at else None
+                replica.healthy = beat_at is not None
+                replica.last_error = None if beat_at else "No heartbeat row on replica"
+            except Exception as exc:
+                replica.healthy = False
+                replica.lag_seconds = None
+                replica.last_error = str(exc).splitlines()[0]
+            replica.last_checked_at = now
+
+        db = self.primary_session_factory()
+        try:
+            # Every worker checks, but one writes per interval: the others skip while
+            # the lock is taken or the beat is less than half an interval old
+            if transaction_lock(db, "replica-heartbeat", wait=False):
+                beat_at = db.execute(_READ_HEARTBEAT).scalar()
+                if beat_at is None or (now - beat_at).total_seconds() >= self.check_interval / 2:
+                    if db.execute(_UPDATE_HEARTBEAT, {"beat_at": now}).rowcount == 0:
+                        db.execute(_INSERT_HEARTBEAT, {"beat_at": now})
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Could not write replication heartbeat")
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.check_interval):
+            self.check_lag()
+
+    def start(self) -> None:
+        """Start the lag monitor (no-op without replicas)"""
+        if not self.replicas or (self._thread is not None and self._thread.is_alive()):
+            return
+        self.check_lag()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-lag", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pin_seconds": self.pin_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "fallback_reads": self.fallback_reads,
+            "pinned_reads": self.pinned_reads,
+            "pinned_clients": len(self._pins),
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "url": replica.url,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "last_checked_at": replica.last_checked_at,
+                    "last_error": replica.last_error,
+                    "reads_routed": replica.reads_routed,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+class ReadYourWritesMiddleware:
+    """Pins clients to the primary after any successful non-GET request"""
+
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS or not self.router.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = self.router.pin(scope)
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{PIN_COOKIE}={until:.0f}; Max-Age={int(self.router.pin_seconds)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
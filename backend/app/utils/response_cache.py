@@ -0,0 +1,188 @@
+"""
+Conditional GETs and an in-process response cache for list and detail reads.
+
+Each ``CachedRoute`` names the tables its responses are built from. The
+route's version is the current ``table_versions`` counter of those tables
+(plus a time bucket for routes whose output also depends on the clock). For a
+GET to one of these routes, ``ResponseCacheMiddleware`` does the following
+before the endpoint runs:
+
+- it answers ``304 Not Modified`` when ``If-None-Match`` carries the current
+  ETag;
+- otherwise it replays a stored response for the same path, query and version;
+- only when neither applies does the endpoint run, and a 200 response is then
+  stored.
+
+In all three cases the database is not queried until the endpoint runs.
+
+Responses get ``Cache-Control: no-cache``, so browsers keep them and
+revalidate every time. ETags are weak because compression can change the
+bytes. Responses read from a replica are neither stored nor tagged, because
+the replica can lag the counters. Only routes whose output is the same for
+every caller belong here.
+"""
+import hashlib
+import re
+import time
+from typing import Iterable, List, Optional, Tuple
+from starlette.datastructures import Headers
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.table_versions import TableVersions, table_versions
+
+# Headers that describe one response rather than the representation
+_UNCACHED_HEADERS = frozenset({b"server-timing", b"set-cookie", b"date", b"etag", b"cache-control"})
+
+
+class CachedRoute:
+    """GET paths matching ``pattern`` whose responses depend only on ``tables`` (and the clock, per ``bucket_seconds``)"""
+
+    def __init__(self, pattern: str, tables: Iterable[str], bucket_seconds: Optional[float] = None):
+        self.pattern = re.compile(pattern)
+        self.tables = tuple(sorted(tables))
+        self.bucket_seconds = bucket_seconds
+
+
+CACHED_ROUTES = (
+    CachedRoute(r"/api/sites(/\d+(/staff)?)?", ("sites", "site_staff_links", "staff", "meetings")),
+    CachedRoute(r"/api/staff(/\d+)?", ("staff", "site_staff_links", "sites")),
+    CachedRoute(
+        r"/api/meetings(/\d+|/site/\d+)?",
+        ("meetings", "meeting_items", "meeting_item_staff", "staff", "sites"),
+    ),
+    # Reads sweep contracts past their end date to Expired, so versions also roll over each minute
+    CachedRoute(
+        r"/api/contracts(/\d+|/\d+/sections|/sections/\d+/items|/summary|/summary/by-type/\w+|/overdue)?",
+        ("contracts", "contract_sections", "contract_line_items"),
+        bucket_seconds=60,
+    ),
+    CachedRoute(r"/api/vehicles(/staff/\d+|/type/[^/]+|/(?!staff$|type$)[^/]+)?", ("vehicles", "staff")),
+    # Counts and lists across every section; the clock moves meetings, renewals and contract expiry along
+    CachedRoute(
+        r"/api/dashboard",
+        ("sites", "staff", "meetings", "contracts", "vehicles"),
+        bucket_seconds=settings.DASHBOARD_CACHE_SECONDS,
+    ),
+)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Bounded store of GET responses keyed by path, query string and table versions"""
+
+    def __init__(self, max_entries: int, ttl: float, max_entry_bytes: int):
+        self.entries = TTLCache(max_entries, ttl)
+        self.max_entry_bytes = max_entry_bytes
+        self.not_modified = 0
+        self.stored = 0
+        self.skipped = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.entries.hits,
+            "misses": self.entries.misses,
+            "not_modified": self.not_modified,
+            "stored": self.stored,
+            "skipped": self.skipped,
+        }
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS, settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+)
+
+
+class ResponseCacheMiddleware:
+    """Serves ``CACHED_ROUTES`` GETs from ETags and ``response_cache`` while their tables are unchanged"""
+
+    def __init__(self, app, routes: Iterable[CachedRoute] = CACHED_ROUTES, cache: ResponseCache = response_cache,
+                 versions: TableVersions = table_versions):
+        self.app = app
+        self.routes = list(routes)
+        self.cache = cache
+        self.versions = versions
+
+    def _route(self, path: str) -> Optional[CachedRoute]:
+        for route in self.routes:
+            if route.pattern.fullmatch(path):
+                return route
+        return None
+
+    def _etag(self, route: CachedRoute) -> str:
+        version = [self.versions.generation, *self.versions.versions(route.tables)]
+        if route.bucket_seconds:
+            version.append(int(time.time() // route.bucket_seconds))
+        digest = hashlib.blake2b(repr((route.tables, version)).encode(), digest_size=8).hexdigest()
+        return f'W/"{digest}"'
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not settings.RESPONSE_CACHE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        route = self._route(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = self._etag(route)
+        validators = [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        key = (scope["path"], scope["query_string"], etag)
+        cached: Optional[Tuple[List[tuple], bytes]] = self.cache.entries.get(key)
+        if cached is not None:
+            headers, body = cached
+            await send({"type": "http.response.start", "status": 200, "headers": headers + validators})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start: Optional[dict] = None
+        chunks: List[bytes] = []
+        size = 0
+        cacheable = True
+
+        async def send_and_store(message):
+            nonlocal start, size, cacheable
+            if message["type"] == "http.response.start":
+                start = message
+                cacheable = message["status"] == 200 and not scope.get("state", {}).get("db_replica")
+                if cacheable:
+                    message["headers"] = [
+                        (name, value) for name, value in message.get("headers", [])
+                        if name.lower() not in (b"etag", b"cache-control")
+                    ] + validators
+                await send(message)
+                return
+            if message["type"] == "http.response.body" and cacheable:
+                size += len(message.get("body", b""))
+                if size > self.cache.max_entry_bytes:
+                    cacheable = False
+                    self.cache.skipped += 1
+                    chunks.clear()
+                else:
+                    chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and cacheable:
+                    headers = [
+                        (name, value) for name, value in start.get("headers", [])
+                        if name.lower() not in _UNCACHED_HEADERS
+                    ]
+                    self.cache.entries.set(key, (headers, b"".join(chunks)))
+                    self.cache.stored += 1
+            await send(message)
+
+        await self.app(scope, receive, send_and_store)
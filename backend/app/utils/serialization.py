@@ -0,0 +1,174 @@
+"""
+Fast JSON responses for ``response_model`` reads.
+
+FastAPI validates whatever an endpoint returns against its ``response_model``,
+turns the result into plain Python with ``jsonable_encoder`` and then encodes it
+with the standard ``json`` module. Endpoints opt out of that by returning
+``json_response(SomeModel, rows)`` (keeping ``response_model`` for the OpenAPI
+schema). FastAPI passes a returned ``Response`` through untouched, and
+``json_response`` builds it as follows:
+
+- Rows loaded from the database are trusted. Their attributes already carry the
+  column types, so an encoder compiled once per schema copies the schema's
+  fields off each row and ``orjson`` writes the bytes. Nothing is validated.
+- Models the endpoint built itself were validated when they were constructed.
+  The same encoder reads them without validating them again.
+- Schemas the encoder does not cover (validators, aliases, serializers, types
+  other than plain scalars, enums, nested models and lists of those) go through
+  a cached ``TypeAdapter``, which validates once and dumps with pydantic-core.
+  So does everything when ``orjson`` is not installed or
+  ``FAST_JSON_ENABLED=false``.
+
+The output is the same JSON the default path produces.
+"""
+import datetime
+import enum
+import typing
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from pydantic import BaseModel, EmailStr, TypeAdapter
+from pydantic.fields import FieldInfo
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Values orjson writes exactly as pydantic would, so the encoder hands them over unchanged
+_PASSTHROUGH_TYPES = (str, int, bool, datetime.datetime, datetime.date, datetime.time)
+_MISSING = object()
+_EMPTY: Mapping = {}
+
+Encoder = Callable[[Any], Any]
+
+
+class Unsupported(Exception):
+    """The schema needs pydantic to serialize it"""
+
+
+@lru_cache(maxsize=None)
+def adapter_for(annotation: Any) -> TypeAdapter:
+    """One ``TypeAdapter`` per response type, e.g. ``List[SiteResponse]``"""
+    return TypeAdapter(annotation)
+
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+
+def _compile(annotation: Any) -> Optional[Encoder]:
+    """Encoder for ``annotation``, or None where the value passes through as is"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            raise Unsupported(annotation)
+        return _compile(args[0])
+    if origin is list or annotation is list:
+        args = typing.get_args(annotation)
+        item = _compile(args[0]) if args else None
+        if item is None:
+            return lambda values: list(values) if values is not None else None
+        return lambda values: [item(value) for value in values] if values is not None else None
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return _model_encoder(annotation)
+        if annotation is float:
+            return _optional_float
+        if issubclass(annotation, enum.Enum) or issubclass(annotation, _PASSTHROUGH_TYPES) or annotation is EmailStr:
+            return None
+    raise Unsupported(annotation)
+
+
+def _default(field: FieldInfo):
+    if field.is_required():
+        return _MISSING
+    if field.default_factory is not None:
+        return field.default_factory
+    return lambda: field.default
+
+
+def _model_encoder(model: type) -> Encoder:
+    decorators = model.__pydantic_decorators__
+    if (decorators.validators or decorators.field_validators or decorators.root_validators
+            or decorators.model_validators or decorators.field_serializers or decorators.model_serializers
+            or decorators.computed_fields or model.model_config.get("extra") == "allow"):
+        raise Unsupported(model)
+    fields = []
+    for name, field in model.model_fields.items():
+        if field.alias not in (None, name) or field.serialization_alias not in (None, name) or field.exclude:
+            raise Unsupported(model)
+        fields.append((name, _compile(field.annotation), _default(field)))
+    fields = tuple(fields)
+
+    def encode(obj):
+        # Loaded ORM attributes and model fields sit in the instance dict; anything else goes through getattr
+        loaded = obj if isinstance(obj, Mapping) else getattr(obj, "__dict__", _EMPTY)
+        out = {}
+        for name, encoder, default in fields:
+            value = loaded.get(name, _MISSING)
+            if value is _MISSING and loaded is not obj:
+                value = getattr(obj, name, _MISSING)
+            if value is _MISSING:
+                if default is _MISSING:
+                    # Let pydantic report the missing field
+                    adapter_for(model).validate_python(obj, from_attributes=True)
+                value = default()
+            out[name] = encoder(value) if encoder is not None and value is not None else value
+        return out
+
+    return encode
+
+
+class with_fields:
+    """``row`` with some attributes added or replaced, for responses that extend a row with computed fields"""
+
+    __slots__ = ("_row", "_values")
+
+    def __init__(self, row: Any, **values):
+        self._row = row
+        self._values = values
+
+    def __getattr__(self, name: str):
+        values = self._values
+        if name in values:
+            return values[name]
+        return getattr(self._row, name)
+
+    @property
+    def __dict__(self) -> Mapping:
+        # What the trusted encoder reads: the added values over the row's loaded attributes
+        return {**getattr(self._row, "__dict__", _EMPTY), **self._values}
+
+
+@lru_cache(maxsize=None)
+def trusted_encoder(annotation: Any) -> Optional[Encoder]:
+    """Compiled encoder for ``annotation``, or None when it needs pydantic"""
+    try:
+        encoder = _compile(annotation)
+    except Unsupported:
+        return None
+    return encoder or (lambda value: value)
+
+
+def dump_json(annotation: Any, content: Any) -> bytes:
+    """``content`` (rows, dicts or models) as the JSON ``annotation`` describes"""
+    if settings.FAST_JSON_ENABLED and orjson is not None:
+        encoder = trusted_encoder(annotation)
+        if encoder is not None:
+            return orjson.dumps(encoder(content), option=orjson.OPT_UTC_Z)
+    adapter = adapter_for(annotation)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def json_response(annotation: Any, content: Any, status_code: int = 200, headers: Optional[Mapping] = None,
+                  background: Optional[BackgroundTask] = None) -> Response:
+    """Serialized ``content`` as an ``application/json`` response, bypassing FastAPI's encoder"""
+    return Response(
+        dump_json(annotation, content), status_code=status_code, headers=headers,
+        media_type="application/json", background=background,
+    )
@@ -0,0 +1,143 @@
+"""
+Worker startup.
+
+Importing ``main`` only builds the app: no database connections, DDL or file
+system changes. Everything else happens in the app's lifespan, once per worker
+process, before it accepts requests:
+
+- ``prepare_directories`` creates the upload and log directories;
+- ``run_startup_tasks`` checks or migrates the schema, creates the default
+  admin and starts a new table-versions generation.
+
+The startup tasks run under an ``flock`` on ``STARTUP_LOCK_FILE``, so workers
+starting together run them one at a time. The first worker does the work, and
+each later one finds the schema current and the admin present (one query each).
+Without ``fcntl`` the tasks run unlocked.
+
+Under the pre-forking server (``gunicorn.conf.py``) the master imports the app
+and runs the startup tasks once, before it forks any worker. It then sets
+``STARTUP_TASKS_DONE_ENV`` to its pid, and workers whose parent is that pid
+skip the tasks. This also covers workers that replace recycled ones, so the
+table-versions generation (and with it every ETag) survives recycling.
+
+Each phase is timed. ``startup_timings`` keeps the durations for the log line
+printed when the worker is ready and for the ``ksa_startup_seconds`` metric.
+In a forked worker the timings start again at the fork, with the time the fork
+took as ``fork``.
+"""
+import logging
+import os
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from app.config import settings
+from app.crud.user import create_default_admin
+from app.database import SessionLocal, init_db
+from app.utils.table_versions import table_versions
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Holds the pid of a server master that ran the startup tasks for the workers it forks
+STARTUP_TASKS_DONE_ENV = "KSA_STARTUP_TASKS_DONE"
+
+
+def default_lock_path() -> str:
+    """One lock file per database, in the system temp directory"""
+    return os.path.join(tempfile.gettempdir(), f"ksa-startup-{zlib.crc32(settings.DATABASE_URL.encode()):08x}.lock")
+
+
+class StartupTimings:
+    """Seconds spent in each startup phase of this worker, in the order they ran"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self._fork_started: Optional[float] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=self._before_fork, after_in_child=self._after_fork_in_child)
+
+    def _before_fork(self) -> None:
+        self._fork_started = time.perf_counter()
+
+    def _after_fork_in_child(self) -> None:
+        forked = time.perf_counter() - self._fork_started if self._fork_started is not None else 0.0
+        self.phases = {"fork": forked}
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+
+
+startup_timings = StartupTimings()
+
+
+@contextmanager
+def startup_lock(path: Optional[str] = None, timings: Optional[StartupTimings] = None):
+    """Exclusive across processes on this host for the duration of the block; the wait is timed as ``lock_wait``"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path or settings.STARTUP_LOCK_FILE or default_lock_path(), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        started = time.perf_counter()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if timings is not None:
+            timings.record("lock_wait", time.perf_counter() - started)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def prepare_directories(directories: Iterable[Path]) -> None:
+    """Create the directories the app writes to"""
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+
+
+def startup_tasks_done() -> bool:
+    """True in a worker whose server master already ran the startup tasks"""
+    return os.environ.get(STARTUP_TASKS_DONE_ENV) == str(os.getppid())
+
+
+def run_startup_tasks(timings: StartupTimings = startup_timings) -> Optional[dict]:
+    """Schema check or migration, default admin and a new table-versions generation, one worker at a time"""
+    if startup_tasks_done():
+        return None
+    with startup_lock(timings=timings):
+        with timings.phase("schema"):
+            schema = init_db()
+        with timings.phase("default_admin"):
+            with SessionLocal() as db:
+                admin = create_default_admin(db)
+        # ETags issued before this start may describe a recreated or restored database
+        with timings.phase("table_versions"):
+            table_versions.new_generation()
+    if schema["applied"]:
+        logger.info("Applied migrations %s", schema["applied"])
+    if admin is not None:
+        logger.warning("Created the default admin user; change its password")
+    return schema
@@ -0,0 +1,214 @@
+"""
+Per-table change counters.
+
+Session events record which tables a transaction touched and bump their
+counters once it commits. The tracked writes are:
+
+- flushed inserts, updates and deletes, including many-to-many link rows;
+- bulk ``insert()``, ``update()`` and ``delete()`` statements run through a session;
+- rows removed or nulled by ``ON DELETE CASCADE`` / ``SET NULL`` foreign keys.
+
+The counters only ever increase, so a cached response keyed on the counters of
+the tables it read stays valid until one of them moves.
+
+The counters live in a small memory-mapped file (``TABLE_VERSIONS_FILE``) that
+every worker process on the host shares. Updates take an ``flock`` on the file,
+and reading them is a memory access. A random generation number in the file
+header changes whenever the file is recreated and at every server start, so
+versions issued against an earlier (perhaps restored) database never match.
+Platforms without ``fcntl`` keep the counters in process memory.
+"""
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Tables hash into a fixed number of slots; a collision only causes extra invalidations
+SLOTS = 256
+_HEADER = struct.Struct("<Q")
+_COUNTER = struct.Struct("<Q")
+_SIZE = _HEADER.size + SLOTS * _COUNTER.size
+
+_CASCADING_DELETES = ("CASCADE", "SET NULL", "SET DEFAULT")
+
+
+def _slot_offset(table: str) -> int:
+    return _HEADER.size + (zlib.crc32(table.encode()) % SLOTS) * _COUNTER.size
+
+
+def default_versions_path() -> str:
+    """One counter file per database, in the system temp directory"""
+    return os.path.join(tempfile.gettempdir(), f"ksa-table-versions-{zlib.crc32(settings.DATABASE_URL.encode()):08x}")
+
+
+class TableVersions:
+    """Change counters per table, shared by every worker on the host"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._buffer = None
+
+    def _open(self) -> None:
+        # Reopened after fork: flock does not exclude processes that share an inherited descriptor
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.path is None:
+                buffer = bytearray(_SIZE)
+                _HEADER.pack_into(buffer, 0, secrets.randbits(63) | 1)
+                self._fd, self._buffer = None, buffer
+            else:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < _SIZE:
+                        os.ftruncate(fd, _SIZE)
+                    buffer = mmap.mmap(fd, _SIZE)
+                    if not _HEADER.unpack_from(buffer, 0)[0]:
+                        _HEADER.pack_into(buffer, 0, secrets.randbits(63) | 1)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                self._fd, self._buffer = fd, buffer
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        self._open()
+        with self._lock:
+            if self._fd is None:
+                yield self._buffer
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield self._buffer
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def generation(self) -> int:
+        self._open()
+        return _HEADER.unpack_from(self._buffer, 0)[0]
+
+    def new_generation(self) -> None:
+        """Invalidate every version issued so far (the database may have been recreated or restored)"""
+        with self._locked(exclusive=True) as buffer:
+            _HEADER.pack_into(buffer, 0, secrets.randbits(63) | 1)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Record that ``tables`` changed"""
+        offsets = {_slot_offset(table) for table in tables}
+        if not offsets:
+            return
+        with self._locked(exclusive=True) as buffer:
+            for offset in offsets:
+                _COUNTER.pack_into(buffer, offset, _COUNTER.unpack_from(buffer, offset)[0] + 1)
+
+    def versions(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Current counter of each table, in the order given"""
+        with self._locked(exclusive=False) as buffer:
+            return tuple(_COUNTER.unpack_from(buffer, _slot_offset(table))[0] for table in tables)
+
+
+table_versions = TableVersions(settings.TABLE_VERSIONS_FILE or default_versions_path())
+
+
+# Session hooks
+
+_dependents: Dict[int, Dict[str, Set[str]]] = {}
+
+
+def _with_cascades(table, names: Set[str]) -> Set[str]:
+    """``names`` plus every table whose rows a delete from ``table`` can change through foreign keys"""
+    metadata = table.metadata
+    dependents = _dependents.get(id(metadata))
+    if dependents is None:
+        dependents = {}
+        for child in metadata.tables.values():
+            for foreign_key in child.foreign_keys:
+                if (foreign_key.ondelete or "").upper() in _CASCADING_DELETES:
+                    dependents.setdefault(foreign_key.column.table.name, set()).add(child.name)
+        _dependents[id(metadata)] = dependents
+    pending = [table.name]
+    while pending:
+        for child in dependents.get(pending.pop(), ()):
+            if child not in names:
+                names.add(child)
+                pending.append(child)
+    return names
+
+
+def _changed(session: Session) -> Set[str]:
+    return session.info.setdefault("changed_tables", set())
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed = _changed(session)
+    for instances, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for instance in instances:
+            state = inspect(instance)
+            mapper = state.mapper
+            for table in mapper.tables:
+                changed.add(table.name)
+                if deleted:
+                    _with_cascades(table, changed)
+            for relationship in mapper.relationships:
+                if relationship.secondary is None:
+                    continue
+                if deleted or state.attrs[relationship.key].history.has_changes():
+                    changed.add(relationship.secondary.name)
+
+
+def _do_orm_execute(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None or not getattr(table, "name", None):
+        return
+    changed = _changed(orm_execute_state.session)
+    changed.add(table.name)
+    if orm_execute_state.is_delete:
+        _with_cascades(table, changed)
+
+
+def _after_commit(session: Session) -> None:
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        try:
+            table_versions.bump(changed)
+        except OSError:
+            logger.exception("Could not bump table versions for %s", sorted(changed))
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop("changed_tables", None)
+
+
+def track_table_changes() -> None:
+    """Bump table versions for every committed session write (sync and async sessions)"""
+    if event.contains(Session, "after_commit", _after_commit):
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
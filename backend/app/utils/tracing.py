@@ -0,0 +1,544 @@
+"""
+Request tracing with lightweight spans.
+
+A request is traced when it is picked at random with probability
+``TRACE_SAMPLE_RATE``, or when it carries a W3C ``traceparent`` header with
+the sampled flag set and comes from a trusted caller: an address in
+``TRACE_TRUSTED_NETWORKS`` (such as the gateway that starts traces) or a request
+with an admin bearer token. Anyone else's sampled flag is ignored, so clients
+cannot force the cost of tracing onto every request. A traced request with a
+``traceparent`` continues the caller's trace id. A traced request gets these
+spans:
+
+- ``GET /api/contracts/{contract_id}``: the whole request (server span, with
+  method, route and status);
+- ``handler get_contract``: the route's endpoint function;
+- ``crud.contract.get_contract``: every public function in ``app.crud``;
+- ``SQL SELECT``: every statement, with the statement text (never its
+  parameters) and row count;
+- ``file.write``: documents written by the upload endpoints;
+- ``bcrypt.hash`` / ``bcrypt.verify``: password hashing on its own pool.
+
+The response reports the trace id in ``X-Trace-Id``. Finished traces are
+queued and written by a ``trace-exporter`` thread every
+``TRACE_EXPORT_INTERVAL_SECONDS``, so requests never wait on the exporter:
+
+- ``TRACE_EXPORTER=jsonl``: one JSON object per span, appended to
+  ``TRACE_FILE``, which rotates at ``TRACE_FILE_MAX_BYTES``. Every worker on
+  the host appends to the same file, one batch at a time under a file lock;
+- ``TRACE_EXPORTER=otlp``: OTLP/HTTP JSON posted to ``TRACE_OTLP_ENDPOINT``
+  (an OpenTelemetry collector, Jaeger or Tempo);
+- ``TRACE_EXPORTER=none``: tracing is off.
+
+If the exporter falls behind, spans beyond ``TRACE_QUEUE_MAX_SPANS`` are
+dropped and counted. A request that is not traced pays for a random number and
+a header check; each wrapped function or statement then reads one unset
+context variable.
+"""
+import functools
+import importlib
+import inspect
+import json
+import logging
+import os
+import pkgutil
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+from app.utils.metrics import request_method, route_template
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = "x-trace-id"
+TRACEPARENT_HEADER = b"traceparent"
+# version-traceid-parentid-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+TRACEPARENT_PATTERN = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+_KIND_NAMES = {KIND_INTERNAL: "internal", KIND_SERVER: "server", KIND_CLIENT: "client"}
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """The spans recorded for one request; threads only append, so no lock is needed"""
+
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = (
+        "trace", "span_id", "parent_id", "name", "kind", "attributes",
+        "start_ns", "_started", "duration_ns", "error",
+    )
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes if attributes is not None else {}
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> "Span":
+        return Span(self.trace, name, self.span_id, kind, attributes)
+
+    def fail(self, exception: BaseException) -> None:
+        self.error = f"{type(exception).__name__}: {exception}"
+
+    def end(self) -> None:
+        self.duration_ns = time.perf_counter_ns() - self._started
+        self.trace.spans.append(self)
+
+    def export(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": _KIND_NAMES[self.kind],
+            "start": datetime.utcfromtimestamp(self.start_ns / 1e9).isoformat() + "Z",
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of the request being served, if it is traced"""
+    return _current.get()
+
+
+class _SpanScope:
+    __slots__ = ("name", "kind", "attributes", "_span", "_token")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self._span: Optional[Span] = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = _current.get()
+        if parent is None:
+            return None
+        self._span = parent.child(self.name, self.kind, self.attributes)
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._span is None:
+            return
+        _current.reset(self._token)
+        if exc is not None:
+            self._span.fail(exc)
+        self._span.end()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL) -> _SpanScope:
+    """Context manager for a child of the current span; does nothing when the request is not traced
+
+        with span("file.write", {"file.path": str(path)}):
+            ...
+    """
+    return _SpanScope(name, attributes, kind)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator: run the function (sync or async) in a span named ``name`` when the request is traced"""
+
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def _traceable(module, name: str, value) -> bool:
+    return (
+        inspect.isfunction(value)
+        and value.__module__ == module.__name__
+        and not name.startswith("_")
+        and not inspect.isgeneratorfunction(value)
+        and not inspect.isasyncgenfunction(value)
+        and not hasattr(value, "__wrapped__")
+    )
+
+
+def trace_package(package, prefix: str) -> None:
+    """Wrap every public function of every module in ``package`` in a ``{prefix}.{module}.{function}`` span.
+
+    Callers that look functions up on the module (``crud_contract.get_contract``), including other
+    functions of the same module, get the wrapped version.
+    """
+    for info in pkgutil.iter_modules(package.__path__):
+        module = importlib.import_module(f"{package.__name__}.{info.name}")
+        for name, value in list(vars(module).items()):
+            if _traceable(module, name, value):
+                setattr(module, name, traced(f"{prefix}.{info.name}.{name}")(value))
+
+
+def trace_endpoints(app) -> None:
+    """Run every API route's endpoint function in a ``handler {name}`` span"""
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or hasattr(route.dependant.call, "__wrapped__"):
+            continue
+        # The request handler calls dependant.call; a wrapper of the same kind keeps it on the threadpool or loop
+        route.dependant.call = traced(f"handler {route.name}")(route.dependant.call)
+
+
+# SQL spans (every engine)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None:
+        return
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    conn.info.setdefault("trace_spans", []).append(parent.child(
+        f"SQL {verb}",
+        KIND_CLIENT,
+        {
+            "db.system": conn.dialect.name,
+            "db.statement": " ".join(statement.split())[:2000],
+            "db.executemany": executemany,
+        },
+    ))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans and _current.get() is not None:
+        sql_span = spans.pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            sql_span.attributes["db.rows"] = cursor.rowcount
+        sql_span.end()
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get("trace_spans") if connection is not None else None
+    if spans and _current.get() is not None:
+        sql_span = spans.pop()
+        sql_span.fail(exception_context.original_exception)
+        sql_span.end()
+
+
+def trace_sql() -> None:
+    """Record a span for every statement run by a traced request"""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+# Export
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(exported: Span) -> dict:
+    otlp = {
+        "traceId": exported.trace.trace_id,
+        "spanId": exported.span_id,
+        "name": exported.name,
+        "kind": exported.kind,
+        "startTimeUnixNano": str(exported.start_ns),
+        "endTimeUnixNano": str(exported.start_ns + exported.duration_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in exported.attributes.items()],
+        "status": {"code": 2, "message": exported.error} if exported.error else {"code": 1},
+    }
+    if exported.parent_id:
+        otlp["parentSpanId"] = exported.parent_id
+    return otlp
+
+
+class SharedRotatingFile:
+    """Append-only file that every worker on the host writes to, rotated at ``max_bytes``.
+
+    Each batch is appended under an ``flock`` on ``<path>.lock``. The size check,
+    the rotation and the append happen together, so two workers never rotate
+    the same file twice or write into a file that was just rotated away.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self) -> None:
+        for index in range(self.backups - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write(self, data: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                size = self.path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if self.max_bytes and size and size + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as file:
+                file.write(data)
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(lock)
+
+
+class SpanExporter:
+    """Queues finished traces and writes them in batches from a background thread"""
+
+    def __init__(self, exporter: str, interval: float, max_spans: int):
+        self.exporter = exporter
+        self.interval = interval
+        self.max_spans = max_spans
+        self._queue: Deque[Span] = deque()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._file: Optional[SharedRotatingFile] = None
+        self.exported_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.last_export_at: Optional[datetime] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter in ("jsonl", "otlp")
+
+    def submit(self, trace: Trace) -> None:
+        with self._lock:
+            room = self.max_spans - len(self._queue)
+            if room < len(trace.spans):
+                self.dropped_total += len(trace.spans) - max(room, 0)
+            if room > 0:
+                self._queue.extend(trace.spans[:room])
+
+    def pending_count(self) -> int:
+        return len(self._queue)
+
+    def _write_jsonl(self, spans: List[Span]) -> None:
+        if self._file is None:
+            self._file = SharedRotatingFile(
+                settings.TRACE_FILE, settings.TRACE_FILE_MAX_BYTES, settings.TRACE_FILE_BACKUPS
+            )
+        self._file.write("".join(json.dumps(exported.export(), default=str) + "\n" for exported in spans).encode())
+
+    def _post_otlp(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": "ksa-psms"}},
+                    {"key": "service.version", "value": {"stringValue": settings.API_VERSION}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(exported) for exported in spans]}],
+            }],
+        }
+        request = urllib.request.Request(
+            settings.TRACE_OTLP_ENDPOINT,
+            data=json.dumps(body, default=str).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    def export(self) -> int:
+        """Write everything queued; returns spans written. Failed batches are dropped and counted"""
+        with self._export_lock:
+            with self._lock:
+                spans, self._queue = list(self._queue), deque()
+            if not spans:
+                return 0
+            try:
+                if self.exporter == "otlp":
+                    self._post_otlp(spans)
+                else:
+                    self._write_jsonl(spans)
+            except Exception as exc:
+                self.failed_total += len(spans)
+                logger.warning("Could not export %d spans to %s: %s", len(spans), self.exporter, exc)
+                return 0
+            self.exported_total += len(spans)
+            self.last_export_at = datetime.utcnow()
+            return len(spans)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.export()
+
+    def start(self) -> None:
+        """Start the export thread (no-op when tracing is off)"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the export thread and write anything still queued"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self.enabled:
+            self.export()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending_count(),
+            "exported_total": self.exported_total,
+            "dropped_total": self.dropped_total,
+            "failed_total": self.failed_total,
+            "last_export_at": self.last_export_at,
+        }
+
+
+span_exporter = SpanExporter(
+    settings.TRACE_EXPORTER.lower(), settings.TRACE_EXPORT_INTERVAL_SECONDS, settings.TRACE_QUEUE_MAX_SPANS
+)
+
+
+def _incoming_traceparent(scope) -> Optional[re.Match]:
+    for name, value in scope["headers"]:
+        if name == TRACEPARENT_HEADER:
+            return TRACEPARENT_PATTERN.fullmatch(value.decode("latin-1").strip().lower())
+    return None
+
+
+def _networks(value: str) -> List[Union[IPv4Network, IPv6Network]]:
+    return [ip_network(network.strip(), strict=False) for network in value.split(",") if network.strip()]
+
+
+class TracingMiddleware:
+    """Opens the request span of sampled requests, reports the trace id and hands the trace to the exporter"""
+
+    def __init__(self, app, exporter: SpanExporter = span_exporter):
+        self.app = app
+        self.exporter = exporter
+        self.trusted_networks = _networks(settings.TRACE_TRUSTED_NETWORKS)
+
+    async def _trusts_sampled_flag(self, scope) -> bool:
+        """Whether the caller may force tracing: it connects from ``TRACE_TRUSTED_NETWORKS`` or sends an admin token"""
+        client = scope.get("client")
+        if client and self.trusted_networks:
+            try:
+                address = ip_address(client[0])
+            except ValueError:
+                address = None
+            if address is not None and any(address in network for network in self.trusted_networks):
+                return True
+        authorization = Headers(scope=scope).get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        from app.utils.auth import is_admin_token  # app.utils.auth traces bcrypt through this module
+
+        return await run_in_threadpool(is_admin_token, token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.exporter.enabled:
+            await self.app(scope, receive, send)
+            return
+        parent = _incoming_traceparent(scope)
+        if parent is not None and int(parent.group(3), 16) & 1 and await self._trusts_sampled_flag(scope):
+            trace_id, parent_id = parent.group(1), parent.group(2)
+        elif settings.TRACE_SAMPLE_RATE and random.random() < settings.TRACE_SAMPLE_RATE:
+            trace_id, parent_id = (parent.group(1) if parent else os.urandom(16).hex()), None
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        method = request_method(scope)
+        request_span = Span(Trace(trace_id), method, parent_id, KIND_SERVER, {
+            "http.request.method": method,
+            "url.path": scope["path"],
+        })
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                request_span.attributes["http.response.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    request_span.error = f"HTTP {message['status']}"
+                MutableHeaders(scope=message)[TRACE_ID_HEADER] = trace_id
+            await send(message)
+
+        token = _current.set(request_span)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as exc:
+            request_span.fail(exc)
+            raise
+        finally:
+            _current.reset(token)
+            route = route_template(scope)
+            request_span.name = f"{method} {route}"
+            request_span.attributes["http.route"] = route
+            request_span.end()
+            self.exporter.submit(request_span.trace)
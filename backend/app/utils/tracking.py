@@ -0,0 +1,333 @@
+"""
+In-memory ingest buffer for vehicle GPS fixes.
+
+Fixes are validated against the set of actively tracked vehicles, recorded as
+the worker's latest positions and appended to a pending list. A background
+thread drains the pending list into ``vehicle_positions`` with bulk INSERTs, so
+the ingest endpoint never waits on the database. Latest-position reads merge
+those with the newest stored fixes, so they include what other workers received
+once it is flushed.
+
+A failed flush puts its batch back in the buffer for the next attempt, except
+rows that violate a constraint: those are found by bisecting the batch, then
+logged and dropped, so a single bad row cannot stall the buffer.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.crud import tracking as crud_tracking
+from app.database import SessionLocal
+from app.models.tracking import VehiclePosition
+from app.models.vehicle import Vehicle
+from app.schemas.tracking import PositionFix
+
+logger = logging.getLogger(__name__)
+
+# How long the set of actively tracked plates is trusted before re-reading it
+TRACKED_VEHICLES_TTL_SECONDS = 30.0
+
+
+class BufferFullError(Exception):
+    """Raised when accepting a batch would exceed the buffer capacity"""
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalise a timestamp to naive UTC, matching how the models store datetimes"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class PositionIngestBuffer:
+    """Thread-safe write buffer and latest-position cache for GPS fixes"""
+
+    def __init__(self, session_factory, flush_interval: float, flush_batch_size: int, max_buffered: int):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.max_buffered = max_buffered
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[dict] = []
+        # Fixes this worker received, not yet necessarily flushed
+        self._latest: dict = {}
+        self._stored: Optional[dict] = None
+        self._stored_loaded_at = 0.0
+        self._tracked: Optional[frozenset] = None
+        self._tracked_loaded_at = 0.0
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_listeners: List[Callable] = []
+
+        self.accepted_total = 0
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.rejected_total = 0
+        self.flush_count = 0
+        self.last_flush_at: Optional[datetime] = None
+        self.last_flush_seconds: Optional[float] = None
+
+    # Tracked vehicle set
+
+    def invalidate_tracked_vehicles(self) -> None:
+        """Force the next ingest to re-read which vehicles are actively tracked"""
+        self._tracked_loaded_at = 0.0
+
+    def _tracked_plates(self) -> frozenset:
+        now = time.monotonic()
+        if self._tracked is None or now - self._tracked_loaded_at > TRACKED_VEHICLES_TTL_SECONDS:
+            db = self._session_factory()
+            try:
+                rows = db.execute(
+                    select(Vehicle.vehicle_registration_plate).where(Vehicle.active_tracking == True)
+                ).scalars().all()
+            finally:
+                db.close()
+            self._tracked = frozenset(rows)
+            self._tracked_loaded_at = now
+        return self._tracked
+
+    # Ingest path
+
+    def ingest(self, fixes: Iterable[PositionFix]) -> Tuple[int, List[str]]:
+        """Buffer fixes for actively tracked vehicles.
+
+        Returns the number of accepted fixes and the distinct plates that were
+        rejected because they are unknown or not actively tracked.
+        """
+        tracked = self._tracked_plates()
+        rows = []
+        rejected = set()
+        for fix in fixes:
+            if fix.plate not in tracked:
+                rejected.add(fix.plate)
+                continue
+            recorded_at = to_utc_naive(fix.timestamp)
+            rows.append({
+                "vehicle_registration_plate": fix.plate,
+                "recorded_date": recorded_at.date(),
+                "recorded_at": recorded_at,
+                "latitude": fix.lat,
+                "longitude": fix.lon,
+                "speed": fix.speed,
+            })
+
+        with self._lock:
+            if len(self._pending) + len(rows) > self.max_buffered:
+                self.dropped_total += len(rows)
+                raise BufferFullError("Position buffer is full")
+            self._pending.extend(rows)
+            pending = len(self._pending)
+            self.accepted_total += len(rows)
+            latest = self._latest
+            for row in rows:
+                current = latest.get(row["vehicle_registration_plate"])
+                if current is None or current["recorded_at"] <= row["recorded_at"]:
+                    latest[row["vehicle_registration_plate"]] = row
+
+        if pending >= self.flush_batch_size:
+            self._wakeup.set()
+        return len(rows), sorted(rejected)
+
+    # Latest positions
+
+    def _stored_latest(self) -> dict:
+        """Newest stored fix per vehicle, re-read at most once per flush interval.
+
+        Other workers flush the fixes they accept within a flush interval, so
+        this is how their positions reach this worker.
+        """
+        now = time.monotonic()
+        if self._stored is None or now - self._stored_loaded_at > self.flush_interval:
+            db = self._session_factory()
+            try:
+                positions = crud_tracking.get_latest_positions(db)
+            finally:
+                db.close()
+            self._stored = {
+                position.vehicle_registration_plate: {
+                    "vehicle_registration_plate": position.vehicle_registration_plate,
+                    "recorded_date": position.recorded_date,
+                    "recorded_at": position.recorded_at,
+                    "latitude": position.latitude,
+                    "longitude": position.longitude,
+                    "speed": position.speed,
+                }
+                for position in positions
+            }
+            self._stored_loaded_at = now
+        return self._stored
+
+    @staticmethod
+    def _newer(a: Optional[dict], b: Optional[dict]) -> Optional[dict]:
+        if a is None or (b is not None and b["recorded_at"] > a["recorded_at"]):
+            return b
+        return a
+
+    def latest(self, plate: str) -> Optional[dict]:
+        """Most recent fix for a vehicle, whichever worker received it"""
+        stored = self._stored_latest().get(plate)
+        return self._newer(stored, self._latest.get(plate))
+
+    def latest_all(self) -> List[dict]:
+        """Most recent fix for every vehicle, whichever worker received it"""
+        merged = dict(self._stored_latest())
+        with self._lock:
+            received = list(self._latest.values())
+        for row in received:
+            plate = row["vehicle_registration_plate"]
+            merged[plate] = self._newer(merged.get(plate), row)
+        return list(merged.values())
+
+    def forget(self, plate: str) -> None:
+        """Drop a deleted vehicle from the latest positions and the pending buffer"""
+        with self._lock:
+            self._latest.pop(plate, None)
+            # Buffered fixes would now violate the vehicle foreign key and fail the whole flush
+            self._pending = [row for row in self._pending if row["vehicle_registration_plate"] != plate]
+        self._stored = None
+
+    # Flushing
+
+    def add_flush_listener(self, listener: Callable) -> None:
+        """Register ``listener(db, rows)`` to run inside every flush transaction"""
+        if listener not in self._flush_listeners:
+            self._flush_listeners.append(listener)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _insert(self, db, rows: List[dict]) -> None:
+        for start in range(0, len(rows), self.flush_batch_size):
+            db.execute(insert(VehiclePosition), rows[start:start + self.flush_batch_size])
+
+    def _find_rejected(self, db, rows: List[dict]) -> List[dict]:
+        """Rows that fail to insert, found by bisecting ``rows``; every attempt is rolled back"""
+        try:
+            self._insert(db, rows)
+        except IntegrityError:
+            db.rollback()
+            if len(rows) == 1:
+                return rows
+            middle = len(rows) // 2
+            return self._find_rejected(db, rows[:middle]) + self._find_rejected(db, rows[middle:])
+        db.rollback()
+        return []
+
+    def _reject_failing_rows(self, db, rows: List[dict]) -> List[dict]:
+        """Drop the rows that can never insert (such as fixes for a vehicle deleted mid-flush); returns the rest"""
+        # Usually a vehicle was deleted; its rows are spread through the batch, which bisection handles poorly
+        plates = {row["vehicle_registration_plate"] for row in rows}
+        existing = set(db.execute(
+            select(Vehicle.vehicle_registration_plate).where(Vehicle.vehicle_registration_plate.in_(plates))
+        ).scalars())
+        db.rollback()
+        kept = [row for row in rows if row["vehicle_registration_plate"] in existing]
+        rejected = [row for row in rows if row["vehicle_registration_plate"] not in existing]
+        failing = self._find_rejected(db, kept)
+        if failing:
+            failing_ids = {id(row) for row in failing}
+            kept = [row for row in kept if id(row) not in failing_ids]
+            rejected += failing
+        if rejected:
+            self.rejected_total += len(rejected)
+            logger.warning(
+                "Dropped %d vehicle positions that failed to insert (plates: %s)",
+                len(rejected), ", ".join(sorted({row["vehicle_registration_plate"] for row in rejected})),
+            )
+        return kept
+
+    def flush(self) -> int:
+        """Write all pending fixes to the database in bulk; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            db = self._session_factory()
+            try:
+                try:
+                    self._insert(db, rows)
+                except IntegrityError:
+                    # One bad row would otherwise fail every retry of the batch and stall the buffer
+                    db.rollback()
+                    rows = self._reject_failing_rows(db, rows)
+                    self._insert(db, rows)
+                for listener in self._flush_listeners:
+                    listener(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    # Put the batch back in front so ordering is preserved for the next attempt
+                    room = max(self.max_buffered - len(self._pending), 0)
+                    kept = rows[:room]
+                    self.dropped_total += len(rows) - len(kept)
+                    self._pending = kept + self._pending
+                logger.exception("Failed to flush %d vehicle positions", len(rows))
+                return 0
+            finally:
+                db.close()
+
+            self.flushed_total += len(rows)
+            self.flush_count += 1
+            self.last_flush_at = datetime.utcnow()
+            self.last_flush_seconds = time.perf_counter() - started
+            return len(rows)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Vehicle position flush loop error")
+
+    def start(self) -> None:
+        """Start the background flush thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="position-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and flush whatever is still pending"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._pending),
+            "accepted_total": self.accepted_total,
+            "flushed_total": self.flushed_total,
+            "dropped_total": self.dropped_total,
+            "rejected_total": self.rejected_total,
+            "flush_count": self.flush_count,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_seconds": self.last_flush_seconds,
+            "tracked_vehicles": len(self._tracked or ()),
+        }
+
+
+position_buffer = PositionIngestBuffer(
+    SessionLocal,
+    flush_interval=settings.TRACKING_FLUSH_INTERVAL_SECONDS,
+    flush_batch_size=settings.TRACKING_FLUSH_BATCH_SIZE,
+    max_buffered=settings.TRACKING_BUFFER_MAX_FIXES,
+)
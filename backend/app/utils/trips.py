@@ -0,0 +1,352 @@
+"""
+Background compaction of raw vehicle positions.
+
+Each run reads the positions a vehicle reported since its compaction high-water
+mark, splits them into trips, stores every closed trip with a simplified path
+for map rendering, and folds trip distance and moving time into per-day
+rollups. Positions belonging to a trip that may still be in progress are left
+for the next run. Every worker process runs a compactor; a cross-process lock
+(``app.utils.locks``) lets one run at a time, and the others skip their turn.
+
+Raw positions older than the retention window are deleted once their vehicle
+has compacted them, so a vehicle that stops reporting only holds back its own
+positions.
+"""
+import json
+import logging
+import math
+import threading
+from datetime import datetime, timedelta, date
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.tracking import (
+    VehiclePosition, VehicleTrip, VehicleDailyRollup, TrackCompactionState, SiteVisit
+)
+from app.utils.geofence import EARTH_RADIUS_METERS
+from app.utils.locks import transaction_lock
+
+logger = logging.getLogger(__name__)
+
+# Two fixes further apart than this never belong to the same trip
+TRIP_GAP_SECONDS = 300
+# A trip ends once the vehicle has not moved for this long
+STOP_DWELL_SECONDS = 300
+# Segments slower than this are treated as GPS jitter, not movement
+MIN_MOVING_SPEED_KMH = 3.0
+# Trips shorter than this are discarded as noise
+MIN_TRIP_METERS = 100.0
+# Positions younger than this are not compacted yet (late fixes may still arrive)
+SETTLE_SECONDS = 60
+# Maximum raw positions loaded per vehicle per query
+LOAD_CHUNK = 50000
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def simplify_path(points: Sequence[Tuple[float, float]], tolerance_meters: float) -> List[Tuple[float, float]]:
+    """Ramer-Douglas-Peucker line simplification of a (lat, lon) track"""
+    if len(points) < 3:
+        return list(points)
+
+    # Project onto a local plane in metres so the tolerance is uniform
+    ref_lat = math.radians(points[0][0])
+    scale_x = EARTH_RADIUS_METERS * math.cos(ref_lat) * math.pi / 180
+    scale_y = EARTH_RADIUS_METERS * math.pi / 180
+    xy = [(lon * scale_x, lat * scale_y) for lat, lon in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xy[first]
+        x2, y2 = xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        max_distance = -1.0
+        index = first
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if length == 0:
+                distance = math.hypot(px - x1, py - y1)
+            else:
+                distance = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / length
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if max_distance > tolerance_meters:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+class _Trip:
+    """Trip being assembled from consecutive fixes"""
+
+    def __init__(self, start_index: int):
+        self.start_index = start_index
+        self.last_moving_index = start_index
+        self.distance_m = 0.0
+        self.moving_seconds = 0.0
+        self.max_speed: Optional[float] = None
+        # day -> [metres, moving seconds], attributed to the day each segment ended
+        self.by_day: Dict[date, List[float]] = {}
+
+    def add_segment(self, end_index: int, end_time: datetime, metres: float, seconds: float, speed: Optional[float]):
+        self.last_moving_index = end_index
+        self.distance_m += metres
+        self.moving_seconds += seconds
+        if speed is not None and (self.max_speed is None or speed > self.max_speed):
+            self.max_speed = speed
+        day_totals = self.by_day.setdefault(end_time.date(), [0.0, 0.0])
+        day_totals[0] += metres
+        day_totals[1] += seconds
+
+
+class TrackCompactor:
+    """Turns raw positions into trips and daily rollups on a background thread"""
+
+    def __init__(self, session_factory, interval: float, retention_days: int, simplify_tolerance: float):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.retention_days = retention_days
+        self.simplify_tolerance = simplify_tolerance
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds: Optional[float] = None
+
+    # Trip segmentation
+
+    def _split_trips(self, fixes: List[VehiclePosition], final: bool) -> Tuple[List[_Trip], int]:
+        """Split ordered fixes into closed trips.
+
+        Returns the closed trips and the number of leading fixes that are fully
+        consumed; any fixes after that belong to a trip that may still continue.
+        """
+        trips: List[_Trip] = []
+        current: Optional[_Trip] = None
+        for i in range(1, len(fixes)):
+            a, b = fixes[i - 1], fixes[i]
+            seconds = (b.recorded_at - a.recorded_at).total_seconds()
+            if current is not None:
+                idle = (a.recorded_at - fixes[current.last_moving_index].recorded_at).total_seconds()
+                if seconds > TRIP_GAP_SECONDS or idle > STOP_DWELL_SECONDS:
+                    trips.append(current)
+                    current = None
+            if seconds <= 0 or seconds > TRIP_GAP_SECONDS:
+                continue
+            metres = haversine_meters(a.latitude, a.longitude, b.latitude, b.longitude)
+            if metres / seconds * 3.6 < MIN_MOVING_SPEED_KMH:
+                continue
+            if current is None:
+                current = _Trip(i - 1)
+            current.add_segment(i, b.recorded_at, metres, seconds, b.speed)
+
+        if current is not None:
+            tail_idle = (fixes[-1].recorded_at - fixes[current.last_moving_index].recorded_at).total_seconds()
+            if final or tail_idle > STOP_DWELL_SECONDS:
+                trips.append(current)
+                current = None
+
+        consumed = current.start_index if current is not None else len(fixes)
+        return [t for t in trips if t.distance_m >= MIN_TRIP_METERS], consumed
+
+    # Compaction
+
+    def _compact_vehicle(self, db: Session, plate: str, cutoff: datetime, rollups: dict) -> int:
+        state = db.get(TrackCompactionState, plate)
+        watermark = state.processed_until if state else None
+        trips_written = 0
+
+        while True:
+            query = select(VehiclePosition).where(
+                VehiclePosition.vehicle_registration_plate == plate,
+                VehiclePosition.recorded_at <= cutoff,
+            )
+            if watermark is not None:
+                query = query.where(
+                    VehiclePosition.recorded_date >= watermark.date(),
+                    VehiclePosition.recorded_at > watermark,
+                )
+            fixes = db.execute(query.order_by(VehiclePosition.recorded_at).limit(LOAD_CHUNK)).scalars().all()
+            if not fixes:
+                break
+
+            exhausted = len(fixes) < LOAD_CHUNK
+            final = exhausted and (cutoff - fixes[-1].recorded_at).total_seconds() > TRIP_GAP_SECONDS
+            trips, consumed = self._split_trips(fixes, final)
+            if consumed == 0 and not exhausted:
+                # One trip spans the whole chunk; close it at the chunk boundary
+                trips, consumed = self._split_trips(fixes, final=True)
+
+            for trip in trips:
+                path_fixes = fixes[trip.start_index:trip.last_moving_index + 1]
+                start, end = path_fixes[0], path_fixes[-1]
+                path = simplify_path([(f.latitude, f.longitude) for f in path_fixes], self.simplify_tolerance)
+                db.add(VehicleTrip(
+                    vehicle_registration_plate=plate,
+                    started_at=start.recorded_at,
+                    ended_at=end.recorded_at,
+                    start_latitude=start.latitude,
+                    start_longitude=start.longitude,
+                    end_latitude=end.latitude,
+                    end_longitude=end.longitude,
+                    distance_km=round(trip.distance_m / 1000, 3),
+                    duration_seconds=int((end.recorded_at - start.recorded_at).total_seconds()),
+                    max_speed=trip.max_speed,
+                    point_count=len(path_fixes),
+                    path=json.dumps([[round(lat, 6), round(lon, 6)] for lat, lon in path]),
+                ))
+                self._add_to_rollups(db, plate, trip, start.recorded_at.date(), rollups)
+                trips_written += 1
+
+            if consumed == 0:
+                break
+            watermark = fixes[consumed - 1].recorded_at
+            if exhausted:
+                break
+
+        if watermark is not None:
+            if state is None:
+                db.add(TrackCompactionState(vehicle_registration_plate=plate, processed_until=watermark))
+            else:
+                state.processed_until = watermark
+        return trips_written
+
+    def _rollup(self, db: Session, plate: str, day: date, rollups: dict) -> VehicleDailyRollup:
+        """Rollup row for a vehicle-day, cached for the run (sessions do not autoflush)"""
+        rollup = rollups.get((plate, day))
+        if rollup is None:
+            rollup = db.execute(
+                select(VehicleDailyRollup).where(
+                    VehicleDailyRollup.vehicle_registration_plate == plate,
+                    VehicleDailyRollup.day == day,
+                )
+            ).scalar_one_or_none()
+            if rollup is None:
+                rollup = VehicleDailyRollup(
+                    vehicle_registration_plate=plate, day=day,
+                    km_driven=0, moving_seconds=0, trip_count=0, sites_visited=0,
+                )
+                db.add(rollup)
+            rollups[(plate, day)] = rollup
+        return rollup
+
+    def _add_to_rollups(self, db: Session, plate: str, trip: _Trip, start_day: date, rollups: dict) -> None:
+        for day, (metres, seconds) in trip.by_day.items():
+            rollup = self._rollup(db, plate, day, rollups)
+            rollup.km_driven = round(rollup.km_driven + metres / 1000, 3)
+            rollup.moving_seconds += int(seconds)
+        self._rollup(db, plate, start_day, rollups).trip_count += 1
+
+    def _refresh_sites_visited(self, db: Session, rollups: dict) -> None:
+        for (plate, day), rollup in rollups.items():
+            day_start = datetime.combine(day, datetime.min.time())
+            rollup.sites_visited = db.execute(
+                select(func.count(func.distinct(SiteVisit.site_id))).where(
+                    SiteVisit.vehicle_registration_plate == plate,
+                    SiteVisit.arrived_at >= day_start,
+                    SiteVisit.arrived_at < day_start + timedelta(days=1),
+                )
+            ).scalar() or 0
+
+    def _expire_raw_positions(self, db: Session) -> int:
+        """Delete raw positions past the retention window, each vehicle only up to its own watermark"""
+        cutoff_day = datetime.utcnow().date() - timedelta(days=self.retention_days)
+        # Never delete positions that have not been compacted yet; vehicles without a watermark keep everything
+        processed_until = (
+            select(TrackCompactionState.processed_until)
+            .where(TrackCompactionState.vehicle_registration_plate == VehiclePosition.vehicle_registration_plate)
+            .scalar_subquery()
+        )
+        result = db.execute(
+            delete(VehiclePosition).where(
+                VehiclePosition.recorded_date < cutoff_day,
+                VehiclePosition.recorded_at <= processed_until,
+            )
+        )
+        return result.rowcount or 0
+
+    def run_once(self, wait: bool = True) -> Optional[dict]:
+        """Compact every vehicle with raw positions and apply retention.
+
+        Each vehicle's trips, rollups and watermark commit together, so the
+        database write lock is never held for a whole run. Runs are exclusive
+        across worker processes. With ``wait=False`` returns None instead of
+        waiting when another process is compacting.
+        """
+        with self._run_lock:
+            started = datetime.utcnow()
+            cutoff = started - timedelta(seconds=SETTLE_SECONDS)
+            # The run lock lives in a transaction of its own, held across the short ones below
+            lock_db = self._session_factory()
+            db = self._session_factory()
+            try:
+                # Before reading any watermark, so no two runs compact the same positions
+                if not transaction_lock(lock_db, "track-compaction", wait=wait):
+                    return None
+                plates = db.execute(
+                    select(VehiclePosition.vehicle_registration_plate).distinct()
+                ).scalars().all()
+                trips = 0
+                rollups: dict = {}
+                for plate in plates:
+                    trips += self._compact_vehicle(db, plate, cutoff, rollups)
+                    db.commit()
+                self._refresh_sites_visited(db, rollups)
+                db.commit()
+                expired = self._expire_raw_positions(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+                lock_db.close()
+            self.last_run_at = started
+            self.last_run_seconds = (datetime.utcnow() - started).total_seconds()
+            return {"vehicles": len(plates), "trips": trips, "rollup_days": len(rollups), "expired_positions": expired}
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                # Another worker compacting now covers this interval
+                self.run_once(wait=False)
+            except Exception:
+                logger.exception("Track compaction failed")
+
+    def start(self) -> None:
+        """Start the periodic compaction thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="track-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the compaction thread"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+
+track_compactor = TrackCompactor(
+    SessionLocal,
+    interval=settings.TRACKING_COMPACTION_INTERVAL_SECONDS,
+    retention_days=settings.TRACKING_RAW_RETENTION_DAYS,
+    simplify_tolerance=settings.TRACKING_SIMPLIFY_TOLERANCE_METERS,
+)
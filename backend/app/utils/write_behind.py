@@ -0,0 +1,134 @@
+"""
+Write-behind buffer for low-value timestamp updates.
+
+Values such as ``users.last_login`` are recorded in memory and written every
+few seconds (and at shutdown) with one executemany UPDATE per column, in a
+single short transaction. Only the newest value per row is kept, so a login
+storm costs one write per user per flush instead of a transaction per login.
+Readers may see a value up to one flush interval old.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, inspect, update
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Coalesces column updates in memory and applies them in batches"""
+
+    def __init__(self, session_factory, flush_interval: float):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (model, column) -> {primary key: value}
+        self._pending: Dict[Tuple[type, str], Dict[Any, Any]] = {}
+        self._listeners: List[Callable] = []
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded_total = 0
+        self.written_total = 0
+        self.flush_count = 0
+        self.last_flush_at: Optional[datetime] = None
+
+    def record(self, model: type, column: str, key: Any, value: Any) -> None:
+        """Queue ``model.column = value`` for the row whose primary key is ``key``.
+
+        When the same row is recorded twice before a flush, the larger value wins.
+        """
+        with self._lock:
+            values = self._pending.setdefault((model, column), {})
+            current = values.get(key)
+            if current is None or value >= current:
+                values[key] = value
+            self.recorded_total += 1
+
+    def add_flush_listener(self, listener: Callable) -> None:
+        """Register ``listener(model, column, keys)`` to run after each committed flush"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def pending_count(self) -> int:
+        return sum(len(values) for values in self._pending.values())
+
+    def flush(self) -> int:
+        """Apply all pending updates in one transaction; returns rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            db = self._session_factory()
+            try:
+                for (model, column), values in pending.items():
+                    pk = inspect(model).primary_key[0]
+                    statement = (
+                        update(model.__table__)
+                        .where(pk == bindparam("_pk"))
+                        .values({column: bindparam("_value")})
+                    )
+                    db.execute(statement, [{"_pk": key, "_value": value} for key, value in values.items()])
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    # Keep newer values recorded during the failed flush
+                    for target, values in pending.items():
+                        merged = self._pending.setdefault(target, {})
+                        for key, value in values.items():
+                            if key not in merged or merged[key] < value:
+                                merged[key] = value
+                logger.exception("Write-behind flush failed")
+                return 0
+            finally:
+                db.close()
+
+            written = sum(len(values) for values in pending.values())
+            self.written_total += written
+            self.flush_count += 1
+            self.last_flush_at = datetime.utcnow()
+            for (model, column), values in pending.items():
+                for listener in self._listeners:
+                    try:
+                        listener(model, column, list(values))
+                    except Exception:
+                        logger.exception("Write-behind flush listener failed")
+            return written
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write anything still pending"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending_count(),
+            "recorded_total": self.recorded_total,
+            "written_total": self.written_total,
+            "flush_count": self.flush_count,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+write_behind = WriteBehindBuffer(SessionLocal, flush_interval=settings.WRITE_BEHIND_FLUSH_SECONDS)
@@ -0,0 +1,46 @@
+"""
+Production server configuration.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+gunicorn supervises ``WORKERS`` uvicorn worker processes that share one
+listening socket:
+
+- The master imports the app once (``preload_app``) and runs the startup tasks
+  (schema, default admin, table-versions generation) before forking. Workers
+  share the imported code and data copy-on-write, and each one starts by
+  running the app's lifespan: directories and background workers.
+- A worker is replaced after ``WORKER_MAX_REQUESTS`` requests (plus jitter, so
+  they do not all restart at once). This bounds memory growth from
+  fragmentation and caches.
+- SIGTERM (``docker stop``) stops the workers from accepting connections and
+  lets in-flight requests finish, for up to ``WORKER_GRACEFUL_TIMEOUT_SECONDS``.
+  Each worker then runs the lifespan shutdown, which flushes buffered writes.
+
+Everything is configured through ``app.config.Settings``; see the README.
+Development keeps using ``uvicorn main:app --reload`` or ``python main.py``.
+"""
+import os
+from app.config import settings
+
+bind = settings.SERVER_BIND
+workers = settings.WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER if settings.WORKER_MAX_REQUESTS else 0
+graceful_timeout = settings.WORKER_GRACEFUL_TIMEOUT_SECONDS
+timeout = settings.WORKER_TIMEOUT_SECONDS
+keepalive = 5
+
+
+def on_starting(server):
+    """Runs once in the master, after the app import and before the first worker is forked"""
+    from app.database import engine
+    from app.utils.startup import STARTUP_TASKS_DONE_ENV, run_startup_tasks, startup_timings
+
+    run_startup_tasks()
+    # Workers open their own connections
+    engine.dispose()
+    os.environ[STARTUP_TASKS_DONE_ENV] = str(os.getpid())
+    server.log.info("Preloaded app in %.0f ms (%s)", startup_timings.total * 1000, startup_timings.summary())
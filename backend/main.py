@@ -1,27 +1,93 @@
-from fastapi import FastAPI
+import logging
+import os
+import time
+
+# Timed from here: importing the app is part of every worker's startup
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from app.config import settings
-from app.database import init_db, get_db
-from app.api.endpoints import sites, staff, meetings, contracts, vehicles, auth
-from app.crud.user import create_default_admin
+from app.database import engine, async_engine, replica_router
+from app import crud
+from app.api.endpoints import sites, staff, meetings, contracts, vehicles, auth, tracking, system, dashboard
+from app.utils.tracking import position_buffer
+from app.utils.geofence import geofence_engine
+from app.utils.trips import track_compactor
+from app.utils.auth import password_hash_pool
+from app.utils.hashing import HashingBusyError
+from app.utils.write_behind import write_behind
+from app.utils.replicas import ReadYourWritesMiddleware
+from app.utils.query_stats import QueryStatsMiddleware, configure_slow_query_log
+from app.utils.metrics import MetricsMiddleware, render_metrics
+from app.utils.pool_metrics import pool_stats
+from app.utils.response_cache import ResponseCacheMiddleware, response_cache
+from app.utils.compression import CompressionMiddleware, PrecompressedStaticFiles
+from app.utils.admission import AdmissionControlMiddleware, admission_controller
+from app.utils.profiling import ProfilingMiddleware, profile_sql
+from app.utils.memory import IdentityMapMiddleware, memory_metrics, track_identity_maps
+from app.utils.tracing import TracingMiddleware, span_exporter, trace_endpoints, trace_package, trace_sql
+from app.utils.startup import prepare_directories, run_startup_tasks, startup_timings
+
+# uvicorn's own logger, so the startup report shows up next to "Application startup complete"
+logger = logging.getLogger("uvicorn.error")
 
-# Initialize database
-init_db()
+UPLOADS_DIR = Path("uploads")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup (directories, schema, default admin, background workers) and shutdown"""
+    with startup_timings.phase("directories"):
+        # Slow statements and query-heavy requests are logged to a rotating file
+        configure_slow_query_log()
+        prepare_directories((UPLOADS_DIR, contracts.UPLOAD_DIR, vehicles.UPLOAD_DIR))
+    run_startup_tasks()
+    with startup_timings.phase("background_workers"):
+        # Write-behind flusher, vehicle position flusher (with geofence detection), track compactor
+        # replica lag monitor and trace exporter. Every worker runs them; geofence detection and
+        # compaction take cross-process locks (app.utils.locks) around their transactions
+        write_behind.start()
+        position_buffer.add_flush_listener(geofence_engine.process)
+        position_buffer.start()
+        track_compactor.start()
+        replica_router.start()
+        span_exporter.start()
+    startup_timings.ready_at = time.time()
+    logger.info(
+        "Worker %d ready in %.0f ms (%s)", os.getpid(), startup_timings.total * 1000, startup_timings.summary()
+    )
+    try:
+        yield
+    finally:
+        # Stop background workers and flush buffered vehicle positions and spans before exiting
+        span_exporter.stop()
+        replica_router.stop()
+        track_compactor.stop()
+        position_buffer.stop()
+        write_behind.stop()
+        password_hash_pool.shutdown()
+        # Close pooled asyncio database connections
+        await async_engine.dispose()
 
-# Create default admin user if no users exist
-db = next(get_db())
-create_default_admin(db)
-db.close()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.API_TITLE,
     version=settings.API_VERSION,
-    description="Power Station Management System API"
+    description="Power Station Management System API",
+    lifespan=lifespan,
 )
 
+# Per route class concurrency budgets; excess /api requests get a fast 503 (inside the cache, so hits are never shed)
+app.add_middleware(AdmissionControlMiddleware)
+
+# ETags and cached responses for read endpoints (inside CORS, so replays get the caller's CORS headers)
+app.add_middleware(ResponseCacheMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,10 +97,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount uploads directory for file serving
-uploads_path = Path("uploads")
-uploads_path.mkdir(exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Pin clients to the primary database briefly after they write (no-op without replicas)
+app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+
+# Per-route peak session identity map sizes, for memory diagnostics
+track_identity_maps()
+app.add_middleware(IdentityMapMiddleware)
+
+# Statistical profiles of requests that ask for one (admins) or are sampled, with SQL time from cursor hooks
+profile_sql()
+app.add_middleware(ProfilingMiddleware)
+
+# Per-request SQL count and time, reported in Server-Timing (outside profiling, which reports them too)
+app.add_middleware(QueryStatsMiddleware)
+
+# gzip/br/zstd response compression, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Spans for sampled requests: handlers, crud functions and SQL statements (uploads and bcrypt open their own)
+trace_sql()
+trace_package(crud, "crud")
+app.add_middleware(TracingMiddleware)
+
+# Per-route request metrics for /metrics (outermost, so it times everything above)
+app.add_middleware(MetricsMiddleware)
+
+# Mount uploads directory for file serving (with precompressed copies of text documents); created at startup
+app.mount("/uploads", PrecompressedStaticFiles(directory=UPLOADS_DIR, check_dir=False), name="uploads")
 
 # Include routers
 app.include_router(auth.router)
@@ -43,6 +132,19 @@ app.include_router(staff.router)
 app.include_router(meetings.router)
 app.include_router(contracts.router)
 app.include_router(vehicles.router)
+app.include_router(tracking.router)
+app.include_router(system.router)
+app.include_router(dashboard.router)
+trace_endpoints(app)
+
+@app.exception_handler(HashingBusyError)
+def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    """Fail fast when the password hashing pool is saturated"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many concurrent authentication requests, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 @app.get("/")
 def read_root():
@@ -58,6 +160,42 @@ def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    pools = [pool_stats(engine, "sync"), pool_stats(async_engine, "async")]
+    for replica in replica_router.replicas:
+        pools.append(pool_stats(replica.engine, replica.name))
+        pools.append(pool_stats(replica.async_engine, f"{replica.name}-async"))
+    jobs = {
+        "write_behind": {
+            "pending": write_behind.pending_count(),
+            "last_success_at": write_behind.last_flush_at,
+        },
+        "position_flush": {
+            "pending": position_buffer.pending_count(),
+            "last_success_at": position_buffer.last_flush_at,
+            "last_duration_seconds": position_buffer.last_flush_seconds,
+        },
+        "track_compaction": {
+            "last_success_at": track_compactor.last_run_at,
+            "last_duration_seconds": track_compactor.last_run_seconds,
+        },
+        "trace_export": {
+            "pending": span_exporter.pending_count(),
+            "last_success_at": span_exporter.last_export_at,
+        },
+    }
+    return PlainTextResponse(
+        render_metrics(
+            pools, replica_router.stats(), jobs, response_cache.stats(), startup_timings.phases,
+            admission_controller.stats(), memory_metrics(),
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
+
+startup_timings.record("import", time.perf_counter() - _import_started)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
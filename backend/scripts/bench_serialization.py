@@ -0,0 +1,125 @@
+"""
+Response serialization benchmark.
+
+Loads 1,000 rows of each listed resource from a scratch database seeded with
+``seed_data``, then times turning them into a JSON body two ways:
+
+- FastAPI's default path: ``response_model`` validation, ``jsonable_encoder``
+  and ``JSONResponse``;
+- ``app.utils.serialization.json_response``, the opt-in fast path.
+
+Relationships are loaded before timing, so only serialization is measured.
+Both bodies must be identical, including for rows wrapped in ``with_fields``. Exits 1 when a body differs or when the fast
+path is less than ``--min-speedup`` times faster.
+
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --rows 5000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_ms(fn, repeat: int) -> float:
+    """Median wall time of ``fn`` in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FastAPI's response serialization with json_response")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per list")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case (median reported)")
+    parser.add_argument("--min-speedup", type=float, default=2.0, help="Fail when the fast path is slower than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ksa-serialization-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'serialization.db')}"
+    os.environ["DEBUG"] = "false"
+    os.environ["SLOW_QUERY_LOG_FILE"] = os.path.join(workdir, "slow_queries.log")
+    os.environ["TRACE_EXPORTER"] = "none"
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        from fastapi.responses import JSONResponse
+        from fastapi.routing import serialize_response
+        from fastapi.utils import create_response_field
+        from seed_data import seed
+        from app.crud import contract as crud_contract, meeting as crud_meeting, site as crud_site
+        from app.crud import staff as crud_staff, vehicle as crud_vehicle
+        from app.database import SessionLocal, engine, init_db
+        from app.schemas.contract import ContractResponse
+        from app.schemas.meeting import MeetingResponse
+        from app.schemas.site import SiteResponse
+        from app.schemas.staff import StaffResponse
+        from app.schemas.vehicle import VehicleResponse
+        from app.utils.serialization import json_response, trusted_encoder, with_fields
+
+        init_db()
+        seed(engine, sites=args.rows, staff=args.rows, contracts=args.rows, meetings=args.rows, vehicles=args.rows)
+        db = SessionLocal()
+        cases = [
+            ("sites", SiteResponse, crud_site.list_sites(db, 0, args.rows)),
+            ("staff", StaffResponse, crud_staff.list_staff(db, 0, args.rows)),
+            # with_fields replacing a loaded column
+            ("renamed", StaffResponse,
+             [with_fields(row, name="Renamed") for row in crud_staff.list_staff(db, 0, args.rows)]),
+            ("meetings", MeetingResponse, crud_meeting.list_meetings(db, 0, args.rows)),
+            ("contracts", ContractResponse, crud_contract.get_contracts(db, 0, args.rows)),
+            ("vehicles", VehicleResponse, crud_vehicle.get_vehicles(db, 0, args.rows)),
+        ]
+
+        loop = asyncio.new_event_loop()
+        failures = []
+        print(f"{'list':<10} {'rows':>6} {'bytes':>10} {'fastapi ms':>11} {'fast ms':>9} {'speedup':>8}  path")
+        for name, model, rows in cases:
+            annotation = List[model]
+            field = create_response_field(name=f"Response_{name}", type_=annotation)
+
+            def default_path():
+                content = loop.run_until_complete(
+                    serialize_response(field=field, response_content=rows, is_coroutine=True)
+                )
+                return JSONResponse(content).body
+
+            def fast_path():
+                return json_response(annotation, rows).body
+
+            # The first call also lazy-loads relationships
+            expected = default_path()
+            if fast_path() != expected:
+                failures.append(f"{name}: json_response body differs from FastAPI's")
+            default_ms = time_ms(default_path, args.repeat)
+            fast_ms = time_ms(fast_path, args.repeat)
+            speedup = default_ms / fast_ms if fast_ms else float("inf")
+            path = "trusted" if trusted_encoder(annotation) is not None else "TypeAdapter"
+            print(f"{name:<10} {len(rows):>6} {len(expected):>10} {default_ms:>11.1f} {fast_ms:>9.1f} "
+                  f"{speedup:>7.1f}x  {path}")
+            if speedup < args.min_speedup:
+                failures.append(f"{name}: {speedup:.1f}x is below --min-speedup {args.min_speedup}")
+        loop.close()
+        db.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
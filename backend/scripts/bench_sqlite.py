@@ -0,0 +1,134 @@
+"""
+SQLite engine profile benchmark.
+
+Runs the same mixed read/write workload against two fresh database files, one
+opened the way the app used to (``check_same_thread=False`` only) and one with
+the tuned profile from ``app.database.build_engine``, then prints throughput,
+latency and "database is locked" failures side by side.
+
+    python scripts/bench_sqlite.py --seconds 10 --readers 16 --writers 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEBUG", "false")
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.database import Base, build_engine  # noqa: E402
+from app.models import Site, Staff  # noqa: E402
+
+
+def seed(engine, sites: int, staff: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(Site(name=f"Site {i}", coordinates=f"-26.{i:03d}, 29.{i:03d}") for i in range(sites))
+        db.add_all(Staff(name=f"Name{i}", surname=f"Surname{i}", role="Technician") for i in range(staff))
+        db.commit()
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_workload(engine, seconds: float, readers: int, writers: int, staff_rows: int) -> dict:
+    Session = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"read": [], "write": [], "locked": 0, "errors": 0}
+
+    def reader():
+        latencies = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            with Session() as db:
+                offset = random.randint(0, max(staff_rows - 100, 0))
+                db.execute(select(Staff).order_by(Staff.id).offset(offset).limit(100)).scalars().all()
+                db.execute(select(func.count(Site.id))).scalar()
+            latencies.append(time.perf_counter() - started)
+        with lock:
+            results["read"].extend(latencies)
+
+    def writer():
+        latencies = []
+        locked = errors = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.add(Staff(name="Bench", surname=str(random.random()), role="Casual"))
+                    site = db.get(Site, random.randint(1, 50))
+                    if site is not None:
+                        site.contact_person = f"Contact {random.randint(0, 9999)}"
+                    db.commit()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as exc:
+                if "locked" in str(exc):
+                    locked += 1
+                else:
+                    errors += 1
+        with lock:
+            results["write"].extend(latencies)
+            results["locked"] += locked
+            results["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "reads_per_s": len(results["read"]) / elapsed,
+        "writes_per_s": len(results["write"]) / elapsed,
+        "read_p95_ms": percentile(results["read"], 0.95) * 1000,
+        "write_p95_ms": percentile(results["write"], 0.95) * 1000,
+        "locked": results["locked"],
+        "errors": results["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the default and tuned SQLite engine profiles")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--staff", type=int, default=5000, help="Rows seeded into the staff table")
+    args = parser.parse_args()
+
+    profiles = {
+        "default": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "tuned": build_engine,
+    }
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, factory in profiles.items():
+            engine = factory(f"sqlite:///{os.path.join(directory, name + '.db')}")
+            seed(engine, sites=50, staff=args.staff)
+            report[name] = run_workload(engine, args.seconds, args.readers, args.writers, args.staff)
+            engine.dispose()
+
+    columns = list(report["default"])
+    print(f"{'metric':<14}" + "".join(f"{name:>12}" for name in report))
+    for column in columns:
+        print(f"{column:<14}" + "".join(f"{report[name][column]:>12.1f}" for name in report))
+
+
+if __name__ == "__main__":
+    main()
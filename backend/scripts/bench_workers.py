@@ -0,0 +1,183 @@
+"""
+Multi-process throughput benchmark.
+
+Seeds a scratch database, then starts the production server
+(``gunicorn -c gunicorn.conf.py main:app``) once per ``--workers`` count and
+drives the read endpoints with ``load_test`` from ``--clients`` processes. For
+each worker count it reports:
+
+- throughput, with its speedup over the first count and the scaling
+  efficiency (speedup divided by the increase in workers);
+- latency percentiles and errors;
+- the memory of master plus workers, as RSS and as PSS. PSS splits shared pages
+  between the processes that map them, so the gap between the two is what the
+  preloaded app saves through copy-on-write.
+
+The response cache is off and worker recycling is disabled, so every request
+runs its endpoint. Load generation shares the machine with the server, so give
+it enough ``--clients`` and expect scaling only up to the number of cores.
+
+    python scripts/bench_workers.py --workers 1 2 4 --clients 2 --seconds 15
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import DEFAULT_PATHS, percentile, run as run_load  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """Rss and Pss of one process from /proc (Linux only)"""
+    values = {"Rss": 0, "Pss": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                key = line.split(":")[0]
+                if key in values:
+                    values[key] = int(line.split()[1])
+    except OSError:
+        pass
+    return values
+
+
+def server_pids(master: int) -> List[int]:
+    try:
+        children = subprocess.check_output(["pgrep", "-P", str(master)], text=True).split()
+    except subprocess.CalledProcessError:
+        children = []
+    return [master] + [int(pid) for pid in children]
+
+
+def wait_healthy(url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {url} did not become healthy within {timeout:.0f}s")
+
+
+def client_process(url: str, concurrency: int, seconds: float, results) -> None:
+    results.put(asyncio.run(run_load(url, DEFAULT_PATHS, concurrency, seconds, {}, None, keep_latencies=True)))
+
+
+def measure(url: str, clients: int, concurrency: int, seconds: float) -> dict:
+    """Run ``clients`` load generator processes at once and merge their results"""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(url, max(1, concurrency // clients), seconds, results))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    runs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    latencies = [latency for run in runs for latency in run["latencies"]]
+    return {
+        "rps": sum(run["rps"] for run in runs),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "errors": sum(run["errors"] + run["shed"] for run in runs),
+    }
+
+
+def run_server(workers: int, env: dict, workdir: str, args) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server_env = {**env, "WORKERS": str(workers), "SERVER_BIND": f"127.0.0.1:{port}"}
+    log = open(os.path.join(workdir, f"server-{workers}.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"), "main:app"],
+        cwd=BACKEND_DIR, env=server_env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        wait_healthy(url, 60)
+        # Warm every worker's caches and connection pool before measuring
+        measure(url, args.clients, args.concurrency, 2)
+        result = measure(url, args.clients, args.concurrency, args.seconds)
+        pids = server_pids(server.pid)
+        memory = [memory_kb(pid) for pid in pids]
+        result["rss_mb"] = sum(values["Rss"] for values in memory) / 1024
+        result["pss_mb"] = sum(values["Pss"] for values in memory) / 1024
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the production server by worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight, across all clients")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--preset", default="small", help="seed_data preset")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ksa-workers-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'workers.db')}",
+        "DEBUG": "false",
+        "SLOW_QUERY_LOG_FILE": os.path.join(workdir, "slow_queries.log"),
+        "TRACE_EXPORTER": "none",
+        "TABLE_VERSIONS_FILE": os.path.join(workdir, "table_versions"),
+        "STARTUP_LOCK_FILE": os.path.join(workdir, "startup.lock"),
+        "RESPONSE_CACHE_ENABLED": "false",
+        "WORKER_MAX_REQUESTS": "0",
+    }
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(BACKEND_DIR, "scripts", "seed_data.py"), "--preset", args.preset],
+            cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        print(f"{os.cpu_count()} CPUs, {args.clients} client processes, concurrency {args.concurrency}")
+        print(f"{'workers':>7} {'rps':>8} {'speedup':>8} {'effic.':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} "
+              f"{'RSS MB':>8} {'PSS MB':>8}")
+        first = None
+        for workers in args.workers:
+            result = run_server(workers, env, workdir, args)
+            first = first or (workers, result["rps"])
+            speedup = result["rps"] / first[1] if first[1] else 0.0
+            efficiency = speedup / (workers / first[0])
+            print(
+                f"{workers:>7} {result['rps']:>8.1f} {speedup:>7.2f}x {efficiency:>7.0%} "
+                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['errors']:>7} "
+                f"{result['rss_mb']:>8.0f} {result['pss_mb']:>8.0f}",
+                flush=True,
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
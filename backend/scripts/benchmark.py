@@ -0,0 +1,430 @@
+"""
+In-process API benchmark.
+
+Seeds a fresh database with ``seed_data`` at the chosen preset and drives
+every ``/api/*`` endpoint through httpx's ASGI transport, with no network or
+server process involved. It reports p50/p95/p99 latency, throughput, status
+and SQL query count (from the ``Server-Timing`` header) per endpoint.
+
+GET routes are discovered from the app, with path parameters filled from the
+seeded rows. Writes run as explicit cases. The create cases run before the
+update and delete cases, and the delete cases remove only rows the benchmark
+itself created.
+
+With a baseline file the run fails (exit 1) when an endpoint:
+
+- gets slower than the allowed tolerance;
+- issues more queries than before;
+- changes status.
+
+Query counts are machine-independent; latency baselines should be refreshed
+with ``--save-baseline`` on the machine that runs the comparison. The response
+cache is off unless ``--response-cache`` is given, so repeat GETs measure the
+endpoint rather than a cache replay.
+
+Requests send ``Accept-Encoding: identity``. ``--compression`` instead runs the
+GET endpoints once per encoding (identity, gzip, br, zstd). It reports wire
+bytes, latency and an estimated transfer time over ``--link-kbps``.
+
+    python scripts/benchmark.py --preset small
+    python scripts/benchmark.py --preset medium --requests 100 --save-baseline
+    python scripts/benchmark.py --only contracts --baseline ''
+    python scripts/benchmark.py --compression --requests 50 --link-kbps 512
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "scripts", "benchmark_baseline.json")
+
+# Routes that cannot run against a freshly seeded database
+SKIPPED_ROUTES = {
+    "/api/contracts/{contract_id}/download",  # needs an uploaded file
+    "/api/vehicles/{registration_plate}/download",
+    "/api/system/profiles/{profile_id}",  # needs a captured profile
+    "/api/system/memory/snapshots/{snapshot_id}",  # needs a memory snapshot
+}
+
+QUERY_COUNT = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Case:
+    """One endpoint under test; ``request(i)`` returns httpx request arguments for iteration ``i``"""
+
+    def __init__(self, name: str, request: Callable[[int], dict], requests: Optional[int] = None,
+                 after: Optional[Callable[[dict], None]] = None):
+        self.name = name
+        self.request = request
+        self.requests = requests
+        self.after = after
+
+
+def sample_values(db) -> Dict[str, object]:
+    """Path parameter values taken from the middle of the seeded data"""
+    from sqlalchemy import func, select
+    from app.models import Contract, Meeting, Site, User, Vehicle
+    from app.models.contract import ContractLineItem, ContractSection
+
+    def middle(column):
+        low, high = db.execute(select(func.min(column), func.max(column))).one()
+        return (low + high) // 2
+
+    return {
+        "site_id": middle(Site.id),
+        "staff_id": db.execute(select(Vehicle.assigned_staff_id).where(Vehicle.assigned_staff_id.isnot(None))).scalar(),
+        "meeting_id": middle(Meeting.id),
+        "contract_id": middle(Contract.id),
+        "section_id": middle(ContractSection.id),
+        "item_id": middle(ContractLineItem.id),
+        "user_id": db.execute(select(func.min(User.id))).scalar(),
+        "registration_plate": db.execute(
+            select(Vehicle.vehicle_registration_plate).where(Vehicle.active_tracking == True).order_by(
+                Vehicle.vehicle_registration_plate
+            )
+        ).scalar(),
+        "contract_type": "Service",
+        "vehicle_type": "Sedan",
+    }
+
+
+def read_cases(app, values: Dict[str, object]) -> List[Case]:
+    cases = []
+    for route in app.routes:
+        methods = getattr(route, "methods", None) or ()
+        if "GET" not in methods or not route.path.startswith("/api/") or route.path in SKIPPED_ROUTES:
+            continue
+        path = route.path.format(**values)
+        cases.append(Case(f"GET {route.path}", lambda i, path=path: {"method": "GET", "url": path}))
+    return cases
+
+
+def write_cases(values: Dict[str, object], run_id: str) -> List[Case]:
+    """Create, update and delete cases; deletes consume rows made by the matching create case"""
+    created: Dict[str, List] = {"site": [], "staff": [], "meeting": [], "contract": [], "vehicle": []}
+    now = datetime.utcnow()
+
+    def remember(kind: str, key: str):
+        def after(body: dict):
+            created[kind].append(body[key])
+        return after
+
+    def delete(kind: str, template: str):
+        def request(i: int) -> dict:
+            if not created[kind]:
+                raise LookupError(f"no benchmark-created {kind} left to delete")
+            return {"method": "DELETE", "url": template.format(created[kind].pop())}
+        return request
+
+    site_id, staff_id, plate = values["site_id"], values["staff_id"], values["registration_plate"]
+    return [
+        Case("POST /api/sites", lambda i: {
+            "method": "POST", "url": "/api/sites", "json": {"name": f"Bench {run_id} {i}"},
+        }, after=remember("site", "id")),
+        Case("PUT /api/sites/{site_id}", lambda i: {
+            "method": "PUT", "url": f"/api/sites/{site_id}", "json": {"contact_person": f"Bench {i}"},
+        }),
+        Case("POST /api/staff", lambda i: {
+            "method": "POST", "url": "/api/staff", "json": {"name": "Bench", "surname": f"{run_id}-{i}"},
+        }, after=remember("staff", "id")),
+        Case("PUT /api/staff/{staff_id}", lambda i: {
+            "method": "PUT", "url": f"/api/staff/{staff_id}", "json": {"phone": f"0{i:09d}"},
+        }),
+        # Each iteration links a different seeded staff member, since a pair can only be linked once per role
+        Case("POST /api/sites/{site_id}/staff/{staff_id}", lambda i: {
+            "method": "POST", "url": f"/api/sites/{site_id}/staff/{i + 1}",
+            "json": {"staff_id": i + 1, "role": "Casual Staff"},
+        }),
+        Case("POST /api/meetings", lambda i: {
+            "method": "POST", "url": "/api/meetings", "json": {
+                "site_id": site_id, "agenda": "Benchmark", "scheduled_at": now.isoformat(),
+                "items": [{"issue_discussed": "Benchmark item", "responsible_staff_ids": [staff_id]}],
+            },
+        }, after=remember("meeting", "id")),
+        Case("PUT /api/meetings/{meeting_id}", lambda i: {
+            "method": "PUT", "url": f"/api/meetings/{values['meeting_id']}", "json": {"agenda": f"Benchmark {i}"},
+        }),
+        Case("POST /api/contracts", lambda i: {
+            "method": "POST", "url": "/api/contracts", "json": {
+                "contract_type": "Service", "start_date": now.isoformat(),
+                "end_date": (now + timedelta(days=365)).isoformat(), "site_id": site_id,
+                "responsible_staff_id": staff_id,
+                "sections": [{"name": "Section A", "line_items": [{"description": "Benchmark", "value": 100}]}],
+            },
+        }, after=remember("contract", "id")),
+        Case("PUT /api/contracts/{contract_id}", lambda i: {
+            "method": "PUT", "url": f"/api/contracts/{values['contract_id']}", "json": {"notes": f"Benchmark {i}"},
+        }),
+        Case("POST /api/vehicles", lambda i: {
+            "method": "POST", "url": "/api/vehicles", "json": {
+                "vehicle_registration_plate": f"BENCH{run_id}{i}", "make": "Toyota", "model": "Hilux", "year": 2022,
+                "vehicle_type": "Bakkie / LDV", "primary_use": "Service", "active_tracking": False,
+            },
+        }, after=remember("vehicle", "vehicle_registration_plate")),
+        Case("PUT /api/vehicles/{registration_plate}", lambda i: {
+            "method": "PUT", "url": f"/api/vehicles/{plate}", "json": {"general_notes": f"Benchmark {i}"},
+        }),
+        Case("POST /api/tracking/positions", lambda i: {
+            "method": "POST", "url": "/api/tracking/positions", "json": {"fixes": [
+                {"plate": plate, "timestamp": (now + timedelta(seconds=i * 100 + n)).isoformat(),
+                 "lat": -26.0 + n / 1000, "lon": 29.0, "speed": 60}
+                for n in range(100)
+            ]},
+        }),
+        Case("POST /api/auth/login", lambda i: {
+            "method": "POST", "url": "/api/auth/login", "json": {"username": "admin", "password": "admin123"},
+        }, requests=20),
+        Case("DELETE /api/sites/{site_id}", delete("site", "/api/sites/{}")),
+        Case("DELETE /api/staff/{staff_id}", delete("staff", "/api/staff/{}")),
+        Case("DELETE /api/meetings/{meeting_id}", delete("meeting", "/api/meetings/{}")),
+        Case("DELETE /api/contracts/{contract_id}", delete("contract", "/api/contracts/{}")),
+        Case("DELETE /api/vehicles/{registration_plate}", delete("vehicle", "/api/vehicles/{}")),
+    ]
+
+
+async def run_case(client, case: Case, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    queries: List[int] = []
+    sizes: List[int] = []
+    statuses: Counter = Counter()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            try:
+                arguments = case.request(index)
+            except LookupError:
+                statuses["skipped"] += 1
+                continue
+            started = time.perf_counter()
+            response = await client.request(**arguments)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            match = QUERY_COUNT.search(response.headers.get("server-timing", ""))
+            queries.append(int(match.group(1)) if match else 0)
+            sizes.append(response.num_bytes_downloaded)
+            if case.after is not None and response.status_code < 400:
+                case.after(response.json())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries": percentile(queries, 0.50),
+        "bytes": percentile(sizes, 0.50),
+        "status": statuses.most_common(1)[0][0] if statuses else None,
+    }
+
+
+async def run_all(app, cases: List[Case], requests: int, concurrency: int, accept_encoding: str = "identity",
+                  report: bool = True) -> Dict[str, dict]:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Accept-Encoding": accept_encoding}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120, headers=headers) as client:
+        login = await client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+        # One untimed pass so first-request work (caches, statement compilation) is not measured
+        for case in cases:
+            if not case.name.startswith(("POST", "DELETE")):
+                await client.request(**case.request(0))
+        results = {}
+        for case in cases:
+            results[case.name] = await run_case(client, case, case.requests or requests, concurrency)
+            result = results[case.name]
+            if not report:
+                continue
+            print(
+                f"{case.name:<62} {result['requests']:>5} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['queries']:>7} {str(result['status']):>6}",
+                flush=True,
+            )
+    return results
+
+
+async def with_lifespan(app, coro):
+    """Await ``coro`` with the app started up as a server would start it, and shut it down afterwards"""
+    async with app.router.lifespan_context(app):
+        return await coro
+
+
+def compression_report(app, cases: List[Case], requests: int, concurrency: int, link_kbps: float) -> None:
+    """Wire bytes and latency of every GET case under each response encoding the server can produce"""
+    from app.utils.compression import brotli, zstandard
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli else []) + (["zstd"] if zstandard else [])
+    cases = [case for case in cases if case.name.startswith("GET")]
+
+    async def measure():
+        runs = {}
+        for encoding in encodings:
+            print(f"Measuring Accept-Encoding: {encoding}", flush=True)
+            runs[encoding] = await run_all(app, cases, requests, concurrency, accept_encoding=encoding, report=False)
+        return runs
+
+    runs = asyncio.run(with_lifespan(app, measure()))
+
+    # Transfer estimate: server p50 plus body bytes over the link (kbit/s is bits per millisecond)
+    def transfer_ms(result):
+        return result["p50_ms"] + result["bytes"] * 8 / link_kbps
+
+    print(f"\nWire bytes (p50 latency ms, est. ms at {link_kbps:g} kbit/s)")
+    print(f"{'endpoint':<62}" + "".join(f"{encoding:>26}" for encoding in encodings))
+    totals = {encoding: [0, 0.0] for encoding in encodings}
+    for case in cases:
+        cells = []
+        for encoding in encodings:
+            result = runs[encoding][case.name]
+            totals[encoding][0] += result["bytes"]
+            totals[encoding][1] += transfer_ms(result)
+            cells.append(f"{result['bytes']:>9} ({result['p50_ms']:>5.1f}, {transfer_ms(result):>7.1f})")
+        print(f"{case.name:<62}" + "".join(f"{cell:>26}" for cell in cells))
+    identity_bytes, identity_ms = totals["identity"]
+    print(f"\n{'encoding':<10} {'bytes':>10} {'saved':>7} {'est. ms':>10} {'saved':>7}")
+    for encoding, (total_bytes, total_ms) in totals.items():
+        print(
+            f"{encoding:<10} {total_bytes:>10} {1 - total_bytes / max(identity_bytes, 1):>7.1%} "
+            f"{total_ms:>10.1f} {1 - total_ms / max(identity_ms, 1e-9):>7.1%}"
+        )
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float, min_ms: float) -> List[str]:
+    """Regressions against the baseline, one message per failing endpoint"""
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if str(result["status"]) != str(expected["status"]):
+            failures.append(f"{name}: status {expected['status']} -> {result['status']}")
+        if result["queries"] > expected["queries"]:
+            failures.append(f"{name}: queries {expected['queries']} -> {result['queries']}")
+        allowed = max(expected["p95_ms"] * (1 + tolerance), expected["p95_ms"] + min_ms)
+        if result["p95_ms"] > allowed:
+            failures.append(f"{name}: p95 {expected['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+    return failures
+
+
+def run(args, workdir: str) -> None:
+    """Seed a database in ``workdir``, benchmark every case and compare with (or save) the baseline"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DEBUG"] = "false"
+    os.environ["SLOW_QUERY_LOG_FILE"] = os.path.join(workdir, "slow_queries.log")
+    os.environ["TRACE_EXPORTER"] = "none"
+    # Repeat GETs would otherwise be served from the response cache without running the endpoint
+    os.environ["RESPONSE_CACHE_ENABLED"] = "true" if args.response_cache else "false"
+    os.environ["TABLE_VERSIONS_FILE"] = os.path.join(workdir, "table_versions")
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from seed_data import PRESETS, seed
+    from app.crud.user import create_default_admin
+    from app.database import SessionLocal, engine, init_db
+
+    init_db()
+    started = time.perf_counter()
+    counts = seed(engine, seed=args.seed, **PRESETS[args.preset])
+    print(f"Seeded {sum(counts.values())} rows ({args.preset}) in {time.perf_counter() - started:.1f}s")
+
+    import main as app_module
+
+    with SessionLocal() as db:
+        create_default_admin(db)
+        values = sample_values(db)
+    cases = read_cases(app_module.app, values) + write_cases(values, run_id=str(int(time.time())))
+    if args.only:
+        cases = [case for case in cases if args.only in case.name]
+
+    if args.compression:
+        compression_report(app_module.app, cases, args.requests, args.concurrency, args.link_kbps)
+        return
+
+    print(f"{'endpoint':<62} {'reqs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'status':>6}")
+    results = asyncio.run(with_lifespan(app_module.app, run_all(app_module.app, cases, args.requests, args.concurrency)))
+
+    if args.save_baseline:
+        with open(args.baseline or DEFAULT_BASELINE, "w") as handle:
+            json.dump(
+                {"preset": args.preset, "requests": args.requests, "concurrency": args.concurrency,
+                 "endpoints": {name: {key: round(value, 2) if isinstance(value, float) else value
+                                      for key, value in result.items()} for name, result in results.items()}},
+                handle, indent=1, sort_keys=True,
+            )
+        print(f"Baseline written to {args.baseline or DEFAULT_BASELINE}")
+        return
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline.get("preset") != args.preset:
+            print(f"Baseline was recorded with preset {baseline.get('preset')!r}; not comparing")
+            return
+        failures = compare(results, baseline["endpoints"], args.tolerance, args.min_regression_ms)
+        if failures:
+            print("\nRegressions against the baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            raise SystemExit(1)
+        print("\nNo regressions against the baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every /api endpoint in-process against seeded data")
+    parser.add_argument("--preset", default="small", help="seed_data preset (small, medium, large)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", default=None, help="Run only endpoints whose name contains this text")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file ('' to skip comparison)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative p95 increase")
+    parser.add_argument("--min-regression-ms", type=float, default=5.0, help="Ignore p95 increases smaller than this")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database for inspection")
+    parser.add_argument("--compression", action="store_true",
+                        help="Compare wire bytes and latency of GET endpoints under each response encoding")
+    parser.add_argument("--link-kbps", type=float, default=1000,
+                        help="Link speed for --compression transfer estimates (default: a 1 Mbit/s rural link)")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Serve repeat GETs from the response cache (off by default so endpoints are measured)")
+    args = parser.parse_args()
+    if args.baseline:
+        # run() changes into the scratch directory
+        args.baseline = os.path.abspath(args.baseline)
+
+    workdir = tempfile.mkdtemp(prefix="ksa-bench-")
+    try:
+        run(args, workdir)
+    finally:
+        if args.keep:
+            print(f"Database kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Table dependency check for the response cache.
+
+A cached GET stays valid until one of the tables named by its ``CachedRoute``
+changes, so a route that reads a table it does not name serves stale responses
+(and 304s) after writes to that table. This script derives each route's tables
+from what its responses actually read: it seeds a scratch database with
+``seed_data``, calls every GET endpoint under ``/api`` that ``CACHED_ROUTES``
+covers (path parameters filled from the seeded rows, response cache off) and
+collects the tables named in the SQL each request runs, including relationships
+loaded while the response is serialized.
+
+It fails (exit 1) when a request reads a table its route does not name, or when
+a ``CachedRoute`` matches none of the app's GET endpoints. Run it after adding a
+cached route, or after changing what a cached endpoint returns.
+
+    python scripts/check_cached_routes.py
+    python scripts/check_cached_routes.py -v
+"""
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import sys
+import tempfile
+from typing import Dict, List, Set
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def referenced_tables(statement: str, known: Set[str]) -> Set[str]:
+    return {name for name in TABLE_REFERENCE.findall(statement) if name in known}
+
+
+def check(app, engines, values: Dict[str, object], verbose: bool) -> List[str]:
+    import httpx
+    from sqlalchemy import event
+    from benchmark import read_cases
+    from app.database import Base
+    from app.utils.response_cache import CACHED_ROUTES
+
+    known = set(Base.metadata.tables)
+    read: Set[str] = set()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        read.update(referenced_tables(statement, known))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+
+    failures = []
+    covered = set()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=120) as client:
+            for case in read_cases(app, values):
+                request = case.request(0)
+                route = next((r for r in CACHED_ROUTES if r.pattern.fullmatch(request["url"])), None)
+                if route is None:
+                    continue
+                covered.add(route.pattern.pattern)
+                read.clear()
+                response = await client.request(**request)
+                if response.status_code != 200:
+                    failures.append(f"{case.name}: status {response.status_code}")
+                    continue
+                missing = read - set(route.tables)
+                status = "MISSING " + ", ".join(sorted(missing)) if missing else "ok"
+                print(f"{case.name:<56} {status}")
+                if verbose:
+                    print(f"    reads {', '.join(sorted(read))}")
+                if missing:
+                    failures.append(f"{case.name} reads {', '.join(sorted(missing))}, not in {route.pattern.pattern}")
+
+    asyncio.run(run())
+    for route in CACHED_ROUTES:
+        if route.pattern.pattern not in covered:
+            failures.append(f"{route.pattern.pattern} matches no GET endpoint")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a cached route reads tables it does not declare")
+    parser.add_argument("--preset", default="small", help="seed_data preset")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the tables every request read")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ksa-cached-routes-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'routes.db')}"
+    os.environ["DEBUG"] = "false"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["SLOW_QUERY_LOG_FILE"] = os.path.join(workdir, "slow_queries.log")
+    os.environ["TABLE_VERSIONS_FILE"] = os.path.join(workdir, "table_versions")
+    os.environ["TRACE_EXPORTER"] = "none"
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        from benchmark import sample_values
+        from seed_data import PRESETS, seed
+        from app.crud.user import create_default_admin
+        from app.database import SessionLocal, async_engine, engine, init_db
+        from main import app
+
+        init_db()
+        seed(engine, **PRESETS[args.preset])
+        with SessionLocal() as db:
+            create_default_admin(db)
+            values = sample_values(db)
+
+        failures = check(app, (engine, async_engine.sync_engine), values, args.verbose)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("\nCached routes with undeclared tables:")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("\nEvery cached route declares the tables it reads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Concurrency load test for the read endpoints.
+
+Keeps ``--concurrency`` requests in flight against a running server for
+``--seconds`` and reports throughput, latency percentiles and errors per run.
+Requests turned away by admission control (503) are counted as shed, not as
+errors, and are left out of the latency percentiles. With ``--pid`` it also samples the server's resident memory, so sync and async
+builds can be compared at equal memory.
+
+    python scripts/load_test.py --url http://localhost:8000 --concurrency 50 200 --seconds 15 --pid 12345
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+import httpx
+
+DEFAULT_PATHS = ["/api/sites", "/api/staff", "/api/meetings", "/api/contracts", "/api/vehicles"]
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process from /proc (Linux only)"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(url: str, paths: List[str], concurrency: int, seconds: float, headers: dict, pid: Optional[int],
+              keep_latencies: bool = False) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    shed = 0
+    peak_rss = rss_mb(pid) or 0.0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=60, limits=limits) as client:
+        async def worker(offset: int):
+            nonlocal errors, shed
+            index = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(paths[index % len(paths)])
+                    if response.status_code == 503:
+                        # Turned away by admission control
+                        shed += 1
+                    elif response.status_code >= 400:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+                index += 1
+
+        async def sample_memory():
+            nonlocal peak_rss
+            while time.perf_counter() < deadline:
+                peak_rss = max(peak_rss, rss_mb(pid) or 0.0)
+                await asyncio.sleep(0.5)
+
+        started = time.perf_counter()
+        await asyncio.gather(sample_memory(), *(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+        "shed": shed,
+        "peak_rss_mb": peak_rss if pid else None,
+    }
+    if keep_latencies:
+        result["latencies"] = latencies
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the read endpoints at fixed concurrency")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--path", action="append", dest="paths", help="Path to request (repeatable)")
+    parser.add_argument("--token", default=None, help="Bearer token, if the API requires one")
+    parser.add_argument("--pid", type=int, default=None, help="Server process id, to sample its memory")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    paths = args.paths or DEFAULT_PATHS
+    print(f"{'conc':>5} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'shed':>6} {'rss MB':>7}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run(args.url, paths, concurrency, args.seconds, headers, args.pid))
+        rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] else "-"
+        print(
+            f"{result['concurrency']:>5} {result['requests']:>9} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+            f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7} {result['shed']:>6} {rss:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Scale data generator.
+
+Bulk-inserts a reproducible synthetic dataset into an empty database (the one
+``DATABASE_URL`` points at). The dataset has sites with staff assignments,
+staff, contracts with sections and line items, meetings with items and
+responsible staff, and vehicles. The same ``--seed`` always produces the same
+rows, so benchmark runs are comparable.
+
+    DATABASE_URL=sqlite:///./scale.db python scripts/seed_data.py --preset large
+    python scripts/seed_data.py --preset small --contracts 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEBUG", "false")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+from app.models import (  # noqa: E402
+    Contract, ContractStatus, ContractType, Meeting, MeetingItem, PrimaryUse, Site, SiteStaffLink, Staff,
+    Vehicle, VehicleType,
+)
+from app.models.contract import ContractLineItem, ContractSection  # noqa: E402
+from app.models.meeting import meeting_item_staff  # noqa: E402
+from app.models.site import StaffRole  # noqa: E402
+
+PRESETS = {
+    "small": {"sites": 200, "staff": 2_000, "contracts": 5_000, "meetings": 2_000, "vehicles": 300},
+    "medium": {"sites": 1_000, "staff": 10_000, "contracts": 50_000, "meetings": 10_000, "vehicles": 1_000},
+    "large": {"sites": 5_000, "staff": 50_000, "contracts": 300_000, "meetings": 50_000, "vehicles": 5_000},
+}
+
+FIRST_NAMES = ["Thabo", "Lerato", "Sipho", "Naledi", "Johan", "Anele", "Pieter", "Zanele", "Kagiso", "Ayesha",
+               "Bongani", "Mpho", "Ruan", "Nomvula", "Tshepo", "Refilwe", "Willem", "Palesa", "Lwazi", "Fatima"]
+SURNAMES = ["Nkosi", "Dlamini", "Van der Merwe", "Mokoena", "Botha", "Naidoo", "Khumalo", "Pretorius", "Mahlangu",
+            "Ndlovu", "Venter", "Sithole", "Mthembu", "Coetzee", "Molefe", "Pillay", "Zulu", "Steyn"]
+JOB_TITLES = ["Technician", "Valve Technician", "Supervisor", "Site Manager", "Engineer", "Casual", "Planner"]
+SECTIONS = [("Section A", "Preliminary and General"), ("Section B", "Labour"), ("Section C", "Materials"),
+            ("Section D", "Plant and Equipment")]
+LINE_ITEMS = ["Site Establishment", "Valve Overhaul", "Scaffolding", "Inspection", "Spares", "Transport",
+              "Commissioning", "Documentation"]
+MAKES = [("Toyota", "Hilux"), ("Ford", "Ranger"), ("Isuzu", "D-Max"), ("Nissan", "NP200"), ("Volkswagen", "Polo"),
+         ("Toyota", "Quantum"), ("Suzuki", "Swift")]
+
+CHUNK_ROWS = 5_000
+
+
+def insert_chunked(conn, table, rows) -> int:
+    """Executemany ``rows`` (an iterable of dicts) in chunks; returns rows inserted"""
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            conn.execute(insert(table), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(table), chunk)
+        total += len(chunk)
+    return total
+
+
+class ChunkedInserter:
+    """Buffers rows for related tables and inserts them parent-first whenever one buffer fills"""
+
+    def __init__(self, conn, *tables):
+        self.conn = conn
+        self.buffers = {table: [] for table in tables}
+        self.counts = {table.name: 0 for table in tables}
+
+    def add(self, table, row: dict) -> None:
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        for table, buffer in self.buffers.items():
+            if buffer:
+                self.conn.execute(insert(table), buffer)
+                self.counts[table.name] += len(buffer)
+                buffer.clear()
+
+
+def seed(engine, sites: int, staff: int, contracts: int, meetings: int, vehicles: int, seed: int = 42) -> dict:
+    """Generate the dataset into an empty schema; returns the row count per table"""
+    rng = random.Random(seed)
+    # Dates are relative to today so the share of expired and overdue contracts stays stable
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    counts = {}
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Site.__table__)).scalar():
+            raise SystemExit("Database already has sites; seed into an empty database")
+
+        counts["sites"] = insert_chunked(conn, Site.__table__, (
+            {
+                "id": i,
+                "name": f"Power Station {i:05d}",
+                "contact_person": f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}",
+                "contact_number": f"0{rng.randint(100000000, 999999999)}",
+                "contact_email": f"site{i}@example.co.za",
+                "coordinates": f"{rng.uniform(-34.5, -22.5):.5f}, {rng.uniform(17.0, 32.5):.5f}",
+            }
+            for i in range(1, sites + 1)
+        ))
+
+        counts["staff"] = insert_chunked(conn, Staff.__table__, (
+            {
+                "id": i,
+                "name": rng.choice(FIRST_NAMES),
+                "surname": rng.choice(SURNAMES),
+                "role": rng.choice(JOB_TITLES),
+                "email": f"staff{i}@example.co.za",
+                "phone": f"0{rng.randint(600000000, 899999999)}",
+            }
+            for i in range(1, staff + 1)
+        ))
+
+        roles = [role.value for role in StaffRole]
+
+        def site_links():
+            for site_id in range(1, sites + 1):
+                for staff_id in rng.sample(range(1, staff + 1), min(staff, rng.randint(3, 10))):
+                    yield {"site_id": site_id, "staff_id": staff_id, "role": rng.choice(roles)}
+
+        counts["site_staff_links"] = insert_chunked(conn, SiteStaffLink.__table__, site_links())
+
+        rows = ChunkedInserter(conn, Contract.__table__, ContractSection.__table__, ContractLineItem.__table__)
+        section_id = item_id = 0
+        for contract_id in range(1, contracts + 1):
+            start = today - timedelta(days=rng.randint(0, 5 * 365))
+            end = start + timedelta(days=rng.randint(90, 4 * 365))
+            if end < today:
+                status = rng.choice([ContractStatus.EXPIRED] * 4 + [ContractStatus.COMPLETED])
+            else:
+                status = rng.choice([ContractStatus.ACTIVE] * 9 + [ContractStatus.CANCELLED])
+            rows.add(Contract.__table__, {
+                "id": contract_id,
+                "contract_type": rng.choice(list(ContractType)),
+                "status": status,
+                "start_date": start,
+                "end_date": end,
+                "eskom_reference": f"ESK-{rng.randint(100000, 999999)}",
+                "contact_person_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}",
+                "contract_value": Decimal(rng.randint(10_000, 5_000_000)),
+                "site_id": rng.randint(1, sites),
+                "responsible_staff_id": rng.randint(1, staff),
+            })
+            for order, (name, description) in enumerate(SECTIONS[:rng.randint(0, len(SECTIONS))]):
+                section_id += 1
+                rows.add(ContractSection.__table__, {
+                    "id": section_id, "contract_id": contract_id, "name": name, "description": description, "order": order,
+                })
+                for item_order in range(rng.randint(1, 5)):
+                    item_id += 1
+                    rows.add(ContractLineItem.__table__, {
+                        "id": item_id,
+                        "section_id": section_id,
+                        "description": rng.choice(LINE_ITEMS),
+                        "value": Decimal(rng.randint(500, 250_000)),
+                        "order": item_order,
+                    })
+        rows.flush()
+        counts.update(rows.counts)
+
+        rows = ChunkedInserter(conn, Meeting.__table__, MeetingItem.__table__, meeting_item_staff)
+        meeting_item_id = 0
+        for meeting_id in range(1, meetings + 1):
+            scheduled = today + timedelta(days=rng.randint(-730, 90), hours=rng.choice([8, 9, 10, 14]))
+            rows.add(Meeting.__table__, {
+                "id": meeting_id,
+                "site_id": rng.randint(1, sites),
+                "agenda": "Monthly progress review",
+                "attendees": ", ".join(rng.choice(FIRST_NAMES) for _ in range(rng.randint(2, 6))),
+                "chairperson_staff_id": rng.randint(1, staff),
+                "scheduled_at": scheduled,
+            })
+            for _ in range(rng.randint(1, 4)):
+                meeting_item_id += 1
+                rows.add(MeetingItem.__table__, {
+                    "id": meeting_item_id,
+                    "meeting_id": meeting_id,
+                    "issue_discussed": f"{rng.choice(LINE_ITEMS)} follow-up",
+                    "target_date": (scheduled + timedelta(days=rng.randint(7, 60))).date(),
+                })
+                for staff_id in rng.sample(range(1, staff + 1), min(staff, rng.randint(0, 2))):
+                    rows.add(meeting_item_staff, {"meeting_item_id": meeting_item_id, "staff_id": staff_id})
+        rows.flush()
+        counts.update(rows.counts)
+
+        vehicle_types = [value.value for value in VehicleType]
+        primary_uses = [value.value for value in PrimaryUse]
+
+        def vehicle_rows():
+            for i in range(1, vehicles + 1):
+                make, model = rng.choice(MAKES)
+                yield {
+                    "vehicle_registration_plate": f"KSA{i:05d}MP",
+                    "make": make,
+                    "model": model,
+                    "year": rng.randint(2008, 2025),
+                    "vehicle_type": rng.choice(vehicle_types),
+                    "primary_use": rng.choice(primary_uses),
+                    "active_tracking": rng.random() < 0.8,
+                    "assigned_staff_id": rng.randint(1, staff) if rng.random() < 0.7 else None,
+                    "license_renewal_date": (today + timedelta(days=rng.randint(-30, 365))).date(),
+                }
+
+        counts["vehicles"] = insert_chunked(conn, Vehicle.__table__, vehicle_rows())
+
+    if engine.dialect.name == "postgresql":
+        # Explicit ids leave the sequences behind; move them past the generated rows
+        with engine.begin() as conn:
+            for table in ("sites", "staff", "contracts", "contract_sections", "contract_line_items", "meetings",
+                          "meeting_items", "site_staff_links"):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+                )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-insert a synthetic dataset at a chosen scale")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="large")
+    for name in PRESETS["small"]:
+        parser.add_argument(f"--{name}", type=int, default=None, help=f"Override the preset's {name} count")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = {name: getattr(args, name) or default for name, default in PRESETS[args.preset].items()}
+    init_db()
+    started = time.perf_counter()
+    counts = seed(engine, seed=args.seed, **sizes)
+    elapsed = time.perf_counter() - started
+    for table, rows in counts.items():
+        print(f"{table:<22}{rows:>10}")
+    print(f"{'seconds':<22}{elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
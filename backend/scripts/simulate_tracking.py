@@ -0,0 +1,57 @@
+"""
+Local GPS tracker simulator.
+
+Posts batches of synthetic fixes for every actively tracked vehicle to
+/api/tracking/positions and reports the sustained ingest rate.
+
+    python scripts/simulate_tracking.py --url http://localhost:8000 --seconds 30 --batch 500
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+import httpx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate vehicle GPS trackers")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--batch", type=int, default=500, help="Fixes per request")
+    parser.add_argument("--token", default=None, help="Bearer token, if the API requires one")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    with httpx.Client(base_url=args.url, headers=headers, timeout=30) as client:
+        vehicles = client.get("/api/vehicles", params={"limit": 1000}).json()
+        plates = [v["vehicle_registration_plate"] for v in vehicles if v.get("active_tracking")]
+        if not plates:
+            raise SystemExit("No actively tracked vehicles to simulate")
+
+        # Start every vehicle somewhere in Mpumalanga and random-walk from there
+        state = {p: [-26.0 + random.uniform(-0.5, 0.5), 29.0 + random.uniform(-0.5, 0.5)] for p in plates}
+        sent = accepted = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            now = datetime.utcnow().isoformat()
+            fixes = []
+            for _ in range(args.batch):
+                plate = random.choice(plates)
+                pos = state[plate]
+                pos[0] += random.uniform(-0.0005, 0.0005)
+                pos[1] += random.uniform(-0.0005, 0.0005)
+                fixes.append({"plate": plate, "timestamp": now, "lat": pos[0], "lon": pos[1],
+                              "speed": round(random.uniform(0, 120), 1)})
+            response = client.post("/api/tracking/positions", json={"fixes": fixes})
+            sent += len(fixes)
+            if response.status_code == 202:
+                accepted += response.json()["accepted"]
+            elif response.status_code == 503:
+                time.sleep(float(response.headers.get("Retry-After", "1")))
+
+        elapsed = time.perf_counter() - started
+        print(f"Sent {sent} fixes in {elapsed:.1f}s ({sent / elapsed:,.0f}/s), accepted {accepted}")
+
+
+if __name__ == "__main__":
+    main()
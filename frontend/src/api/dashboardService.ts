@@ -0,0 +1,13 @@
+import client from './client';
+import { Dashboard } from '../types';
+import { API_ENDPOINTS } from '../utils/constants';
+
+// Dashboard figures and lists, aggregated server-side
+export const dashboardService = {
+  get: async (limit = 5): Promise<Dashboard> => {
+    const response = await client.get(API_ENDPOINTS.DASHBOARD, {
+      params: { limit },
+    });
+    return response.data;
+  },
+};
@@ -0,0 +1,29 @@
+import { useState, useCallback } from 'react';
+import { Dashboard } from '../types';
+import { dashboardService } from '../api/dashboardService';
+
+export const useDashboard = () => {
+  const [dashboard, setDashboard] = useState<Dashboard | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const fetchDashboard = useCallback(async (limit?: number) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const data = await dashboardService.get(limit);
+      setDashboard(data);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || err.message || 'Failed to fetch dashboard');
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  return {
+    dashboard,
+    loading,
+    error,
+    fetchDashboard,
+  };
+};
@@ -1,91 +1,25 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { useSites } from '../hooks/useSites';
-import { useStaff } from '../hooks/useStaff';
-import { useMeetings } from '../hooks/useMeetings';
-import { useContracts } from '../hooks/useContracts';
-import { useVehicles } from '../hooks/useVehicles';
-import { Card, LoadingSpinner } from '../components/Common';
+import { useDashboard } from '../hooks/useDashboard';
+import { Card, Button, LoadingSpinner, ErrorMessage } from '../components/Common';
 import { BarChart3, Users, CalendarDays, Truck, AlertCircle, Clock, CheckCircle, TrendingUp } from 'lucide-react';
-import { ContractSummary } from '../types';
 import { currencyService, ExchangeRate } from '../api/currencyService';
 
 export const Dashboard: React.FC = () => {
   const navigate = useNavigate();
-  const { sites, loading: sitesLoading, fetchSites } = useSites();
-  const { staff, loading: staffLoading, fetchStaff } = useStaff();
-  const { meetings, loading: meetingsLoading, fetchMeetings } = useMeetings();
-  const { vehicles, loading: vehiclesLoading, fetchVehicles } = useVehicles();
-  const { summary: contractSummary, supplySummary, serviceSummary, loading: contractsLoading, fetchSummary: fetchContractSummary, fetchSummaryByType } = useContracts();
-  const [contractStats, setContractStats] = useState<ContractSummary | null>(null);
-  const [supplyStats, setSupplyStats] = useState<any>(null);
-  const [serviceStats, setServiceStats] = useState<any>(null);
-  const [fleetRegistrationStats, setFleetRegistrationStats] = useState<any>(null);
+  // One aggregate request instead of fetching every site, staff member, meeting and vehicle
+  const { dashboard, loading, error, fetchDashboard } = useDashboard();
   const [exchangeRates, setExchangeRates] = useState<ExchangeRate[]>([]);
   const [ratesLoading, setRatesLoading] = useState(false);
 
   useEffect(() => {
-    fetchSites();
-    fetchStaff();
-    fetchMeetings();
-    fetchVehicles();
-    fetchContractSummary();
-    fetchSummaryByType();
+    fetchDashboard();
   }, []);
 
-  useEffect(() => {
-    if (contractSummary) {
-      setContractStats(contractSummary);
-    }
-  }, [contractSummary]);
-
-  useEffect(() => {
-    if (supplySummary) {
-      setSupplyStats(supplySummary);
-    }
-  }, [supplySummary]);
-
-  useEffect(() => {
-    if (serviceSummary) {
-      setServiceStats(serviceSummary);
-    }
-  }, [serviceSummary]);
-
-  // Calculate fleet registration status
-  useEffect(() => {
-    if (vehicles && vehicles.length > 0) {
-      const today = new Date();
-      today.setHours(0, 0, 0, 0);
-      
-      const thirtyDaysLater = new Date(today);
-      thirtyDaysLater.setDate(thirtyDaysLater.getDate() + 30);
-
-      let activeCount = 0;
-      let expiringCount = 0;
-      let expiredCount = 0;
-
-      vehicles.forEach((vehicle: any) => {
-        if (!vehicle.license_renewal_date) return;
-        
-        const renewalDate = new Date(vehicle.license_renewal_date);
-        renewalDate.setHours(0, 0, 0, 0);
-
-        if (renewalDate < today) {
-          expiredCount++;
-        } else if (renewalDate <= thirtyDaysLater) {
-          expiringCount++;
-        } else {
-          activeCount++;
-        }
-      });
-
-      setFleetRegistrationStats({
-        active: activeCount,
-        expiring: expiringCount,
-        expired: expiredCount
-      });
-    }
-  }, [vehicles]);
+  const counts = dashboard?.counts;
+  const supplyStats = dashboard?.contracts_by_type.Supply;
+  const serviceStats = dashboard?.contracts_by_type.Service;
+  const fleetRegistrationStats = dashboard?.fleet_registration;
 
   // Fetch exchange rates
   useEffect(() => {
@@ -105,13 +39,18 @@ export const Dashboard: React.FC = () => {
     return () => clearInterval(interval);
   }, []);
 
-  const loading = sitesLoading || staffLoading || meetingsLoading || vehiclesLoading || contractsLoading;
-
   return (
     <div>
       <h1 className="text-3xl font-bold text-gray-800 mb-8">Dashboard</h1>
 
-      {loading ? (
+      {error && !loading ? (
+        <>
+          <ErrorMessage message={error} />
+          <Button variant="secondary" onClick={() => fetchDashboard()}>
+            Retry
+          </Button>
+        </>
+      ) : loading || !dashboard ? (
         <LoadingSpinner />
       ) : (
         <>
@@ -121,7 +60,7 @@ export const Dashboard: React.FC = () => {
               <div className="flex items-center justify-between">
                 <div>
                   <p className="text-gray-600 text-sm font-medium">Total Sites</p>
-                  <p className="text-4xl font-bold text-gray-900">{sites.length}</p>
+                  <p className="text-4xl font-bold text-gray-900">{counts?.sites}</p>
                 </div>
                 <BarChart3 className="text-blue-600" size={32} />
               </div>
@@ -131,7 +70,7 @@ export const Dashboard: React.FC = () => {
               <div className="flex items-center justify-between">
                 <div>
                   <p className="text-gray-600 text-sm font-medium">Total Staff</p>
-                  <p className="text-4xl font-bold text-gray-900">{staff.length}</p>
+                  <p className="text-4xl font-bold text-gray-900">{counts?.staff}</p>
                 </div>
                 <Users className="text-green-600" size={32} />
               </div>
@@ -141,7 +80,7 @@ export const Dashboard: React.FC = () => {
               <div className="flex items-center justify-between">
                 <div>
                   <p className="text-gray-600 text-sm font-medium">Total Meetings</p>
-                  <p className="text-4xl font-bold text-gray-900">{meetings.length}</p>
+                  <p className="text-4xl font-bold text-gray-900">{counts?.meetings}</p>
                 </div>
                 <CalendarDays className="text-orange-600" size={32} />
               </div>
@@ -151,7 +90,7 @@ export const Dashboard: React.FC = () => {
               <div className="flex items-center justify-between">
                 <div>
                   <p className="text-gray-600 text-sm font-medium">Total Vehicles</p>
-                  <p className="text-4xl font-bold text-gray-900">{vehicles.length}</p>
+                  <p className="text-4xl font-bold text-gray-900">{counts?.vehicles}</p>
                 </div>
                 <Truck className="text-red-600" size={32} />
               </div>
@@ -208,31 +147,6 @@ export const Dashboard: React.FC = () => {
             </Card>
           )}
 
-          {/* Fallback if no contract type summaries are available */}
-          {contractStats && contractStats.total_contracts > 0 && !supplyStats && !serviceStats && (
-            <Card className="mb-8">
-              <h2 className="text-xl font-semibold mb-4">Contract Status Summary</h2>
-              <div className="grid grid-cols-4 gap-4">
-                <div className="p-4 bg-green-50 rounded-lg">
-                  <p className="text-sm text-gray-600">Active</p>
-                  <p className="text-2xl font-bold text-green-600">{contractStats.active_count}</p>
-                </div>
-                <div className="p-4 bg-yellow-50 rounded-lg">
-                  <p className="text-sm text-gray-600">Expired</p>
-                  <p className="text-2xl font-bold text-yellow-600">{contractStats.expired_count}</p>
-                </div>
-                <div className="p-4 bg-blue-50 rounded-lg">
-                  <p className="text-sm text-gray-600">Completed</p>
-                  <p className="text-2xl font-bold text-blue-600">{contractStats.completed_count}</p>
-                </div>
-                <div className="p-4 bg-red-50 rounded-lg">
-                  <p className="text-sm text-gray-600">Cancelled</p>
-                  <p className="text-2xl font-bold text-red-600">{contractStats.cancelled_count}</p>
-                </div>
-              </div>
-            </Card>
-          )}
-
           {/* Fleet Registration Status */}
           {fleetRegistrationStats && (
             <Card className="mb-8">
@@ -254,7 +168,7 @@ export const Dashboard: React.FC = () => {
                 >
                   <div className="flex items-center gap-2 mb-2">
                     <Clock className="text-yellow-600" size={20} />
-                    <p className="text-sm text-gray-600">Expiring in 30 Days</p>
+                    <p className="text-sm text-gray-600">Expiring in {fleetRegistrationStats.warning_days} Days</p>
                   </div>
                   <p className="text-3xl font-bold text-yellow-600">{fleetRegistrationStats.expiring}</p>
                 </div>
@@ -272,6 +186,103 @@ export const Dashboard: React.FC = () => {
             </Card>
           )}
 
+          {/* Upcoming and Recent Items */}
+          <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-8">
+            <Card>
+              <h2 className="text-xl font-semibold mb-4">Upcoming Meetings</h2>
+              {dashboard.upcoming_meetings.length === 0 ? (
+                <p className="text-gray-500 text-sm">No meetings scheduled</p>
+              ) : (
+                <ul className="divide-y divide-gray-100">
+                  {dashboard.upcoming_meetings.map((meeting) => (
+                    <li
+                      key={meeting.id}
+                      className="py-2 flex justify-between cursor-pointer hover:bg-gray-50"
+                      onClick={() => navigate(`/meetings/${meeting.id}`)}
+                    >
+                      <span className="text-gray-800">{meeting.site_name}</span>
+                      <span className="text-sm text-gray-600">
+                        {meeting.scheduled_at ? new Date(meeting.scheduled_at).toLocaleString() : '-'}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </Card>
+
+            <Card>
+              <h2 className="text-xl font-semibold mb-4">Recent Meetings</h2>
+              {dashboard.recent_meetings.length === 0 ? (
+                <p className="text-gray-500 text-sm">No past meetings</p>
+              ) : (
+                <ul className="divide-y divide-gray-100">
+                  {dashboard.recent_meetings.map((meeting) => (
+                    <li
+                      key={meeting.id}
+                      className="py-2 flex justify-between cursor-pointer hover:bg-gray-50"
+                      onClick={() => navigate(`/meetings/${meeting.id}`)}
+                    >
+                      <span className="text-gray-800">{meeting.site_name}</span>
+                      <span className="text-sm text-gray-600">
+                        {meeting.scheduled_at ? new Date(meeting.scheduled_at).toLocaleString() : '-'}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </Card>
+
+            <Card>
+              <h2 className="text-xl font-semibold mb-4">Contracts Ending Soon</h2>
+              {dashboard.ending_contracts.length === 0 ? (
+                <p className="text-gray-500 text-sm">No active contracts</p>
+              ) : (
+                <ul className="divide-y divide-gray-100">
+                  {dashboard.ending_contracts.map((contract) => (
+                    <li
+                      key={contract.id}
+                      className="py-2 flex justify-between cursor-pointer hover:bg-gray-50"
+                      onClick={() => navigate(
+                        contract.contract_type === 'Supply'
+                          ? `/supply-contracts/${contract.id}/view`
+                          : `/contracts/${contract.id}/view`
+                      )}
+                    >
+                      <span className="text-gray-800">
+                        {contract.eskom_reference || `${contract.contract_type} contract`} · {contract.site_name}
+                      </span>
+                      <span className="text-sm text-gray-600">{new Date(contract.end_date).toLocaleDateString()}</span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </Card>
+
+            <Card>
+              <h2 className="text-xl font-semibold mb-4">Licence Renewals</h2>
+              {dashboard.upcoming_renewals.length === 0 ? (
+                <p className="text-gray-500 text-sm">No renewal dates recorded</p>
+              ) : (
+                <ul className="divide-y divide-gray-100">
+                  {dashboard.upcoming_renewals.map((renewal) => (
+                    <li
+                      key={renewal.vehicle_registration_plate}
+                      className="py-2 flex justify-between cursor-pointer hover:bg-gray-50"
+                      onClick={() => navigate(`/fleet/${renewal.vehicle_registration_plate}`)}
+                    >
+                      <span className="text-gray-800">
+                        {renewal.vehicle_registration_plate} · {renewal.make} {renewal.model}
+                      </span>
+                      <span className={`text-sm ${renewal.expired ? 'text-red-600 font-semibold' : 'text-gray-600'}`}>
+                        {new Date(renewal.license_renewal_date).toLocaleDateString()}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </Card>
+          </div>
+
           {/* Currency Exchange Rates */}
           <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-8">
             {ratesLoading ? (
@@ -284,4 +284,50 @@ export interface UpdateVehicleInput {
   license_renewal_date?: string;
   general_notes?: string;
   natis_document?: string;
-}
\ No newline at end of file
+}
+// Dashboard Types
+export interface DashboardMeeting {
+  id: number;
+  site_id: number;
+  site_name: string;
+  scheduled_at?: string;
+}
+
+export interface DashboardContract {
+  id: number;
+  contract_type: ContractType;
+  eskom_reference?: string;
+  site_id: number;
+  site_name: string;
+  end_date: string;
+}
+
+export interface DashboardRenewal {
+  vehicle_registration_plate: string;
+  make: string;
+  model: string;
+  license_renewal_date: string;
+  expired: boolean;
+}
+
+export interface Dashboard {
+  counts: {
+    sites: number;
+    staff: number;
+    meetings: number;
+    vehicles: number;
+  };
+  contracts: ContractSummary;
+  contracts_by_type: Record<string, ContractSummary>;
+  fleet_registration: {
+    active: number;
+    expiring: number;
+    expired: number;
+    warning_days: number;
+  };
+  upcoming_meetings: DashboardMeeting[];
+  recent_meetings: DashboardMeeting[];
+  ending_contracts: DashboardContract[];
+  upcoming_renewals: DashboardRenewal[];
+  generated_at: string;
+}
@@ -33,4 +33,7 @@ export const API_ENDPOINTS = {
   MEETINGS_UPDATE: (id: number) => `${API_BASE_URL}/api/meetings/${id}`,
   MEETINGS_DELETE: (id: number) => `${API_BASE_URL}/api/meetings/${id}`,
   MEETINGS_BY_SITE: (siteId: number) => `${API_BASE_URL}/api/meetings/site/${siteId}`,
+
+  // Dashboard
+  DASHBOARD: `${API_BASE_URL}/api/dashboard`,
 };